@@ -2,23 +2,78 @@ import src.configs.config
 from src.configs.log_config import setup_logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from loguru import logger
+import asyncio
 import os
 import sys
+import time
 
 # Import the routers
+_import_start = time.perf_counter()
 from src.routers import chat_router
 from src.routers import review_router
+from src.routers import webhook_router
+from src.routers import metrics as metrics_router
+from src.services.github_service import github_service
+from src.configs.config import yaml_configs
+from src.llm.gemini_native import close_gemini_clients
+from src.llm.registry import llm_registry
+from src.services.admission_control import admission_controller
+from src.services.loop_runner import loop_runner
+from src.services.tracing import tracer
+llm_registry.record_timing("import:routers", time.perf_counter() - _import_start)
 
 # Get root_path from an environment variable. Defaults to "/python-template-app" if not set.
 root_path = os.getenv("ROOT_PATH", "/py-github-agent")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Owns process-wide resources: the pooled GitHub HTTP session and the review worker pool.
+    LLM clients and agents are built by a background warmup so startup does not wait for them.
+    """
+    start = time.perf_counter()
+    await github_service.start()
+    # Sync tool/model calls (legacy agents in worker threads) run their coroutines on this loop
+    loop_runner.attach()
+    llm_registry.record_timing("startup:github_session", time.perf_counter() - start)
+    warmup = None
+    if yaml_configs.get("llm", {}).get("warmup", True):
+        warmup = asyncio.create_task(llm_registry.warmup())
+    # Buffered spans are exported periodically and on shutdown
+    trace_flush = asyncio.create_task(tracer.run_flush_loop()) if tracer.enabled else None
+    logger.info(f"Startup phase timings: {llm_registry.timings}")
+    try:
+        yield
+    finally:
+        loop_runner.detach()
+        for task in (warmup, trace_flush):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        # Debounced webhook reviews that have not been queued yet are dropped
+        review_webhook = llm_registry.peek("review_webhook")
+        if review_webhook is not None:
+            await review_webhook.close()
+        # Only close the queue if a request or the warmup actually built it
+        review_job_queue = llm_registry.peek("review_job_queue")
+        if review_job_queue is not None:
+            await review_job_queue.close()
+        await close_gemini_clients()
+        await github_service.close()
+        await tracer.shutdown()
+        loop_runner.close()
+
+
 # Initialize the FastAPI app
 app = FastAPI(
     title="py-github-agent API",
     description="ai agent for checking github info",
     version="1.0.0",
     root_path=root_path,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -30,9 +85,14 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Latency / status / in-flight metrics for every request, exported at /metrics
+app.add_middleware(metrics_router.MetricsMiddleware)
+
 # Include the routers
 app.include_router(chat_router.router)
 app.include_router(review_router.router)
+app.include_router(webhook_router.router)
+app.include_router(metrics_router.router)
 
 
 @app.get("/")
@@ -42,6 +102,18 @@ def read_root():
     return {"message": "Welcome to the demo API. See /docs for details.this version after 0.0.6"}
 
 
+@app.get("/startup")
+def startup_info():
+    """Reports startup phase timings and which LLM clients/components have been built."""
+    return llm_registry.stats()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Reports per-endpoint concurrency, queue depth, wait times and shed counts."""
+    return admission_controller.stats()
+
+
 @app.get("/getcallinfo")
 def endpoint1(request: Request):
     client_ip = getattr(request, "client", None)
@@ -68,7 +140,7 @@ if __name__ == "__main__":
     print(f"DEBUG: Server starting. APP_ENVIRONMENT={current_env}", file=sys.stderr)
     
     # Force re-setup logging just to be sure
-    setup_logging(current_env)
+    setup_logging(current_env, (yaml_configs or {}).get("logging"))
     
     logger.info("Starting Uvicorn server...")
     # Disable Uvicorn's default logging to let Loguru take full control
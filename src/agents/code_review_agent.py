@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.runnables import Runnable
 from langchain_core.tools import BaseTool
-from langchain.agents import create_agent
 from langchain_core.prompts import ChatPromptTemplate
 
+from src.configs.config import yaml_configs
 from src.llm.factory import get_llm
 from src.tools.github_tools import get_pr_review_context_tool
 
@@ -18,6 +19,11 @@ Your task is to review a GitHub Pull Request based on the provided context (diff
    - Code style and best practices issues (PEP8, readability).
    - Performance improvements.
 3. Construct a structured review report.
+   - If the context reports `fetch_status: partial`, list the files in `failed_files` in the Summary
+     as not fully reviewed instead of treating their empty contents as real code.
+   - Each file carries its diff and a `context` excerpt (numbered lines around each hunk) instead of
+     the full file. Files in `skipped_files` (lockfiles, generated, binary) and `omitted_files`
+     (over the context budget) were not included; mention `omitted_files` in the Summary.
 
 **CRITICAL: OUTPUT FORMAT INSTRUCTIONS**
 
@@ -38,7 +44,47 @@ You MUST output the report in the following Markdown format:
 If there are no issues, please state that the code looks good in the Summary.
 """
 
-def create_code_review_agent() -> Runnable:
+# System prompt for a single map step of the map-reduce review
+FILE_REVIEW_PROMPT = """You are an expert Senior Software Engineer and Code Reviewer.
+You are reviewing one part of a GitHub Pull Request: a single changed file, or a group of hunks
+from a large file. Other parts of the PR are reviewed separately, so only comment on the code shown.
+
+Look for:
+   - Potential bugs and logic errors.
+   - Security vulnerabilities (e.g., SQL injection, XSS, secrets leakage).
+   - Code style and best practices issues (PEP8, readability).
+   - Performance improvements.
+
+**CRITICAL: OUTPUT FORMAT INSTRUCTIONS**
+
+You MUST output the report in the following Markdown format:
+
+## Code Review Report
+
+### Summary
+<One or two sentences about the changes in this file.>
+
+### Detailed Findings
+
+| Filename | Line Number | Issue | Suggestion |
+| :--- | :--- | :--- | :--- |
+| path/to/file.py | 10 | Description of issue... | Proposed fix... |
+
+Leave the table empty if there are no issues.
+"""
+
+def create_file_review_chain(llm: Optional[BaseChatModel] = None) -> Runnable:
+    """
+    Creates the per-file review chain used by the map-reduce review mode.
+    Input: {"file_context": str}, output: an AI message in the report format.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", FILE_REVIEW_PROMPT),
+        ("human", "{file_context}"),
+    ])
+    return prompt | (llm or get_llm())
+
+def create_code_review_agent(llm: Optional[BaseChatModel] = None) -> Runnable:
     """
     Creates a Code Review Agent using modern LangChain agent architecture.
     """
@@ -46,14 +92,18 @@ def create_code_review_agent() -> Runnable:
     tools: List[BaseTool] = [get_pr_review_context_tool]
 
     # 2. LLM
-    llm = get_llm()
+    llm = llm or get_llm()
 
     # 3. Create Agent using modern architecture
+    # Imported here: langchain.agents is slow to import and only needed when the agent is built
+    from langchain.agents import create_agent
+
     agent_graph = create_agent(
         model=llm,
         tools=tools,
         system_prompt=SYSTEM_PROMPT,
-        debug=True,  # Enable verbose logging
+        # Prints every graph step to stdout synchronously; opt in with `llm.agent_debug`
+        debug=bool(yaml_configs.get("llm", {}).get("agent_debug", False)),
     )
 
     return agent_graph
@@ -4,14 +4,14 @@ from langchain_classic.agents import initialize_agent, AgentType
 from langchain_core.tools import BaseTool
 
 from src.llm.factory import get_llm
-from src.tools.github_tools import list_repo_files_tool
+from src.tools.github_tools import list_repo_files_tool, query_repo_files_tool
 
 def create_github_agent() -> Runnable:
     """
     组装并创建一个 GitHub Agent Executor。
     使用 langchain-classic 的 initialize_agent API 以确保兼容性。
     """
-    tools: List[BaseTool] = [list_repo_files_tool]
+    tools: List[BaseTool] = [list_repo_files_tool, query_repo_files_tool]
     
     # 使用工厂获取 LLM，支持动态切换 DeepSeek/Gemini
     llm = get_llm()
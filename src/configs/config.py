@@ -59,6 +59,10 @@ except FileNotFoundError:
 
 logger.info("all configs loaded")
 
+# Re-apply logging with the yaml `logging` section (levels, sampling, async sink)
+if yaml_configs and yaml_configs.get("logging"):
+    setup_logging(app_env, yaml_configs["logging"])
+
 
 # =================proxy settings apply here =======================
 if app_env == "local" and yaml_configs and "proxy" in yaml_configs:
@@ -1,9 +1,31 @@
 import sys
-import json
 import os
 import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO
+
+import orjson
 from loguru import logger
 
+DEFAULT_LOGGING_OPTIONS: Dict[str, Any] = {
+    "level": "DEBUG",
+    "levels": {},                # 按模块前缀单独设置级别，如 {"src.services.github_service": "INFO"}
+    "async": True,               # 日志放进有界队列，由后台线程写出，调用方不等待 I/O
+    "max_queue": 10000,          # 队列满时丢弃新日志并计数
+    "max_message_length": 4000,  # 超长消息 (prompt、完整响应等) 截断到这个长度，0 表示不截断
+    "sampling": {
+        "window": 1.0,           # 秒
+        "max_per_window": 0,     # 同一调用点每个窗口最多输出的 INFO/DEBUG 日志数，0 表示不采样
+    },
+}
+
+# 采样不会丢弃 WARNING 及以上的日志
+_SAMPLING_MAX_LEVEL = 30
+_STOP = object()
+
+
 class EndpointFilter(logging.Filter):
     def filter(self, record: logging.LogRecord) -> bool:
         return record.getMessage().find("GET / HTTP/1.1") == -1
@@ -19,32 +41,163 @@ def health_check_filter(record):
             return False
     return True
 
-def setup_logging(app_env_variable: str = "local"):
+
+class LogFilter:
+    """
+    sink 的 filter：健康检查过滤、按模块的日志级别、按调用点的频率采样，以及超长消息截断。
+    被采样丢弃的条数会附加在该调用点下一条输出的日志后面。
+    """
+
+    def __init__(self, level: str, levels: Dict[str, str], max_message_length: int, window: float, max_per_window: int):
+        self.default_level = logger.level(level).no
+        # 最长的前缀优先匹配
+        self.levels = sorted(((name, logger.level(lvl).no) for name, lvl in levels.items()), key=lambda x: -len(x[0]))
+        self.max_message_length = max_message_length
+        self.window = window
+        self.max_per_window = max_per_window
+        self._level_by_name: Dict[Optional[str], int] = {}
+        self._windows: Dict[Any, list] = {}  # 调用点 -> [窗口开始时间, 已输出条数, 已丢弃条数]
+        self._lock = threading.Lock()
+
+    def level_for(self, name: Optional[str]) -> int:
+        level = self._level_by_name.get(name)
+        if level is None:
+            level = self.default_level
+            for prefix, prefix_level in self.levels:
+                if name == prefix or (name or "").startswith(prefix + "."):
+                    level = prefix_level
+                    break
+            self._level_by_name[name] = level
+        return level
+
+    def _sample(self, record) -> bool:
+        key = (record["name"], record["function"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                dropped = state[2] if state is not None else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record["message"] += f" [{dropped} similar messages sampled out]"
+                return True
+            if state[1] < self.max_per_window:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+    def __call__(self, record) -> bool:
+        level = record["level"].no
+        if level < self.level_for(record["name"]):
+            return False
+        if not health_check_filter(record):
+            return False
+        if self.max_per_window and level < _SAMPLING_MAX_LEVEL and not self._sample(record):
+            return False
+        message = record["message"]
+        if self.max_message_length and len(message) > self.max_message_length:
+            record["message"] = (
+                f"{message[:self.max_message_length]}... [truncated {len(message) - self.max_message_length} chars]"
+            )
+        return True
+
+
+class AsyncLogSink:
+    """
+    loguru sink：`write` 只把格式化好的日志放进有界队列，后台线程批量写到 stream 并 flush，
+    慢的 stdout (容器日志管道等) 不会阻塞事件循环。队列满时丢弃新日志，下一次写出时补一条丢弃提示。
+    loguru 在 remove() (包括进程退出时) 调用 `stop`，写完队列中剩余的日志。
+    """
+
+    def __init__(self, stream: TextIO, max_queue: int = 10000, batch_size: int = 512):
+        self.stream = stream
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def isatty(self) -> bool:
+        # loguru 据此决定是否输出颜色
+        return bool(getattr(self.stream, "isatty", lambda: False)())
+
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stopping = True
+                batch = [message for message in batch if message is not _STOP]
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                batch.append(f"[log buffer full, dropped {dropped} log records]\n")
+            try:
+                self.stream.write("".join(batch))
+                self.stream.flush()
+            except Exception as e:
+                print(f"Log writer failed: {e}", file=sys.__stderr__)
+
+    def stop(self) -> None:
+        try:
+            self._queue.put(_STOP, timeout=5)
+        except queue.Full:
+            return
+        self._thread.join(timeout=5)
+
+
+def gcp_formatter(record):
+    log_entry = {
+        "severity": record["level"].name,
+        "message": record["message"],
+        "timestamp": record["time"].isoformat(),
+        "logging.googleapis.com/sourceLocation": {
+            "file": record["file"].path,
+            "line": record["line"],
+            "function": record["function"],
+        },
+    }
+    # orjson 比 json.dumps 快一个数量级；default=str 兜底不可序列化的值
+    record["extra"]["json_message"] = orjson.dumps(log_entry, default=str).decode()
+    return "{extra[json_message]}\n"
+
+
+def setup_logging(app_env_variable: str = "local", options: Optional[Dict[str, Any]] = None):
     """
     Configures the Loguru logger based on the application environment.
+    `options` is the yaml `logging` section; config.py calls this again once the yaml is loaded.
     """
+    options = {**DEFAULT_LOGGING_OPTIONS, **(options or {})}
+    sampling = {**DEFAULT_LOGGING_OPTIONS["sampling"], **(options.get("sampling") or {})}
+
     # Filter uvicorn access logs
     logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
     logger.remove()
 
+    log_filter = LogFilter(
+        options["level"], options["levels"] or {}, options["max_message_length"],
+        sampling["window"], sampling["max_per_window"],
+    )
+    stream = sys.stdout if app_env_variable != "local" else sys.stderr
+    sink = AsyncLogSink(stream, options["max_queue"]) if options["async"] else stream
+    # 级别判断由 LogFilter 按模块完成，handler 本身放行所有级别
+    handler_options = {"level": 0, "filter": log_filter, "colorize": app_env_variable == "local" and stream.isatty()}
+
     if app_env_variable != "local":
-        def gcp_formatter(record):
-            log_entry = {
-                "severity": record["level"].name,
-                "message": record["message"],
-                "timestamp": record["time"].isoformat(),
-                "logging.googleapis.com/sourceLocation": {
-                    "file": record["file"].path,
-                    "line": record["line"],
-                    "function": record["function"],
-                },
-            }
-            record["extra"]["json_message"] = json.dumps(log_entry)
-            return "{extra[json_message]}\n"
-
-        logger.add(sys.stdout, format=gcp_formatter, level="DEBUG", filter=health_check_filter)
+        logger.add(sink, format=gcp_formatter, **handler_options)
         logger.info("Loguru configured for custom JSON output to stdout for GCP.")
     else:
-        logger.add(sys.stderr, level="DEBUG", filter=health_check_filter)
-        logger.info("Loguru configured for standard terminal output.")
\ No newline at end of file
+        logger.add(sink, **handler_options)
+        logger.info("Loguru configured for standard terminal output.")
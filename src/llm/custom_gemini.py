@@ -1,6 +1,6 @@
 import os
 import typing
-from typing import Any, List, Optional, Sequence, Callable
+from typing import Any, Dict, List, Optional, Sequence, Callable
 from loguru import logger
 
 from langchain_core.runnables import Runnable
@@ -11,42 +11,64 @@ from langchain_core.callbacks.manager import (
     CallbackManagerForLLMRun,
 )
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage
+from langchain_core.messages import BaseMessage
 from langchain_core.outputs import ChatResult, ChatGeneration, ChatGenerationChunk
-from langchain_google_genai import ChatGoogleGenerativeAI
 from typing import AsyncIterator
 
+from src.llm.gemini_native import (
+    SAFETY_SETTINGS,
+    get_gemini_client,
+    to_ai_message,
+    to_ai_message_chunk,
+    to_function_declarations,
+    to_gemini_request,
+    to_tool_config,
+)
+from src.services.loop_runner import loop_runner
+
 class CustomGeminiChatModel(BaseChatModel):
     """
     一个集成了 LangChain BaseChatModel 的自定义 Gemini LLM 类。
+
+    直接调用 Gemini REST API (generateContent / streamGenerateContent)，
+    同一 API key 的所有实例共享一个 aiohttp 连接池 (见 `gemini_native.get_gemini_client`)。
+    回调只由 BaseChatModel 触发一次，不再经过内部的 ChatGoogleGenerativeAI。
     """
-    client: Any = None  # 内部 LangChain Gemini 客户端
+    client: Any = None  # 共享的 GeminiHTTPClient
     model_name: str = "gemini-2.5-pro"
     temperature: float = 0.7
+    max_output_tokens: Optional[int] = None
+    base_url: Optional[str] = None  # 默认为 `llm.gemini.base_url`，测试时可指向本地 mock
 
     def __init__(self, **kwargs: Any):
         super().__init__(**kwargs)
         api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment variables.")
-        
-        from langchain_google_genai import HarmBlockThreshold, HarmCategory
-        
-        safety_settings = {
-            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        }
+        if self.client is None:
+            self.client = get_gemini_client(api_key, self.base_url)
 
-        self.client = ChatGoogleGenerativeAI(
-            model=self.model_name,
-            google_api_key=api_key,
-            temperature=self.temperature,
-            transport="rest",
-            safety_settings=safety_settings,
-            **kwargs
-        )
+    def _payload(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> Dict[str, Any]:
+        system_instruction, contents = to_gemini_request(messages)
+        generation_config: Dict[str, Any] = {"temperature": self.temperature}
+        if self.max_output_tokens:
+            generation_config["maxOutputTokens"] = self.max_output_tokens
+        if stop:
+            generation_config["stopSequences"] = stop
+        payload: Dict[str, Any] = {
+            "contents": contents,
+            "generationConfig": generation_config,
+            "safetySettings": SAFETY_SETTINGS,
+        }
+        if system_instruction:
+            payload["systemInstruction"] = system_instruction
+        # bind_tools 绑定的 function declarations
+        if kwargs.get("tools"):
+            payload["tools"] = [{"functionDeclarations": kwargs["tools"]}]
+            tool_config = to_tool_config(kwargs.get("tool_choice"), kwargs["tools"])
+            if tool_config:
+                payload["toolConfig"] = tool_config
+        return payload
 
     def _generate(
         self,
@@ -57,21 +79,12 @@ class CustomGeminiChatModel(BaseChatModel):
     ) -> ChatResult:
         """
         同步生成聊天响应。
+        请求由 loop_runner 提交到服务的事件循环上执行，与异步调用共用同一个连接池。
         """
-        # 调试日志：记录输入
-        # logger.info(f"Gemini Request Messages: {messages}")
-
-        llm_result = self.client.generate(
-            [messages], stop=stop, callbacks=run_manager, **kwargs
-        )
-        
-        generations = llm_result.generations[0]
-        
-        # 调试日志：记录输出
-        if generations:
-            logger.info(f"Gemini Response: {generations[0].text[:200]}...")
-        
-        return ChatResult(generations=generations)
+        response = loop_runner.run(self.client.generate(self.model_name, self._payload(messages, stop, **kwargs)))
+        message = to_ai_message(response)
+        logger.debug(f"Gemini Response: {str(message.content)[:200]}...")
+        return ChatResult(generations=[ChatGeneration(message=message)])
 
     async def _agenerate(
         self,
@@ -83,11 +96,8 @@ class CustomGeminiChatModel(BaseChatModel):
         """
         异步生成聊天响应。
         """
-        llm_result = await self.client.agenerate(
-            [messages], stop=stop, callbacks=run_manager, **kwargs
-        )
-        generations = llm_result.generations[0]
-        return ChatResult(generations=generations)
+        response = await self.client.generate(self.model_name, self._payload(messages, stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=to_ai_message(response))])
 
     async def _astream(
         self,
@@ -96,12 +106,11 @@ class CustomGeminiChatModel(BaseChatModel):
         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> AsyncIterator[ChatGenerationChunk]:
-        """流式生成聊天响应。"""
-        # 直接将调用委托给内部客户端的 astream 方法，
-        # 并将返回的 AIMessageChunk 包装在 ChatGenerationChunk 中。
-        async for chunk in self.client.astream(
-            messages, stop=stop, callbacks=run_manager, **kwargs
-        ):
+        """流式生成聊天响应，每个 SSE 事件转换为一个 ChatGenerationChunk。"""
+        tool_calls = 0
+        async for response in self.client.stream(self.model_name, self._payload(messages, stop, **kwargs)):
+            chunk = to_ai_message_chunk(response, tool_calls)
+            tool_calls += len(chunk.tool_call_chunks)
             yield ChatGenerationChunk(message=chunk)
 
     def bind_tools(
@@ -112,8 +121,8 @@ class CustomGeminiChatModel(BaseChatModel):
         **kwargs: Any,
     ) -> Runnable:
         """Bind tools to the model for tool calling."""
-        # Delegate to the underlying client's bind_tools method
-        return self.client.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        # 在绑定时转换一次 function declarations，而不是每次调用都转换
+        return self.bind(tools=to_function_declarations(tools), tool_choice=tool_choice, **kwargs)
 
     @property
     def _llm_type(self) -> str:
@@ -1,25 +1,55 @@
 import src.configs.config
+from typing import Any, Dict, Optional
+
 from loguru import logger
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from src.configs.config import yaml_configs
+from src.llm.instrumentation import LLMMetricsHandler, LLMTracingHandler
 
 
-def get_llm() -> BaseChatModel:
+def create_llm(provider: Optional[str] = None, model: Optional[str] = None) -> BaseChatModel:
     """
-    LLM 工厂函数。
-    根据配置文件中的 `llm.provider` 决定实例化哪个 LLM。
+    LLM 工厂函数，每次调用都会创建一个新实例。
+    根据 `provider` (默认为配置文件中的 `llm.provider`) 决定实例化哪个 LLM；
+    `model` 为空时使用该 provider 的默认模型。
     """
-    provider = yaml_configs.get("llm", {}).get("provider", "gemini") # 默认为 gemini
+    provider = provider or yaml_configs.get("llm", {}).get("provider", "gemini") # 默认为 gemini
     logger.info(f"LLM provider selected: {provider}")
 
+    if provider == "router":
+        # 组合 `llm.router.providers` 中的多个 provider，按延迟路由并在 429/5xx 时切换
+        from .registry import llm_registry
+        from .router import RoutingChatModel
+        return RoutingChatModel.from_config(lambda name: llm_registry.get_llm(name))
+
+    if provider not in ("deepseek", "gemini"):
+        logger.error(f"Unknown LLM provider: {provider}. Defaulting to Gemini.")
+        provider = "gemini"
+    kwargs: Dict[str, Any] = {"model_name": model} if model else {}
+    # 每个 provider 的调用延迟和 token 数由 /metrics 输出，启用 tracing 时每次调用还会生成一个 span
+    kwargs["callbacks"] = [LLMMetricsHandler(provider), LLMTracingHandler(provider)]
+
     if provider == "deepseek":
         from .custom_deepseek import CustomDeepSeekChatModel
-        return CustomDeepSeekChatModel()
-    elif provider == "gemini":
-        from .custom_gemini import CustomGeminiChatModel
-        return CustomGeminiChatModel()
+        return CustomDeepSeekChatModel(**kwargs)
     else:
-        logger.error(f"Unknown LLM provider: {provider}. Defaulting to Gemini.")
         from .custom_gemini import CustomGeminiChatModel
-        return CustomGeminiChatModel()
+        return CustomGeminiChatModel(**kwargs)
+
+
+def get_llm(provider: Optional[str] = None, model: Optional[str] = None) -> BaseChatModel:
+    """
+    返回按 (provider, model) 缓存的 LLM 实例，第一次调用时才创建。
+    """
+    from .registry import llm_registry
+    return llm_registry.get_llm(provider, model)
+
+
+def get_llm_identity(llm: BaseChatModel) -> str:
+    """
+    返回 "provider/model" 形式的模型标识，用于缓存键等需要区分模型的地方。
+    """
+    provider = yaml_configs.get("llm", {}).get("provider", "gemini")
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return f"{provider}/{model}"
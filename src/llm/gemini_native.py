@@ -0,0 +1,308 @@
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+from loguru import logger
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.configs.config import yaml_configs
+from src.services.loop_runner import LoopSessions
+
+# 连接池和 API 默认参数，可通过 yaml 的 `llm.gemini` 覆盖
+DEFAULT_GEMINI_OPTIONS: Dict[str, Any] = {
+    "base_url": "https://generativelanguage.googleapis.com/v1beta",
+    "limit": 100,               # 连接池总连接数上限
+    "limit_per_host": 50,       # 单个 host 的连接数上限
+    "keepalive_timeout": 30,    # 空闲连接保活时间 (秒)
+    "request_timeout": 300,     # 单次请求总超时 (秒)，长评审可能需要几分钟
+}
+
+# Gemini 默认会拦截部分内容；代码评审中的安全相关代码容易被误判，全部放开
+SAFETY_SETTINGS = [
+    {"category": category, "threshold": "BLOCK_NONE"}
+    for category in (
+        "HARM_CATEGORY_HARASSMENT",
+        "HARM_CATEGORY_HATE_SPEECH",
+        "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "HARM_CATEGORY_DANGEROUS_CONTENT",
+    )
+]
+
+# Gemini 的 function declaration 只接受 OpenAPI Schema 的一个子集
+_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+def load_gemini_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("llm") or {}).get("gemini") or {}
+    return {**DEFAULT_GEMINI_OPTIONS, **configured}
+
+
+class GeminiAPIError(Exception):
+    """Gemini API 返回的非 200 响应；`status_code` 供 LLM 路由判断是否切换 provider。"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Gemini API error {status_code}: {message}")
+        self.status_code = status_code
+
+
+class GeminiHTTPClient:
+    """
+    直接调用 Gemini REST API 的异步客户端。
+
+    持有一个 aiohttp.ClientSession 连接池，所有使用同一 API key 的模型实例共享 (见 `get_gemini_client`)。
+    session 绑定在创建它的事件循环上，每个事件循环各持有一个 (见 `LoopSessions`)。
+    `trust_env=True` 以便沿用 local 环境通过 HTTPS_PROXY 配置的代理。
+    """
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, options: Optional[Dict[str, Any]] = None):
+        self.options = {**load_gemini_options(), **(options or {})}
+        self.api_key = api_key
+        self.base_url = (base_url or self.options["base_url"]).rstrip("/")
+        self._sessions = LoopSessions(self._create_session)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.options["limit"],
+            limit_per_host=self.options["limit_per_host"],
+            keepalive_timeout=self.options["keepalive_timeout"],
+        )
+        return aiohttp.ClientSession(
+            headers={"x-goog-api-key": self.api_key, "Content-Type": "application/json"},
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.options["request_timeout"]),
+            trust_env=True,
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        return self._sessions.get()
+
+    async def close(self) -> None:
+        await self._sessions.close()
+
+    @staticmethod
+    async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+        if response.status == 200:
+            return
+        text = await response.text()
+        try:
+            message = json.loads(text)["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = text[:500]
+        raise GeminiAPIError(response.status, message)
+
+    async def generate(self, model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{self.base_url}/models/{model}:generateContent"
+        async with self._get_session().post(url, json=payload) as response:
+            await self._raise_for_status(response)
+            return await response.json()
+
+    async def stream(self, model: str, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """逐个返回 `streamGenerateContent?alt=sse` 的 SSE 事件 (每个都是一个 GenerateContentResponse)。"""
+        url = f"{self.base_url}/models/{model}:streamGenerateContent?alt=sse"
+        async with self._get_session().post(url, json=payload) as response:
+            await self._raise_for_status(response)
+            async for line in response.content:
+                line = line.strip()
+                if line.startswith(b"data:"):
+                    yield json.loads(line[len(b"data:"):])
+
+
+_shared_clients: Dict[Tuple[str, str], GeminiHTTPClient] = {}
+
+
+def get_gemini_client(api_key: str, base_url: Optional[str] = None) -> GeminiHTTPClient:
+    """返回 (api_key, base_url) 对应的共享客户端，多个模型实例复用同一个连接池。"""
+    key = (api_key, (base_url or load_gemini_options()["base_url"]).rstrip("/"))
+    if key not in _shared_clients:
+        _shared_clients[key] = GeminiHTTPClient(api_key, key[1])
+    return _shared_clients[key]
+
+
+async def close_gemini_clients() -> None:
+    for client in _shared_clients.values():
+        await client.close()
+
+
+# ---------------------- LangChain <-> Gemini 格式转换 ----------------------
+
+def _text_parts(content: Any) -> List[Dict[str, Any]]:
+    if isinstance(content, str):
+        return [{"text": content}] if content else []
+    parts = []
+    for block in content or []:
+        if isinstance(block, str):
+            parts.append({"text": block})
+        elif isinstance(block, dict) and block.get("type") == "text":
+            parts.append({"text": block["text"]})
+    return parts
+
+
+def _tool_result(content: Any) -> Dict[str, Any]:
+    if isinstance(content, str):
+        try:
+            value = json.loads(content)
+        except ValueError:
+            value = content
+    else:
+        value = content
+    return value if isinstance(value, dict) else {"result": value}
+
+
+def to_gemini_request(messages: Sequence[BaseMessage]) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    把 LangChain 消息转换为 (systemInstruction, contents)。
+    连续的相同角色消息会合并成一个 content，多个工具结果因此作为同一轮的 functionResponse 返回。
+    """
+    system_parts: List[Dict[str, Any]] = []
+    contents: List[Dict[str, Any]] = []
+    tool_names: Dict[str, str] = {}
+
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            system_parts.extend(_text_parts(message.content))
+            continue
+        if isinstance(message, AIMessage):
+            role = "model"
+            for call in message.tool_calls:
+                tool_names[call["id"]] = call["name"]
+            # 原样回传模型生成的 functionCall parts，保留 thoughtSignature 等字段
+            parts = _text_parts(message.content) + (
+                message.additional_kwargs.get("gemini_parts")
+                or [{"functionCall": {"name": c["name"], "args": c["args"]}} for c in message.tool_calls]
+            )
+        elif isinstance(message, ToolMessage):
+            role = "user"
+            name = message.name or tool_names.get(message.tool_call_id, "tool")
+            parts = [{"functionResponse": {"name": name, "response": _tool_result(message.content)}}]
+        else:
+            role = "user"
+            parts = _text_parts(message.content)
+        if not parts:
+            continue
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].extend(parts)
+        else:
+            contents.append({"role": role, "parts": list(parts)})
+
+    system_instruction = {"parts": system_parts} if system_parts else None
+    return system_instruction, contents
+
+
+def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    # Optional[X] 在 JSON Schema 中是 anyOf [X, null]
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        result = _gemini_schema(options[0]) if options else {"type": "STRING"}
+        result["nullable"] = True
+        if "description" in schema:
+            result["description"] = schema["description"]
+        return result
+    result = {k: v for k, v in schema.items() if k in _SCHEMA_KEYS}
+    if "type" in result:
+        result["type"] = result["type"].upper()
+    if "properties" in result:
+        result["properties"] = {name: _gemini_schema(s) for name, s in result["properties"].items()}
+    if "items" in result:
+        result["items"] = _gemini_schema(result["items"])
+    return result
+
+
+def to_function_declarations(tools: Sequence[Any]) -> List[Dict[str, Any]]:
+    declarations = []
+    for tool in tools:
+        function = convert_to_openai_tool(tool)["function"]
+        declaration = {"name": function["name"], "description": function.get("description", "")}
+        parameters = function.get("parameters") or {}
+        if parameters.get("properties"):
+            declaration["parameters"] = _gemini_schema(parameters)
+        declarations.append(declaration)
+    return declarations
+
+
+def to_tool_config(tool_choice: Optional[str], declarations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if tool_choice in (None, "auto"):
+        return None
+    if tool_choice == "none":
+        return {"functionCallingConfig": {"mode": "NONE"}}
+    config = {"mode": "ANY"}
+    if tool_choice not in ("any", "required", True):
+        config["allowedFunctionNames"] = [tool_choice]
+    return {"functionCallingConfig": config}
+
+
+def _usage(response: Dict[str, Any]) -> Optional[UsageMetadata]:
+    usage = response.get("usageMetadata")
+    if not usage:
+        return None
+    input_tokens = usage.get("promptTokenCount", 0)
+    output_tokens = usage.get("candidatesTokenCount", 0) + usage.get("thoughtsTokenCount", 0)
+    return UsageMetadata(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=usage.get("totalTokenCount", input_tokens + output_tokens),
+    )
+
+
+def _split_parts(response: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]], Dict[str, Any]]:
+    """返回 (文本, functionCall parts, response_metadata)；thought parts 被忽略。"""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        block_reason = (response.get("promptFeedback") or {}).get("blockReason")
+        if block_reason:
+            logger.warning(f"Gemini blocked the prompt: {block_reason}")
+        return "", [], {"block_reason": block_reason} if block_reason else {}
+    candidate = candidates[0]
+    parts = [p for p in (candidate.get("content") or {}).get("parts") or [] if not p.get("thought")]
+    text = "".join(p["text"] for p in parts if "text" in p)
+    calls = [p for p in parts if "functionCall" in p]
+    metadata = {"finish_reason": candidate["finishReason"]} if candidate.get("finishReason") else {}
+    if response.get("modelVersion"):
+        metadata["model_name"] = response["modelVersion"]
+    return text, calls, metadata
+
+
+def to_ai_message(response: Dict[str, Any]) -> AIMessage:
+    text, calls, metadata = _split_parts(response)
+    tool_calls = [
+        {"name": p["functionCall"]["name"], "args": p["functionCall"].get("args") or {}, "id": str(uuid.uuid4()), "type": "tool_call"}
+        for p in calls
+    ]
+    return AIMessage(
+        content=text,
+        tool_calls=tool_calls,
+        additional_kwargs={"gemini_parts": calls} if calls else {},
+        response_metadata=metadata,
+        usage_metadata=_usage(response),
+    )
+
+
+def to_ai_message_chunk(response: Dict[str, Any], first_index: int) -> AIMessageChunk:
+    """流式事件转换为 AIMessageChunk；`first_index` 是本事件第一个工具调用在整条消息中的序号。"""
+    text, calls, metadata = _split_parts(response)
+    tool_call_chunks = [
+        {
+            "name": p["functionCall"]["name"],
+            "args": json.dumps(p["functionCall"].get("args") or {}),
+            "id": str(uuid.uuid4()),
+            "index": first_index + i,
+            "type": "tool_call_chunk",
+        }
+        for i, p in enumerate(calls)
+    ]
+    return AIMessageChunk(
+        content=text,
+        tool_call_chunks=tool_call_chunks,
+        additional_kwargs={"gemini_parts": calls} if calls else {},
+        response_metadata=metadata,
+        # 每个事件的 usageMetadata 是累计值，只在最后一个事件上报告，避免合并 chunk 时重复计算
+        usage_metadata=_usage(response) if metadata.get("finish_reason") else None,
+    )
@@ -0,0 +1,96 @@
+import time
+from typing import Any, Dict
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.services.metrics import LLM_CALL_SECONDS, LLM_CALLS_IN_FLIGHT, LLM_ERRORS_TOTAL, LLM_TOKENS_TOTAL
+from src.services.tracing import tracer
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    记录单个 provider 的 LLM 调用延迟、token 数、错误数和进行中的调用数。
+    由 `factory.create_llm` 挂到每个 provider 的模型上；metric child 在创建时取好，回调里只做计数。
+    """
+    run_inline = True  # 在调用线程内执行，不经过 executor
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._seconds = LLM_CALL_SECONDS.labels(provider)
+        self._in_flight = LLM_CALLS_IN_FLIGHT.labels(provider)
+        self._errors = LLM_ERRORS_TOTAL.labels(provider)
+        self._input_tokens = LLM_TOKENS_TOTAL.labels(provider, "input")
+        self._output_tokens = LLM_TOKENS_TOTAL.labels(provider, "output")
+        self._started: Dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+        self._in_flight.inc()
+
+    def _finish(self, run_id: UUID) -> None:
+        start = self._started.pop(run_id, None)
+        if start is not None:
+            self._in_flight.dec()
+            self._seconds.observe(time.perf_counter() - start)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    self._input_tokens.inc(usage.get("input_tokens", 0))
+                    self._output_tokens.inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id)
+        self._errors.inc()
+
+
+class LLMTracingHandler(BaseCallbackHandler):
+    """
+    为每次 LLM 调用 (agent 的每一轮) 创建一个 span，父 span 是调用时的当前 span
+    (评审、工具等)，记录 provider、模型、token 数和返回的工具调用数。tracing 未启用时不做任何事。
+    """
+    run_inline = True
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self._spans: Dict[UUID, Any] = {}
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        if not tracer.enabled:
+            return
+        metadata = kwargs.get("metadata") or {}
+        self._spans[run_id] = tracer.start_span("llm.chat", {
+            "gen_ai.system": self.provider,
+            "gen_ai.request.model": metadata.get("ls_model_name"),
+            "llm.input_messages": sum(len(batch) for batch in messages),
+        })
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        input_tokens = output_tokens = tool_calls = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                tool_calls += len(getattr(message, "tool_calls", None) or [])
+        span.set_attributes({
+            "gen_ai.usage.input_tokens": input_tokens,
+            "gen_ai.usage.output_tokens": output_tokens,
+            "llm.tool_calls": tool_calls,
+        })
+        tracer.end_span(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.record_exception(error)
+            tracer.end_span(span)
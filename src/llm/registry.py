@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from src.configs.config import yaml_configs
+
+
+class LLMRegistry:
+    """
+    延迟构建并缓存 LLM 客户端和依赖它们的组件 (agent、service)。
+
+    - LLM 按 (provider, model) 缓存，第一次使用时才创建；缺少某个 provider 的 key
+      只会让用到它的请求失败，而不会在 import 时让整个服务启动失败。
+    - 组件通过 `register(name, builder)` 注册，`get(name)` 时构建一次。
+    - `warmup()` 在后台线程中提前构建，应用启动不必等待。
+    - 每次构建的耗时记录在 `timings` 中，用于观察启动各阶段的时间。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Any, threading.Lock] = {}
+        self._llms: Dict[Tuple[str, str], BaseChatModel] = {}
+        self._builders: Dict[str, Callable[[], Any]] = {}
+        self._components: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+
+    def _build_lock(self, key: Any) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(key, threading.Lock())
+
+    def record_timing(self, phase: str, seconds: float) -> None:
+        self.timings[phase] = seconds
+
+    def _build(self, phase: str, cache: Dict[Any, Any], key: Any, builder: Callable[[], Any]) -> Any:
+        # 不同的 key 可以并行构建；同一个 key 只构建一次
+        if key in cache:
+            return cache[key]
+        with self._build_lock(key):
+            if key in cache:
+                return cache[key]
+            start = time.perf_counter()
+            try:
+                value = builder()
+            except Exception as e:
+                self.errors[phase] = str(e)
+                raise
+            self.record_timing(phase, time.perf_counter() - start)
+            self.errors.pop(phase, None)
+            cache[key] = value
+            logger.info(f"Built {phase} in {self.timings[phase]:.3f}s")
+            return value
+
+    def get_llm(self, provider: Optional[str] = None, model: Optional[str] = None) -> BaseChatModel:
+        """
+        返回 (provider, model) 对应的 LLM 实例，默认使用 yaml 中的 `llm.provider` 和该 provider 的默认模型。
+        """
+        from src.llm.factory import create_llm
+
+        provider = provider or yaml_configs.get("llm", {}).get("provider", "gemini")
+        key = (provider, model or "default")
+        return self._build(f"llm:{provider}/{key[1]}", self._llms, key, lambda: create_llm(provider, model))
+
+    def register(self, name: str, builder: Callable[[], Any]) -> None:
+        self._builders[name] = builder
+
+    def get(self, name: str) -> Any:
+        """Builds the registered component on first use; build errors are raised to the caller and retried next time."""
+        return self._build(f"component:{name}", self._components, name, self._builders[name])
+
+    def peek(self, name: str) -> Any:
+        """Returns the component if it has already been built, without building it."""
+        return self._components.get(name)
+
+    async def warmup(self, names: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """
+        在后台线程中构建组件 (默认全部已注册的组件)，返回 {name: None 或错误信息}。
+        构建失败只记录日志，不抛出。
+        """
+        results: Dict[str, Optional[str]] = {}
+        start = time.perf_counter()
+        for name in names or list(self._builders):
+            try:
+                await asyncio.to_thread(self.get, name)
+                results[name] = None
+            except Exception as e:
+                logger.warning(f"Warmup of {name} failed: {e}")
+                results[name] = str(e)
+        self.record_timing("warmup", time.perf_counter() - start)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "llms": [f"{provider}/{model}" for provider, model in self._llms],
+            "components": list(self._components),
+            "timings": dict(self.timings),
+            "errors": dict(self.errors),
+        }
+
+
+llm_registry = LLMRegistry()
@@ -0,0 +1,370 @@
+import asyncio
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from loguru import logger
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+
+from src.configs.config import yaml_configs
+
+DEFAULT_ROUTER_OPTIONS = {
+    "providers": ["gemini", "deepseek"],  # 参与路由的 provider，顺序作为没有延迟数据时的优先级
+    "window": 100,                        # 每个 provider 保留最近多少次调用的延迟和结果
+    "min_samples": 5,                     # 样本数达到后才按该 provider 的延迟百分位对冲
+    "hedge_percentile": 95,               # 请求超过该百分位延迟仍未返回时，向下一个 provider 发对冲请求；None 关闭
+    "cooldown": 30,                       # 遇到 429/5xx 后该 provider 降级的秒数
+}
+
+# 延迟直方图的桶上限 (秒)，与 Prometheus histogram 的 `le` 含义一致
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, math.inf)
+
+_RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ServiceUnavailable", "ResourceExhausted"}
+
+
+def load_router_options() -> dict:
+    options = dict(DEFAULT_ROUTER_OPTIONS)
+    options.update(((yaml_configs or {}).get("llm") or {}).get("router") or {})
+    return options
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """
+    从 provider SDK 的异常中取出 HTTP 状态码 (openai 的 status_code、google api_core 的 code、
+    或 response.status_code)，取不到时从异常信息中匹配 429/5xx。
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        for value in (
+            getattr(exc, "status_code", None),
+            getattr(exc, "code", None),
+            getattr(getattr(exc, "response", None), "status_code", None),
+        ):
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+        match = re.search(r"\b(429|5\d\d)\b", str(exc))
+        if match:
+            return int(match.group(1))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429、5xx、超时和连接错误换一个 provider 可能成功；其他错误 (如 400) 换了也一样会失败。"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in _RETRYABLE_ERROR_NAMES:
+        return True
+    status = error_status(exc)
+    return status is not None and (status == 429 or status >= 500)
+
+
+class ProviderHealth:
+    """
+    记录每个 provider 最近的延迟、错误和降级状态，以及路由决策。
+    `latencies` 只记录完整调用的耗时 (排序和对冲延迟都基于它)；流式调用的首个 chunk 耗时
+    单独记录在 `first_chunk_latencies`，两者量级不同，混在一起会拉低对冲阈值。
+    bind_tools 产生的 RoutingChatModel 副本共享同一个实例。
+    """
+
+    def __init__(self, providers: Sequence[str], window: int, cooldown: float, max_decisions: int = 100):
+        self.providers = list(providers)
+        self.cooldown = cooldown
+        self.latencies = {name: deque(maxlen=window) for name in providers}
+        self.first_chunk_latencies = {name: deque(maxlen=window) for name in providers}
+        self.outcomes = {name: deque(maxlen=window) for name in providers}
+        self.histograms = {name: [0] * len(LATENCY_BUCKETS) for name in providers}
+        self.calls = Counter()
+        self.errors = Counter()
+        self.cooldown_until: Dict[str, float] = {}
+        self.decisions = Counter()
+        self.recent_decisions = deque(maxlen=max_decisions)
+
+    def record_success(self, name: str, latency: float) -> None:
+        self.calls[name] += 1
+        self.latencies[name].append(latency)
+        self.outcomes[name].append(True)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.histograms[name][i] += 1
+                break
+        self.cooldown_until.pop(name, None)
+
+    def record_first_chunk(self, name: str, latency: float) -> None:
+        """流式调用开始输出：provider 可用，但耗时不计入完整调用的延迟。"""
+        self.calls[name] += 1
+        self.first_chunk_latencies[name].append(latency)
+        self.outcomes[name].append(True)
+        self.cooldown_until.pop(name, None)
+
+    def record_error(self, name: str, exc: BaseException) -> None:
+        self.calls[name] += 1
+        self.errors[name] += 1
+        self.outcomes[name].append(False)
+        if is_retryable(exc):
+            self.cooldown_until[name] = time.monotonic() + self.cooldown
+
+    def record_decision(self, name: str, reason: str) -> None:
+        self.decisions[(name, reason)] += 1
+        self.recent_decisions.append({"provider": name, "reason": reason, "at": time.time()})
+        logger.debug(f"LLM router: {reason} -> {name}")
+
+    def percentile(self, name: str, q: float, first_chunk: bool = False) -> Optional[float]:
+        samples = sorted((self.first_chunk_latencies if first_chunk else self.latencies)[name])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def error_rate(self, name: str) -> float:
+        outcomes = self.outcomes[name]
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def in_cooldown(self, name: str) -> bool:
+        return self.cooldown_until.get(name, 0) > time.monotonic()
+
+    def ranked(self) -> List[str]:
+        """
+        健康的 provider 在前，按 p50 延迟 / 成功率 从小到大排序；还没有样本的 provider 排在最前面，
+        以便尽快得到它的延迟数据。降级中的 provider 放在最后，只在其他都失败时使用。
+        """
+        def score(name: str) -> float:
+            p50 = self.percentile(name, 50)
+            if p50 is None:
+                return 0.0
+            return p50 / max(0.05, 1.0 - self.error_rate(name))
+
+        order = {name: i for i, name in enumerate(self.providers)}
+        return sorted(self.providers, key=lambda n: (self.in_cooldown(n), score(n), order[n]))
+
+    def stats(self) -> Dict[str, Any]:
+        providers = {}
+        for name in self.providers:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(LATENCY_BUCKETS, self.histograms[name]):
+                cumulative += count
+                buckets["+Inf" if bound == math.inf else str(bound)] = cumulative
+            providers[name] = {
+                "calls": self.calls[name],
+                "errors": self.errors[name],
+                "error_rate": round(self.error_rate(name), 4),
+                "p50_seconds": self.percentile(name, 50),
+                "p95_seconds": self.percentile(name, 95),
+                "first_chunk_p50_seconds": self.percentile(name, 50, first_chunk=True),
+                "first_chunk_p95_seconds": self.percentile(name, 95, first_chunk=True),
+                "in_cooldown": self.in_cooldown(name),
+                "latency_histogram": buckets,
+            }
+        decisions = Counter()
+        for (name, reason), count in self.decisions.items():
+            decisions[f"{name}:{reason}"] = count
+        return {
+            "providers": providers,
+            "ranking": self.ranked(),
+            "decisions": dict(decisions),
+            "recent_decisions": list(self.recent_decisions),
+        }
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    把多个 chat model (CustomGeminiChatModel、CustomDeepSeekChatModel 等) 组合成一个 BaseChatModel。
+
+    - 每次调用选择当前最快且健康的 provider。
+    - 请求超过该 provider 的 `hedge_percentile` 延迟仍未返回时，向下一个 provider 发对冲请求，取先返回的结果。
+    - 遇到 429/5xx/超时时切换到下一个 provider，并让出错的 provider 降级 `cooldown` 秒。
+    - 路由决策和每个 provider 的延迟直方图可以通过 `routing_stats()` 查看。
+    """
+    providers: Dict[str, Any]
+    health: Any = None
+    bound: Dict[str, Any] = {}
+    min_samples: int = DEFAULT_ROUTER_OPTIONS["min_samples"]
+    hedge_percentile: Optional[float] = DEFAULT_ROUTER_OPTIONS["hedge_percentile"]
+    model_name: str = "router"
+
+    def __init__(self, **kwargs: Any):
+        window = kwargs.pop("window", DEFAULT_ROUTER_OPTIONS["window"])
+        cooldown = kwargs.pop("cooldown", DEFAULT_ROUTER_OPTIONS["cooldown"])
+        super().__init__(**kwargs)
+        if not self.providers:
+            raise ValueError("RoutingChatModel needs at least one provider.")
+        if self.health is None:
+            self.health = ProviderHealth(list(self.providers), window, cooldown)
+        if self.model_name == "router":
+            self.model_name = "router(" + ",".join(self.providers) + ")"
+
+    @classmethod
+    def from_config(cls, build: Callable[[str], BaseChatModel]) -> "RoutingChatModel":
+        """
+        按 `llm.router` 配置创建；`build(provider)` 创建单个 provider 的模型。
+        无法创建的 provider (例如缺少 API key) 会被跳过。
+        """
+        options = load_router_options()
+        providers = {}
+        for name in options["providers"]:
+            try:
+                providers[name] = build(name)
+            except Exception as e:
+                logger.warning(f"LLM router: skipping provider {name}: {e}")
+        if not providers:
+            raise ValueError(f"LLM router: none of the providers {options['providers']} could be created.")
+        return cls(
+            providers=providers,
+            window=options["window"],
+            cooldown=options["cooldown"],
+            min_samples=options["min_samples"],
+            hedge_percentile=options["hedge_percentile"],
+        )
+
+    def _runnable(self, name: str) -> Runnable:
+        return self.bound.get(name) or self.providers[name]
+
+    def _hedge_delay(self, name: str) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.health.latencies[name]) < self.min_samples:
+            return None
+        return self.health.percentile(name, self.hedge_percentile)
+
+    async def _timed(self, name: str, call: Callable[[str], Awaitable[Any]]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await call(name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.health.record_error(name, e)
+            logger.warning(f"LLM router: provider {name} failed after {time.perf_counter() - start:.2f}s: {e}")
+            raise
+        self.health.record_success(name, time.perf_counter() - start)
+        return result
+
+    async def _route(self, call: Callable[[str], Awaitable[Any]]) -> Any:
+        candidates = self.health.ranked()
+        pending: Dict[asyncio.Task, str] = {}
+        errors: List[BaseException] = []
+        next_index = 0
+        hedged = False
+
+        def launch(reason: str) -> None:
+            nonlocal next_index
+            name = candidates[next_index]
+            next_index += 1
+            self.health.record_decision(name, reason)
+            pending[asyncio.ensure_future(self._timed(name, call))] = name
+
+        launch("fastest")
+        try:
+            while pending:
+                timeout = None
+                if not hedged and len(pending) == 1 and next_index < len(candidates):
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    launch("hedge")
+                    continue
+                for task in done:
+                    pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    if not is_retryable(task.exception()):
+                        raise task.exception()
+                    errors.append(task.exception())
+                if not pending and next_index < len(candidates):
+                    launch("failover")
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """异步生成：按延迟路由，必要时对冲和切换 provider。"""
+        async def call(name: str):
+            return await self._runnable(name).ainvoke(messages, stop=stop, **kwargs)
+
+        message = await self._route(call)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """同步生成：没有对冲，只按顺序切换 provider。"""
+        last_error = None
+        for i, name in enumerate(self.health.ranked()):
+            self.health.record_decision(name, "fastest" if i == 0 else "failover")
+            start = time.perf_counter()
+            try:
+                message = self._runnable(name).invoke(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self.health.record_error(name, e)
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            self.health.record_success(name, time.perf_counter() - start)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        raise last_error
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """
+        流式生成：在收到第一个 chunk 之前出错可以切换 provider；已经输出内容后出错则直接抛出。
+        第一个 chunk 的到达时间单独记录 (见 `ProviderHealth.record_first_chunk`)。
+        """
+        last_error = None
+        for i, name in enumerate(self.health.ranked()):
+            self.health.record_decision(name, "fastest" if i == 0 else "failover")
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in self._runnable(name).astream(messages, stop=stop, **kwargs):
+                    if not started:
+                        started = True
+                        self.health.record_first_chunk(name, time.perf_counter() - start)
+                    if not isinstance(chunk, AIMessageChunk):
+                        chunk = AIMessageChunk(content=chunk.content)
+                    yield ChatGenerationChunk(message=chunk)
+                return
+            except Exception as e:
+                self.health.record_error(name, e)
+                if started or not is_retryable(e):
+                    raise
+                last_error = e
+        raise last_error
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Optional[str] = None, **kwargs: Any) -> Runnable:
+        """每个 provider 各自绑定工具，返回的路由模型与当前实例共享健康统计。"""
+        bound = {
+            name: model.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+            for name, model in self.providers.items()
+        }
+        return self.model_copy(update={"bound": bound})
+
+    def routing_stats(self) -> Dict[str, Any]:
+        return self.health.stats()
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing_chat_model"
@@ -0,0 +1,41 @@
+from typing import AsyncIterator, Callable
+
+from fastapi import HTTPException, Request
+
+from src.services.admission_control import AdmissionRejectedError, admission_controller
+
+
+def client_id(request: Request) -> str:
+    """
+    Identifies the caller for fair queuing: an explicit `X-Client-ID` header, else the first
+    `X-Forwarded-For` hop (the service runs behind a proxy), else the peer address.
+    """
+    explicit = request.headers.get("x-client-id")
+    if explicit:
+        return explicit
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def admission(endpoint: str) -> Callable[[Request], AsyncIterator[None]]:
+    """
+    Dependency that holds one of `endpoint`'s concurrency slots for the whole request,
+    including a streamed response body. Overloaded endpoints answer 503 with Retry-After.
+    """
+    async def dependency(request: Request) -> AsyncIterator[None]:
+        if not admission_controller.enabled:
+            yield
+            return
+        limiter = admission_controller.limiter(endpoint)
+        try:
+            await limiter.acquire(client_id(request))
+        except AdmissionRejectedError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    return dependency
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from loguru import logger
 
 from src.services.llm_service import LLMService
 from src.schemas.chat_schemas import AskRequest, AskResponse
-from src.llm.factory import get_llm
+from src.llm.registry import llm_registry
+from src.routers.admission import admission
+from src.routers.sse import sse_response
+from src.services.review_report import message_text
 
 # 1. 创建 Router
 router = APIRouter(
@@ -12,18 +17,21 @@ router = APIRouter(
 )
 
 # --- 依赖注入 ---
-# 这是一个简单的实现，在应用启动时创建一个单例
-# 更复杂的应用可能会使用更高级的依赖注入容器
-llm_model = get_llm()
-llm_service_instance = LLMService(llm_model)
+# LLMService 在第一次请求 (或启动时的后台 warmup) 时才创建，并在 registry 中缓存为单例，
+# 这样 import 本模块不会加载 LLM SDK，缺少 API key 也只会让 /chat 请求失败。
+llm_registry.register("llm_service", lambda: LLMService(llm_registry.get_llm()))
 
-def get_llm_service() -> LLMService:
-    return llm_service_instance
+async def get_llm_service() -> LLMService:
+    try:
+        return await asyncio.to_thread(llm_registry.get, "llm_service")
+    except Exception as e:
+        logger.error(f"Failed to initialize LLMService: {e}")
+        raise HTTPException(status_code=503, detail=f"LLM is not available: {e}")
 # --- 依赖注入结束 ---
 
 
 # 编写端点
-@router.post("/ask", response_model=AskResponse)
+@router.post("/ask", response_model=AskResponse, dependencies=[Depends(admission("chat"))])
 async def ask(
     request: AskRequest,
     llm_service: LLMService = Depends(get_llm_service)
@@ -31,7 +39,8 @@ async def ask(
     """
     接收一个问题，调用 LLMService 的 ainvoke 方法，并返回答案。
     """
-    logger.info(f"Received ask request with query: {request.query}")
+    logger.info(f"Received ask request ({len(request.query)} chars)")
+    logger.debug(f"Ask query: {request.query}")
     try:
         response = await llm_service.ainvoke(request.query)
         # response 是一个 AIMessage 对象，我们需要提取其内容
@@ -41,3 +50,52 @@ async def ask(
         logger.error(f"Error calling LLM service: {e}")
         # 在实际应用中，这里应该返回一个 HTTP 500 错误
         return AskResponse(answer=f"An error occurred: {e}")
+
+
+@router.post("/ask/stream", dependencies=[Depends(admission("chat"))])
+async def ask_stream(
+    request: AskRequest,
+    http_request: Request,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    """
+    与 /ask 相同，但以 SSE 逐块返回答案：`token` 事件携带文本片段，最后是 `done` 或 `error`。
+    客户端断开连接时会取消上游的 LLM 调用。
+    """
+    logger.info(f"Received streaming ask request ({len(request.query)} chars)")
+    logger.debug(f"Streaming ask query: {request.query}")
+
+    async def events():
+        try:
+            async for chunk in llm_service.astream(request.query):
+                text = message_text(chunk)
+                if text:
+                    yield "token", {"text": text}
+        except Exception as e:
+            logger.error(f"Error streaming from LLM service: {e}")
+            yield "error", {"message": f"An error occurred: {e}"}
+            return
+        yield "done", {}
+
+    return sse_response(http_request, events())
+
+
+@router.get("/cache/stats")
+async def cache_stats(llm_service: LLMService = Depends(get_llm_service)):
+    """
+    返回 /ask 响应缓存的命中率、节省的上游延迟等统计。
+    """
+    if llm_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_service.cache.stats()}
+
+
+@router.get("/llm/stats")
+async def llm_stats(llm_service: LLMService = Depends(get_llm_service)):
+    """
+    llm.provider 为 "router" 时，返回每个 provider 的调用数、错误率、延迟直方图和最近的路由决策。
+    """
+    routing_stats = getattr(llm_service.runnable, "routing_stats", None)
+    if routing_stats is None:
+        return {"routing": False}
+    return {"routing": True, **routing_stats()}
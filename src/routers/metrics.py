@@ -0,0 +1,138 @@
+import time
+from typing import Any, Dict, Iterable
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.llm.registry import llm_registry
+from src.services.admission_control import admission_controller
+from src.services.github_service import github_service
+from src.services.metrics import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUESTS_TOTAL,
+    MetricFamily,
+    metrics_registry,
+)
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead) recording handler latency,
+    status counts and in-flight requests. Latency runs until the last body chunk is sent, so
+    streamed responses are measured end to end. Routes are labelled by their template
+    (`/review/{job_id}`), never by the raw path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.labels(method, path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS_TOTAL.labels(method, path, status).inc()
+
+
+def _cache_families(name: str, stats: Dict[str, Any], hit_keys: Iterable[str], miss_key: str, ratio_key: str) -> Iterable[MetricFamily]:
+    hits = sum(stats.get(key, 0) for key in hit_keys)
+    yield f"{name}_hits_total", "counter", f"{name} lookups answered from the cache.", [({}, hits)]
+    yield f"{name}_misses_total", "counter", f"{name} lookups that missed.", [({}, stats.get(miss_key, 0))]
+    yield f"{name}_hit_ratio", "gauge", f"{name} hit ratio since start.", [({}, stats.get(ratio_key, 0.0))]
+
+
+def collect_component_metrics() -> Iterable[MetricFamily]:
+    """Reads the stats() each component already keeps, at scrape time only."""
+    yield from _cache_families(
+        "github_blob_cache", github_service.blob_cache.stats(), ("memory_hits", "disk_hits"), "misses", "hit_ratio"
+    )
+    if github_service.etag_store is not None:
+        etag = github_service.etag_store.stats()
+        yield from _cache_families(
+            "github_etag_revalidation",
+            {**etag, "misses": etag["conditional_requests"] - etag["not_modified"]},
+            ("not_modified",), "misses", "revalidation_hit_ratio",
+        )
+        if "memory_bytes" in etag:
+            yield "github_etag_cache_bytes", "gauge", "Response bodies held by the ETag store.", [({}, etag["memory_bytes"])]
+    repo_index = github_service.repo_index_cache.stats()
+    yield from _cache_families("github_repo_index", repo_index, ("hits",), "misses", "hit_ratio")
+    yield "github_repo_index_files", "gauge", "File paths held in repository indexes.", [({}, repo_index["files"])]
+    if github_service.git_source is not None:
+        mirror = github_service.git_source.stats()
+        yield "github_mirror_fetches_total", "counter", "git fetches into local mirrors.", [({}, mirror.get("fetches", 0))]
+        yield "github_mirror_blobs_read_total", "counter", "Blobs read from local mirrors.", [({}, mirror.get("blobs_read", 0))]
+    scheduler = github_service.scheduler.stats()
+    yield "github_requests_in_flight", "gauge", "GitHub API requests in flight.", [({}, scheduler["in_flight"])]
+    yield "github_request_retries_total", "counter", "GitHub API requests retried.", [({}, scheduler["retries"])]
+
+    llm_service = llm_registry.peek("llm_service")
+    if llm_service is not None and llm_service.cache is not None:
+        yield from _cache_families(
+            "llm_response_cache", llm_service.cache.stats(), ("hits", "coalesced"), "misses", "hit_ratio"
+        )
+    review_service = llm_registry.peek("review_service")
+    if review_service is not None and review_service.result_cache is not None:
+        yield from _cache_families(
+            "review_result_cache", review_service.result_cache.stats(), ("hits",), "misses", "hit_ratio"
+        )
+    review_job_queue = llm_registry.peek("review_job_queue")
+    if review_job_queue is not None:
+        jobs = review_job_queue.stats()
+        yield "review_jobs_queued", "gauge", "Review jobs waiting for a worker.", [({}, jobs["queued"])]
+        yield "review_jobs", "gauge", "Review jobs by status.", [({"status": s}, n) for s, n in jobs["jobs"].items()]
+        yield "review_jobs_cancelled_total", "counter", "Review jobs cancelled, e.g. superseded by a newer push.", [({}, jobs["cancelled"])]
+    review_webhook = llm_registry.peek("review_webhook")
+    if review_webhook is not None:
+        webhook = review_webhook.stats()
+        yield "review_webhook_events_total", "counter", "pull_request webhook deliveries by outcome.", [
+            ({"outcome": outcome}, webhook[outcome]) for outcome in ("ignored", "superseded", "submitted")
+        ]
+        yield "review_webhook_pending", "gauge", "PRs waiting for their debounce period.", [({}, webhook["pending"])]
+
+    admission = admission_controller.stats()["endpoints"]
+    yield "admission_active", "gauge", "Requests holding an admission slot.", [
+        ({"endpoint": name}, s["active"]) for name, s in admission.items()
+    ]
+    yield "admission_queue_depth", "gauge", "Requests waiting for an admission slot.", [
+        ({"endpoint": name}, s["queue_depth"]) for name, s in admission.items()
+    ]
+    yield "admission_wait_seconds_total", "counter", "Total time spent waiting for admission.", [
+        ({"endpoint": name}, s["wait_seconds_total"]) for name, s in admission.items()
+    ]
+    yield "admission_shed_total", "counter", "Requests rejected with 503.", [
+        ({"endpoint": name, "reason": reason}, count) for name, s in admission.items() for reason, count in s["shed"].items()
+    ]
+
+
+metrics_registry.register_collector(collect_component_metrics)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics_registry.render(), media_type=CONTENT_TYPE)
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
 from loguru import logger
 
-from src.schemas.review_schemas import CodeReviewRequest, CodeReviewResponse
+from src.routers.admission import admission
+from src.routers.sse import ndjson_response, sse_response
+from src.schemas.review_schemas import CodeReviewRequest, ReviewBatchRequest, ReviewJobResponse
 from src.services.code_review_service import CodeReviewService
-from src.agents.code_review_agent import create_code_review_agent
+from src.services.github_scheduler import GitHubRequestError
+from src.services.review_batch import ReviewBatch
+from src.services.review_job_queue import ReviewJobQueue, ReviewQueueFullError
+from src.services.tracing import trace_stream, tracer
+from src.llm.factory import get_llm_identity
+from src.llm.registry import llm_registry
 
 # 1. Create Router
 router = APIRouter(
@@ -12,40 +22,125 @@ router = APIRouter(
 )
 
 # --- Dependency Injection ---
-# Create a singleton instance of CodeReviewService
-# We create the agent executor once and reuse it
-try:
-    agent_executor = create_code_review_agent()
-    review_service_instance = CodeReviewService(agent_executor)
-except Exception as e:
-    logger.error(f"Failed to initialize CodeReviewService: {e}")
-    # In a real app, this might prevent startup, but for now we log it
-    review_service_instance = None
-
-def get_review_service() -> CodeReviewService:
-    if review_service_instance is None:
-        raise HTTPException(status_code=500, detail="CodeReviewService is not initialized")
-    return review_service_instance
+# The LLM, agent graph and service are built on first use (or by the startup warmup),
+# so importing this module stays cheap and a missing API key only fails review requests.
+def build_review_service() -> CodeReviewService:
+    from src.agents.code_review_agent import create_code_review_agent, create_file_review_chain
+
+    llm = llm_registry.get_llm()
+    agent_executor = create_code_review_agent(llm)
+    # Used when `review.mode` is "map_reduce"
+    file_reviewer = create_file_review_chain(llm)
+    return CodeReviewService(agent_executor, file_reviewer=file_reviewer, model_id=get_llm_identity(llm))
+
+llm_registry.register("review_service", build_review_service)
+# Reviews run in background workers; stopped by the app lifespan
+llm_registry.register("review_job_queue", lambda: ReviewJobQueue(llm_registry.get("review_service")))
+
+async def _get_component(name: str):
+    try:
+        # Building may import langchain and create clients; keep it off the event loop
+        return await asyncio.to_thread(llm_registry.get, name)
+    except Exception as e:
+        logger.error(f"Failed to initialize CodeReviewService: {e}")
+        raise HTTPException(status_code=500, detail=f"CodeReviewService is not initialized: {e}")
+
+async def get_review_service() -> CodeReviewService:
+    return await _get_component("review_service")
+
+async def get_review_job_queue() -> ReviewJobQueue:
+    queue = await _get_component("review_job_queue")
+    await queue.start()
+    return queue
+
+def peek_review_job_queue() -> Optional[ReviewJobQueue]:
+    # Reading a job must not build the LLM: before the first submission there are no jobs
+    return llm_registry.peek("review_job_queue")
 # --- End Dependency Injection ---
 
 
-# 2. Define Endpoint
-@router.post("", response_model=CodeReviewResponse)
+# 2. Define Endpoints
+@router.post("", response_model=ReviewJobResponse, status_code=202)
 async def create_code_review(
     request: CodeReviewRequest,
-    service: CodeReviewService = Depends(get_review_service)
+    queue: ReviewJobQueue = Depends(get_review_job_queue)
 ):
     """
-    Triggers an AI code review for the given GitHub Pull Request URL.
+    Queues an AI code review for the given GitHub Pull Request URL and returns the job immediately.
+    Poll `GET /review/{job_id}` or pass `callback_url` to receive the finished job.
+    Submissions for a PR head that is already queued, running or reviewed return the existing job.
     """
     logger.info(f"Received code review request for: {request.pull_request_url}")
-    
-    result = await service.perform_code_review(request.pull_request_url)
-    
-    if result.startswith("Error:") or result.startswith("An error occurred"):
-         # You might want to return 400 or 500 depending on the error type
-         # For now, we return 200 with the error message in the report, or we could raise HTTPException
-         # Let's wrap it in the response
-         pass
-    
-    return CodeReviewResponse(review_report=result)
+    # The job's review span (run later by a worker) is parented on this span
+    with tracer.span("review_router.create_code_review", {"review.pr_url": request.pull_request_url}) as span:
+        try:
+            job = await queue.submit(request.pull_request_url, callback_url=request.callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ReviewQueueFullError as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        span.set_attributes({"review.job_id": job["id"], "review.job_status": job["status"]})
+    return ReviewJobResponse.from_job(job)
+
+
+@router.post("/stream", dependencies=[Depends(admission("review"))])
+async def stream_code_review(
+    request: CodeReviewRequest,
+    http_request: Request,
+    service: CodeReviewService = Depends(get_review_service)
+):
+    """
+    Runs the review in this request and streams its progress as Server-Sent Events:
+    review_started, tool_start, files_fetched, token, file_fetched, file_reviewed,
+    then `report` (the markdown report) or `error`.
+    Disconnecting cancels the review, including in-flight LLM calls.
+    """
+    logger.info(f"Received streaming code review request for: {request.pull_request_url}")
+    try:
+        service.parse_pr_url(request.pull_request_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events = trace_stream(
+        "review_router.stream_code_review", {"review.pr_url": request.pull_request_url},
+        service.stream_code_review(request.pull_request_url),
+    )
+    return sse_response(http_request, events)
+
+
+@router.post("/batch")
+async def review_batch(
+    request: ReviewBatchRequest,
+    http_request: Request,
+    queue: ReviewJobQueue = Depends(get_review_job_queue)
+):
+    """
+    Reviews many Pull Requests, given as `pull_request_urls` or as `repo_owner`/`repo_name`
+    plus a `state` filter, and streams newline-delimited JSON: one `result` record per PR as
+    it finishes, then a `summary` record with aggregate timing. The PRs run as ordinary review
+    jobs, sharing the worker pool, deduplication and caches with single reviews.
+    """
+    batch = ReviewBatch(queue)
+    try:
+        targets = await batch.resolve_targets(
+            request.pull_request_urls, request.repo_owner, request.repo_name, request.state, request.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except GitHubRequestError as e:
+        raise HTTPException(status_code=502, detail=f"Could not list pull requests: {e}")
+    logger.info(f"Received review batch of {len(targets)} pull requests.")
+    return ndjson_response(http_request, batch.run(targets))
+
+
+@router.get("/{job_id}", response_model=ReviewJobResponse)
+async def get_code_review_job(
+    job_id: str,
+    queue: Optional[ReviewJobQueue] = Depends(peek_review_job_queue)
+):
+    """
+    Returns the status of a review job, including the report once it has succeeded.
+    """
+    job = queue.get(job_id) if queue is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Review job {job_id} not found")
+    return ReviewJobResponse.from_job(job)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def format_ndjson_record(record: Dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+async def _wait_for_disconnect(request: Request, poll_interval: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_interval)
+
+
+async def _paced_stream(
+    request: Request, items: AsyncIterator[Any], render: Callable[[Any], str], poll_interval: float
+) -> AsyncIterator[str]:
+    iterator = items.__aiter__()
+    watcher = asyncio.create_task(_wait_for_disconnect(request, poll_interval))
+    try:
+        while True:
+            next_event = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_event, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event not in done:
+                logger.info(f"Client disconnected from {request.url.path}, cancelling the stream.")
+                next_event.cancel()
+                await asyncio.gather(next_event, return_exceptions=True)
+                break
+            try:
+                item = next_event.result()
+            except StopAsyncIteration:
+                break
+            yield render(item)
+    finally:
+        watcher.cancel()
+        await iterator.aclose()
+
+
+def sse_stream(
+    request: Request, events: AsyncIterator[Tuple[str, Dict[str, Any]]], poll_interval: float = 0.5
+) -> AsyncIterator[str]:
+    """
+    Formats (event, data) pairs as Server-Sent Events.
+
+    Each event is only produced after the previous one was handed to the server, so the
+    producer is paced by the client. The client connection is watched while waiting for the
+    next event; on disconnect the pending step is cancelled and `events` is closed, which
+    lets the producer abort its upstream LLM/GitHub calls.
+    """
+    return _paced_stream(request, events, lambda event: format_sse_event(*event), poll_interval)
+
+
+def ndjson_stream(request: Request, records: AsyncIterator[Dict[str, Any]], poll_interval: float = 0.5) -> AsyncIterator[str]:
+    """Same pacing and disconnect handling as `sse_stream`, one JSON object per line."""
+    return _paced_stream(request, records, format_ndjson_record, poll_interval)
+
+
+def sse_response(request: Request, events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> StreamingResponse:
+    return StreamingResponse(sse_stream(request, events), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def ndjson_response(request: Request, records: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    return StreamingResponse(ndjson_stream(request, records), media_type="application/x-ndjson", headers=SSE_HEADERS)
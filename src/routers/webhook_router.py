@@ -0,0 +1,63 @@
+import json
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from loguru import logger
+
+from src.llm.registry import llm_registry
+from src.routers.review_router import _get_component
+from src.services.review_webhook import ReviewWebhookDispatcher, load_webhook_options, verify_signature
+from src.services.tracing import tracer
+
+router = APIRouter(
+    prefix="/webhook",
+    tags=["webhook"],
+)
+
+# Built on the first verified delivery, after the review job queue it submits to
+llm_registry.register("review_webhook", lambda: ReviewWebhookDispatcher(llm_registry.get("review_job_queue")))
+
+
+def _webhook_secret() -> str:
+    return os.getenv(load_webhook_options()["secret_env"], "")
+
+
+@router.post("/github", status_code=202)
+async def github_webhook(
+    request: Request,
+    response: Response,
+    x_github_event: str = Header(...),
+    x_hub_signature_256: Optional[str] = Header(None),
+    x_github_delivery: Optional[str] = Header(None),
+):
+    """
+    Receives GitHub `pull_request` webhooks. Deliveries must be signed with the secret in
+    `review.webhook.secret_env`. `opened`/`synchronize` events schedule a review of the new
+    head after a debounce period and cancel reviews of older heads of the same PR.
+    """
+    body = await request.body()
+    secret = _webhook_secret()
+    if not secret:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+    # Checked before anything is built, so unsigned traffic never initializes the review service
+    if not verify_signature(secret, body, x_hub_signature_256):
+        logger.warning(f"Rejected webhook delivery {x_github_delivery}: invalid signature.")
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body is not valid JSON")
+
+    dispatcher: ReviewWebhookDispatcher = await _get_component("review_webhook")
+    with tracer.span("webhook_router.github_webhook", {
+        "github.event": x_github_event, "github.delivery": x_github_delivery, "github.action": payload.get("action"),
+    }) as span:
+        try:
+            result = await dispatcher.handle_event(x_github_event, payload)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        span.set_attribute("webhook.status", result["status"])
+    if result["status"] != "scheduled":
+        response.status_code = 200
+    return {"delivery": x_github_delivery, **result}
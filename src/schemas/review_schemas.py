@@ -1,3 +1,4 @@
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class CodeReviewRequest(BaseModel):
@@ -5,9 +6,49 @@ class CodeReviewRequest(BaseModel):
     Request model for triggering a code review.
     """
     pull_request_url: str = Field(..., description="The full URL of the GitHub Pull Request to review.")
+    callback_url: Optional[str] = Field(None, description="Optional http(s) URL that receives the finished job as a JSON POST. The host must be on the allowed callback hosts and resolve to a public address; otherwise the request is rejected with 400. Redirects from the callback are not followed.")
+
+class ReviewBatchRequest(BaseModel):
+    """
+    Request model for reviewing several Pull Requests at once: either explicit URLs,
+    or the PRs of one repository filtered by state.
+    """
+    pull_request_urls: Optional[List[str]] = Field(None, description="Pull Request URLs to review.")
+    repo_owner: Optional[str] = Field(None, description="Review the PRs of this repository instead of explicit URLs.")
+    repo_name: Optional[str] = Field(None, description="Repository name, used together with repo_owner.")
+    state: str = Field("open", description="PR state filter for repository batches: open, closed or all.")
+    limit: Optional[int] = Field(None, ge=1, description="Maximum number of PRs taken from the repository listing.")
 
 class CodeReviewResponse(BaseModel):
     """
     Response model containing the code review report.
     """
     review_report: str = Field(..., description="The markdown formatted code review report.")
+
+class ReviewJobResponse(BaseModel):
+    """
+    Response model describing an asynchronous code review job.
+    """
+    job_id: str = Field(..., description="The id to poll with GET /review/{job_id}.")
+    status: str = Field(..., description="One of: queued, running, succeeded, failed, cancelled.")
+    pull_request_url: str = Field(..., description="The reviewed Pull Request URL.")
+    head_sha: Optional[str] = Field(None, description="The PR head commit the review was deduplicated on.")
+    created_at: float = Field(..., description="Submission time (unix seconds).")
+    started_at: Optional[float] = Field(None, description="Time a worker picked up the job.")
+    finished_at: Optional[float] = Field(None, description="Completion time.")
+    review_report: Optional[str] = Field(None, description="The markdown report once the job has succeeded.")
+    error: Optional[str] = Field(None, description="The error message if the job failed.")
+
+    @classmethod
+    def from_job(cls, job: dict) -> "ReviewJobResponse":
+        return cls(
+            job_id=job["id"],
+            status=job["status"],
+            pull_request_url=job["pr_url"],
+            head_sha=job["head_sha"],
+            created_at=job["created_at"],
+            started_at=job["started_at"],
+            finished_at=job["finished_at"],
+            review_report=job["result"],
+            error=job["error"],
+        )
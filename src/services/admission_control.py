@@ -0,0 +1,175 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+# 每个端点的默认参数，可通过 yaml 的 `admission.endpoints.<name>` 覆盖
+DEFAULT_ADMISSION_OPTIONS: Dict[str, Any] = {
+    "max_concurrency": 8,   # 同时调用 LLM 的请求数
+    "max_queue": 32,        # 等待队列上限，满了直接 503
+    "queue_timeout": 10,    # 在队列中最多等待的秒数，超时 503
+}
+
+# 等待时间直方图的桶上限 (秒)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+
+def load_admission_options(name: str) -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("admission") or {}).get("endpoints") or {}
+    return {**DEFAULT_ADMISSION_OPTIONS, **(configured.get(name) or {})}
+
+
+class AdmissionRejectedError(Exception):
+    """请求没有被放行：队列已满 (`queue_full`) 或等待超时 (`timeout`)。"""
+
+    def __init__(self, endpoint: str, reason: str, retry_after: int):
+        super().__init__(f"{endpoint} is overloaded ({reason}), retry in {retry_after}s")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    单个端点的并发限制器。
+
+    - 最多 `max_concurrency` 个请求同时执行，其余请求进入等待队列。
+    - 队列按客户端公平调度：每个客户端有自己的 FIFO，释放的名额在有等待请求的客户端之间轮转，
+      一个客户端的突发请求不会让其他客户端一直排队。
+    - 队列已满或等待超过 `queue_timeout` 时立即拒绝 (调用方返回 503)，而不是让请求堆积到 LLM provider。
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.queue_depth = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+        self.wait_seconds_total = 0.0
+        self.wait_histogram = [0] * len(WAIT_BUCKETS)
+
+    @classmethod
+    def from_config(cls, name: str) -> "AdmissionLimiter":
+        options = load_admission_options(name)
+        return cls(name, options["max_concurrency"], options["max_queue"], options["queue_timeout"])
+
+    def _record_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += seconds
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if seconds <= bound:
+                self.wait_histogram[i] += 1
+                break
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        self.shed[reason] += 1
+        logger.warning(
+            f"Admission: shedding {self.name} request ({reason}); active={self.active}, queued={self.queue_depth}"
+        )
+        return AdmissionRejectedError(self.name, reason, max(1, math.ceil(self.queue_timeout)))
+
+    def _remove_waiter(self, client_id: str, waiter: asyncio.Future) -> None:
+        queue = self._waiters.get(client_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.queue_depth -= 1
+            if not queue:
+                del self._waiters[client_id]
+
+    async def acquire(self, client_id: str) -> None:
+        start = time.perf_counter()
+        if self.active < self.max_concurrency and not self.queue_depth:
+            self.active += 1
+            self._record_wait(0.0)
+            return
+        if self.queue_depth >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client_id, deque()).append(waiter)
+        self.queue_depth += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._remove_waiter(client_id, waiter)
+                raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # 客户端断开：还在排队就出队；如果名额刚好已经交给了它，转交给下一个请求
+            if waiter.done():
+                self.release()
+            else:
+                self._remove_waiter(client_id, waiter)
+            raise
+        self._record_wait(time.perf_counter() - start)
+
+    def release(self) -> None:
+        """释放一个名额；有等待的请求时直接交给下一个客户端 (轮转)，active 数不变。"""
+        while self._waiters:
+            client_id, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            self.queue_depth -= 1
+            # 当前客户端移到队尾，下一次轮到其他客户端
+            del self._waiters[client_id]
+            if queue:
+                self._waiters[client_id] = queue
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, client_id: str) -> AsyncIterator[None]:
+        await self.acquire(client_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(WAIT_BUCKETS, self.wait_histogram):
+            cumulative += count
+            buckets["+Inf" if bound == math.inf else str(bound)] = cumulative
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "queued_clients": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_histogram": buckets,
+        }
+
+
+class AdmissionController:
+    """按端点名称 (例如 "chat"、"review") 持有 AdmissionLimiter，第一次使用时按配置创建。"""
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = ((yaml_configs or {}).get("admission") or {}).get("enabled", True)
+        self.enabled = enabled
+        self.limiters: Dict[str, AdmissionLimiter] = {}
+
+    def limiter(self, name: str) -> AdmissionLimiter:
+        if name not in self.limiters:
+            self.limiters[name] = AdmissionLimiter.from_config(name)
+        return self.limiters[name]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "endpoints": {name: l.stats() for name, l in self.limiters.items()}}
+
+
+admission_controller = AdmissionController()
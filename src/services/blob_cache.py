@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+# (repo_owner, repo_name, path, commit_sha)
+BlobKey = Tuple[str, str, str, str]
+
+# Path placeholder for objects addressed by their git blob SHA rather than (path, commit SHA).
+GIT_BLOB_PATH = ":blob"
+
+_SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+DEFAULT_BLOB_CACHE_OPTIONS: Dict[str, Any] = {
+    "max_bytes": 64 * 1024 * 1024,      # in-process LRU budget
+    "max_item_bytes": 8 * 1024 * 1024,  # larger blobs skip the memory tier
+    "disk_dir": None,                   # optional on-disk tier, disabled by default
+}
+
+
+def load_blob_cache_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("github") or {}).get("blob_cache") or {}
+    return {**DEFAULT_BLOB_CACHE_OPTIONS, **configured}
+
+
+def is_immutable_ref(ref: str) -> bool:
+    """Only full commit SHAs address immutable content; branch names and short SHAs can move."""
+    return bool(ref) and _SHA_PATTERN.match(ref) is not None
+
+
+class BlobCache:
+    """
+    Tiered, content-addressed cache for file contents keyed by (repo, path, commit SHA).
+
+    Tier 1 is an in-process LRU bounded by a byte budget. Tier 2 is an optional directory
+    on disk; blobs found there are promoted back into memory when they fit. Because the
+    key includes a full commit SHA the entries never need invalidation.
+
+    Async callers use `aget`/`aput`, which do the disk tier's file I/O in a worker thread
+    so a slow disk never blocks the event loop.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_BLOB_CACHE_OPTIONS["max_bytes"],
+        max_item_bytes: int = DEFAULT_BLOB_CACHE_OPTIONS["max_item_bytes"],
+        disk_dir: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self.disk_dir = disk_dir
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._entries: "OrderedDict[BlobKey, Tuple[str, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls) -> "BlobCache":
+        return cls(**load_blob_cache_options())
+
+    def get(self, key: BlobKey) -> Optional[str]:
+        content = self._get_memory(key)
+        if content is not None:
+            return content
+        return self._record_disk_read(key, self._read_disk(key))
+
+    def put(self, key: BlobKey, content: str) -> None:
+        self._put_memory(key, content)
+        self._write_disk(key, content)
+
+    async def aget(self, key: BlobKey) -> Optional[str]:
+        content = self._get_memory(key)
+        if content is not None:
+            return content
+        on_disk = await asyncio.to_thread(self._read_disk, key) if self.disk_dir else None
+        return self._record_disk_read(key, on_disk)
+
+    async def aput(self, key: BlobKey, content: str) -> None:
+        self._put_memory(key, content)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, content)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    # --- memory tier ---
+
+    def _get_memory(self, key: BlobKey) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            self.bytes_saved += entry[1]
+            return entry[0]
+
+    def _put_memory(self, key: BlobKey, content: str) -> None:
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._remember(key, content, size)
+
+    def _record_disk_read(self, key: BlobKey, content: Optional[str]) -> Optional[str]:
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            size = len(content.encode("utf-8"))
+            self.disk_hits += 1
+            self.bytes_saved += size
+            self._remember(key, content, size)
+        return content
+
+    # caller holds the lock
+
+    def _remember(self, key: BlobKey, content: str, size: int) -> None:
+        if size > self.max_item_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        self._entries[key] = (content, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    # --- disk tier ---
+
+    def _disk_path(self, key: BlobKey) -> str:
+        digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], digest)
+
+    def _read_disk(self, key: BlobKey) -> Optional[str]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Failed to read cached blob {path}: {e}")
+            return None
+
+    def _write_disk(self, key: BlobKey, content: str) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content.encode("utf-8"))
+            # Atomic rename so concurrent readers never see a partial blob.
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write cached blob {path}: {e}")
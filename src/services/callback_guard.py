@@ -0,0 +1,87 @@
+import asyncio
+import ipaddress
+import socket
+from typing import Iterable, List, Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver, ResolveResult
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+def is_public_address(address: IPAddress) -> bool:
+    """False for loopback, private, link-local (incl. cloud metadata), reserved and multicast addresses."""
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def host_is_allowed(host: str, allowed_hosts: Sequence[str]) -> bool:
+    """An empty allowlist admits any host; `*.example.com` admits subdomains of example.com."""
+    if not allowed_hosts:
+        return True
+    host = host.lower().rstrip(".")
+    for pattern in allowed_hosts:
+        pattern = pattern.lower().rstrip(".")
+        if pattern.startswith("*.") and host.endswith(pattern[1:]):
+            return True
+        if host == pattern:
+            return True
+    return False
+
+
+async def validate_callback_url(url: str, allowed_hosts: Sequence[str] = (), allow_private: bool = False) -> str:
+    """
+    Checks a caller-supplied callback URL before the server agrees to POST to it: http(s) only,
+    host on the allowlist, and (unless `allow_private`) every address the host resolves to
+    must be public. Returns the URL.
+
+    :raises ValueError: the URL is rejected
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError("callback_url must use http or https")
+    if not parts.hostname:
+        raise ValueError("callback_url has no host")
+    if parts.username or parts.password:
+        raise ValueError("callback_url must not contain credentials")
+    if not host_is_allowed(parts.hostname, allowed_hosts):
+        raise ValueError(f"callback_url host {parts.hostname} is not in the allowed callback hosts")
+    if allow_private:
+        return url
+
+    try:
+        addresses: Iterable[str] = [str(ipaddress.ip_address(parts.hostname))]
+    except ValueError:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                parts.hostname, parts.port or 443, type=socket.SOCK_STREAM
+            )
+        except (OSError, UnicodeError) as e:
+            raise ValueError(f"callback_url host {parts.hostname} does not resolve: {e}")
+        addresses = {info[4][0] for info in infos}
+    for address in addresses:
+        if not is_public_address(ipaddress.ip_address(address.split("%", 1)[0])):
+            raise ValueError(f"callback_url host {parts.hostname} resolves to a non-public address")
+    return url
+
+
+class PublicOnlyResolver(AbstractResolver):
+    """
+    Resolver for the callback session that refuses hosts resolving to non-public addresses,
+    so a name that passed `validate_callback_url` cannot be re-pointed at an internal address
+    before the callback is sent (DNS rebinding).
+    """
+
+    def __init__(self, resolver: Optional[AbstractResolver] = None):
+        self._resolver = resolver or aiohttp.ThreadedResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[ResolveResult]:
+        results = await self._resolver.resolve(host, port, family)
+        if any(not is_public_address(ipaddress.ip_address(result["host"].split("%", 1)[0])) for result in results):
+            raise OSError(f"Refusing callback to {host}: resolves to a non-public address")
+        return results
+
+    async def close(self) -> None:
+        await self._resolver.close()
@@ -1,11 +1,68 @@
+import asyncio
+import json
 import re
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 from loguru import logger
-from src.agents.code_review_agent import create_code_review_agent
 from langchain_core.runnables import Runnable
 
+from src.agents.code_review_agent import FILE_REVIEW_PROMPT, SYSTEM_PROMPT
+from src.configs.config import yaml_configs
+from src.services.github_scheduler import GitHubRequestError
+from src.services.github_service import GitHubService, github_service
+from src.services.map_reduce_review import MapReduceReviewer
+from src.services.metrics import AGENT_STEPS, REVIEW_SECONDS
+from src.services.review_events import ReviewEventCallback, emit
+from src.services.review_report import REPORT_TITLE, message_text, parse_review_report, render_review_report
+from src.services.review_result_cache import ReviewResultCache, prompt_hash
+from src.services.review_state_store import ReviewStateStore
+from src.services.tracing import NOOP_SPAN, tracer
+from src.tools.github_tools import review_file_scope
+
+_FROM_CONFIG = object()
+_AGENT_MODEL_STEPS = AGENT_STEPS.labels("model")
+_AGENT_TOOL_STEPS = AGENT_STEPS.labels("tool")
+
 class CodeReviewService:
-    def __init__(self, agent_executor: Runnable):
+    REVIEW_MODES = ("agent", "map_reduce")
+
+    def __init__(
+        self,
+        agent_executor: Runnable,
+        github: Optional[GitHubService] = None,
+        state_store: Optional[ReviewStateStore] = None,
+        incremental: Optional[bool] = None,
+        file_reviewer: Optional[Runnable] = None,
+        mode: Optional[str] = None,
+        result_cache: Any = _FROM_CONFIG,
+        model_id: Optional[str] = None,
+    ):
+        """
+        :param file_reviewer: per-file review chain (see `create_file_review_chain`), required for "map_reduce" mode
+        :param mode: "agent" sends the whole PR through one agent turn, "map_reduce" reviews files in parallel;
+            defaults to `review.mode` in the yaml config
+        :param result_cache: ReviewResultCache for finished reports; defaults to `review.result_cache`, None disables it
+        :param model_id: "provider/model" of the reviewing LLM (see `get_llm_identity`), part of the cache key
+        """
         self.agent_executor = agent_executor
+        self.github_service = github or github_service
+        self.state_store = state_store or ReviewStateStore.from_config()
+        review_config = (yaml_configs or {}).get("review") or {}
+        self.incremental = review_config.get("incremental", True) if incremental is None else incremental
+        self.mode = mode or review_config.get("mode", "agent")
+        if self.mode not in self.REVIEW_MODES:
+            raise ValueError(f"Unknown review mode '{self.mode}', expected one of {self.REVIEW_MODES}")
+        self._review_seconds = REVIEW_SECONDS.labels(self.mode)
+        self.map_reduce = None
+        if self.mode == "map_reduce":
+            if file_reviewer is None:
+                raise ValueError("map_reduce review mode requires a file_reviewer")
+            self.map_reduce = MapReduceReviewer(file_reviewer, self.github_service)
+        self.result_cache = ReviewResultCache.from_config() if result_cache is _FROM_CONFIG else result_cache
+        provider = ((yaml_configs or {}).get("llm") or {}).get("provider", "gemini")
+        self.model_id = model_id or f"{provider}/default"
+        # Reports produced by another model or prompt are never reused
+        self.prompt_hash = prompt_hash(self.mode, SYSTEM_PROMPT if self.mode == "agent" else FILE_REVIEW_PROMPT)
 
     @classmethod
     def parse_pr_url(cls, url: str) -> dict:
@@ -17,19 +74,109 @@ class CodeReviewService:
         match = re.search(pattern, url)
         if not match:
             raise ValueError(f"Invalid GitHub PR URL: {url}")
-        
+
         return {
             "repo_owner": match.group(1),
             "repo_name": match.group(2),
             "pull_number": int(match.group(3))
         }
 
-    async def perform_code_review(self, pr_url: str) -> str:
+    @staticmethod
+    def _extract_output(result: Dict[str, Any]) -> str:
+        """
+        Extracts the final text from the agent's message list.
+        """
+        messages = result.get("messages", [])
+        if not messages:
+            return ""
+        # Get the last AI message content
+        return message_text(messages[-1])
+
+    async def _plan_review(self, pr_info: dict) -> Optional[Dict[str, Any]]:
+        """
+        Decides between a full and an incremental review.
+
+        Returns None when the PR's SHAs are not needed (incremental mode and result cache off)
+        or could not be resolved. Otherwise returns the PR's current SHAs, the previous review
+        state (if it can be built upon) and `changed_files`: None for a full review, or the
+        files changed since the previously reviewed head.
+        """
+        if not self.incremental and self.result_cache is None:
+            return None
+        owner, repo, number = pr_info["repo_owner"], pr_info["repo_name"], pr_info["pull_number"]
+        try:
+            pr_data = await self.github_service.get_pull_request(owner, repo, number)
+        except GitHubRequestError as e:
+            logger.warning(f"Could not resolve PR head for incremental review, doing a full review: {e}")
+            return None
+
+        plan = {
+            "head_sha": pr_data["head"]["sha"],
+            "base_sha": pr_data["base"]["sha"],
+            "previous": None,
+            "changed_files": None,
+        }
+        if not self.incremental:
+            return plan
+        previous = await self.state_store.aget(owner, repo, number)
+        if previous is None:
+            return plan
+        if previous.get("model_id") != self.model_id or previous.get("prompt_hash") != self.prompt_hash:
+            logger.info("Model or prompt changed since the last review, doing a full review.")
+            return plan
+        if previous["base_sha"] != plan["base_sha"]:
+            logger.info("PR base moved since the last review, doing a full review.")
+            return plan
+        if previous["head_sha"] == plan["head_sha"]:
+            plan.update(previous=previous, changed_files=[])
+            return plan
+
+        try:
+            comparison = await self.github_service.compare_commits(owner, repo, previous["head_sha"], plan["head_sha"])
+        except GitHubRequestError as e:
+            logger.warning(f"Could not compare with the last reviewed head, doing a full review: {e}")
+            return plan
+        # A force-push (diverged) or a huge delta cannot be reviewed incrementally.
+        if comparison["status"] != "ahead" or comparison["truncated"]:
+            logger.info(f"Head is {comparison['status']} of the last reviewed head, doing a full review.")
+            return plan
+
+        plan.update(previous=previous, changed_files=comparison["files"])
+        logger.info(
+            f"Incremental review: {len(comparison['files'])} files changed since {previous['head_sha'][:7]}."
+        )
+        return plan
+
+    def _merge_with_previous(self, plan: Dict[str, Any], summary: str, findings: list) -> str:
+        """
+        Combines findings for the re-reviewed files with the previous findings for untouched files.
+        """
+        previous = plan["previous"]
+        changed = set(plan["changed_files"])
+        carried = [finding for finding in previous["findings"] if finding["filename"] not in changed]
+        note = (
+            f"_Incremental review: {len(changed)} file(s) changed since {previous['head_sha'][:7]} were re-reviewed; "
+            f"{len(carried)} finding(s) carried over from the previous review._"
+        )
+        summary = f"{summary}\n\n{note}" if summary else note
+        return render_review_report(summary, findings + carried)
+
+    async def perform_code_review(self, pr_url: str, on_event: Optional[ReviewEventCallback] = None) -> str:
         """
         Orchestrates the code review process.
+        When a previous review of the PR exists, only files changed since its head are sent to the agent.
+        `on_event`, if given, receives progress events (see `stream_code_review`).
         """
+        start = time.perf_counter()
+        try:
+            with tracer.span("review.perform_code_review", {"review.pr_url": pr_url, "review.mode": self.mode}) as span:
+                return await self._perform_code_review(pr_url, on_event, span)
+        finally:
+            self._review_seconds.observe(time.perf_counter() - start)
+
+    async def _perform_code_review(self, pr_url: str, on_event: Optional[ReviewEventCallback], span: Any = NOOP_SPAN) -> str:
         logger.info(f"Starting code review for PR: {pr_url}")
-        
+
         # 1. Validate URL
         try:
             pr_info = self.parse_pr_url(pr_url)
@@ -38,7 +185,149 @@ class CodeReviewService:
             logger.error(f"URL parsing error: {e}")
             return f"Error: {str(e)}"
 
-        # 2. Construct Prompt for Agent
+        owner, repo, number = pr_info["repo_owner"], pr_info["repo_name"], pr_info["pull_number"]
+        plan = await self._plan_review(pr_info)
+        cached = None
+        if plan is not None and self.result_cache is not None:
+            cached = await self.result_cache.aget(
+                owner, repo, number, plan["head_sha"], plan["base_sha"], self.model_id, self.prompt_hash
+            )
+        incremental = cached is None and plan is not None and plan["changed_files"] is not None
+        span.set_attributes({
+            "github.repo": f"{owner}/{repo}",
+            "github.pull_number": number,
+            "git.head_sha": plan["head_sha"] if plan is not None else None,
+            "review.cached": cached is not None,
+            "review.incremental": incremental,
+            "review.changed_files": len(plan["changed_files"]) if incremental else None,
+        })
+        await emit(on_event, "review_started", {
+            **pr_info,
+            "mode": self.mode,
+            "cached": cached is not None,
+            "incremental": incremental,
+            "changed_files": plan["changed_files"] if incremental else None,
+        })
+        if cached is not None:
+            logger.info(f"Returning cached review for {owner}/{repo}#{number}@{plan['head_sha'][:7]}.")
+            return cached
+        if incremental and not plan["changed_files"]:
+            logger.info("No files changed since the last review, reusing its findings.")
+            previous = plan["previous"]
+            output = previous["report"]
+            if previous["head_sha"] != plan["head_sha"]:
+                output = self._merge_with_previous(plan, previous["summary"], [])
+            await self._save_state(pr_info, plan, output)
+            return output
+
+        # 2. Review: one agent turn, or parallel per-file calls
+        if self.mode == "map_reduce":
+            only_files = set(plan["changed_files"]) if incremental else None
+            try:
+                output = await self.map_reduce.review(owner, repo, number, only_files=only_files, on_event=on_event)
+            except Exception as e:
+                logger.error(f"Map-reduce review failed: {e}")
+                return f"An error occurred during code review: {str(e)}"
+        else:
+            output = await self._review_with_agent(pr_info, plan if incremental else None, on_event)
+
+        # 3. Merge carried-over findings and remember this review
+        if plan is not None and REPORT_TITLE in output:
+            if incremental:
+                summary, findings = parse_review_report(output)
+                output = self._merge_with_previous(plan, summary, findings)
+            await self._save_state(pr_info, plan, output)
+        return output
+
+    async def stream_code_review(self, pr_url: str, max_buffered_events: int = 100) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Runs `perform_code_review` and yields its progress as (event, data) pairs:
+        review_started, tool_start, files_fetched, token, file_fetched, file_reviewed,
+        then a final `report` or `error`.
+
+        The review runs in a task that blocks once `max_buffered_events` are waiting, so a slow
+        consumer slows the review down. Closing the iterator (e.g. the client disconnected)
+        cancels the task, which aborts the in-flight LLM and GitHub calls.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered_events)
+        finished = object()
+
+        async def on_event(event: str, data: Dict[str, Any]) -> None:
+            await queue.put((event, data))
+
+        async def run() -> None:
+            try:
+                output = await self.perform_code_review(pr_url, on_event=on_event)
+                if output.startswith("Error:") or output.startswith("An error occurred"):
+                    await queue.put(("error", {"message": output}))
+                else:
+                    await queue.put(("report", {"review_report": output}))
+            except Exception as e:
+                logger.error(f"Streaming review failed: {e}")
+                await queue.put(("error", {"message": str(e)}))
+            finally:
+                await queue.put(finished)
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                yield item
+        finally:
+            if not task.done():
+                logger.info(f"Review stream for {pr_url} closed early, cancelling the review.")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _invoke_agent(self, inputs: Dict[str, Any], on_event: Optional[ReviewEventCallback]) -> Dict[str, Any]:
+        """
+        Runs the agent; when streaming, forwards tokens and tool calls as progress events.
+        """
+        if on_event is None:
+            return await self.agent_executor.ainvoke(inputs)
+
+        result: Dict[str, Any] = {}
+        async for event in self.agent_executor.astream_events(inputs, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = message_text(event["data"]["chunk"])
+                if text:
+                    await on_event("token", {"text": text})
+            elif kind == "on_tool_start":
+                await on_event("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                output = event["data"].get("output")
+                output = getattr(output, "content", output)
+                if isinstance(output, str):
+                    try:
+                        output = json.loads(output)
+                    except ValueError:
+                        pass
+                if isinstance(output, dict) and "changed_files" in output:
+                    await on_event("files_fetched", {
+                        "files": [f["filename"] for f in output["changed_files"]],
+                        "fetch_status": output.get("fetch_status"),
+                    })
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # The root run's output is the final agent state
+                result = event["data"].get("output") or {}
+        return result
+
+    @staticmethod
+    def _record_agent_steps(result: Dict[str, Any]) -> None:
+        messages = result.get("messages") or [] if isinstance(result, dict) else []
+        _AGENT_MODEL_STEPS.observe(sum(1 for m in messages if getattr(m, "type", None) == "ai"))
+        _AGENT_TOOL_STEPS.observe(sum(1 for m in messages if getattr(m, "type", None) == "tool"))
+
+    async def _review_with_agent(
+        self, pr_info: dict, incremental_plan: Optional[Dict[str, Any]], on_event: Optional[ReviewEventCallback] = None
+    ) -> str:
+        """
+        Runs the review agent; with an incremental plan its context tool only sees the changed files.
+        """
+        # Construct Prompt for Agent
         # Note: Our agent is smart enough to extract info from the prompt if we format it naturally,
         # OR we can pass structured input if we change the agent interface.
         # Since our agent currently takes a string input via `arun`, we construct a clear instruction.
@@ -46,39 +335,50 @@ class CodeReviewService:
             f"Please review pull request #{pr_info['pull_number']} "
             f"in repository {pr_info['repo_owner']}/{pr_info['repo_name']}."
         )
-        
-        # 3. Call Agent
+        scope_token = None
+        if incremental_plan is not None:
+            input_text += (
+                f" This is a re-review: the context only contains the files changed since the last "
+                f"reviewed commit {incremental_plan['previous']['head_sha'][:7]}; report findings for those files only."
+            )
+            scope_token = review_file_scope.set({**pr_info, "filenames": incremental_plan["changed_files"]})
+
+        # Call Agent
         try:
             # Use correct message format for new agent architecture
             from langchain_core.messages import HumanMessage
-            result = await self.agent_executor.ainvoke({
+            result = await self._invoke_agent({
                 "messages": [HumanMessage(content=input_text)]
-            })
-            
-            # Extract output from messages
-            messages = result.get("messages", [])
-            if messages:
-                # Get the last AI message content
-                last_message = messages[-1]
-                if hasattr(last_message, 'content'):
-                    # If content is a list, extract text part
-                    if isinstance(last_message.content, list) and len(last_message.content) > 0:
-                        # Extract first text block content
-                        output = last_message.content[0].get('text', '') if isinstance(last_message.content[0], dict) else str(last_message.content[0])
-                    else:
-                        output = str(last_message.content)
-                else:
-                    output = str(last_message)
-            else:
-                output = ""
-            
+            }, on_event)
+            output = self._extract_output(result)
+            self._record_agent_steps(result)
+
             if not output:
                 # Log the full result for debugging purposes
                 logger.error(f"Agent returned empty output. Full result object: {result}")
                 return f"Error: Agent returned empty response. Internal result state: {result}"
-                
             return output
 
         except Exception as e:
             logger.error(f"Agent execution failed: {e}")
             return f"An error occurred during code review: {str(e)}"
+        finally:
+            if scope_token is not None:
+                review_file_scope.reset(scope_token)
+
+    async def _save_state(self, pr_info: dict, plan: Dict[str, Any], report: str) -> None:
+        owner, repo, number = pr_info["repo_owner"], pr_info["repo_name"], pr_info["pull_number"]
+        summary, findings = parse_review_report(report)
+        await self.state_store.aput(owner, repo, number, {
+            "head_sha": plan["head_sha"],
+            "base_sha": plan["base_sha"],
+            "model_id": self.model_id,
+            "prompt_hash": self.prompt_hash,
+            "summary": summary,
+            "findings": findings,
+            "report": report,
+        })
+        if self.result_cache is not None:
+            await self.result_cache.aput(
+                owner, repo, number, plan["head_sha"], plan["base_sha"], self.model_id, self.prompt_hash, report
+            )
@@ -0,0 +1,173 @@
+import fnmatch
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+DEFAULT_CONTEXT_PACKER_OPTIONS: Dict[str, Any] = {
+    "enabled": True,
+    # 每个模型的 prompt token 预算，按 `llm.provider` 选择，找不到时使用 default
+    "token_budgets": {"default": 60000, "gemini": 200000, "deepseek": 48000},
+    "chars_per_token": 4,        # token 数按字符数估算
+    "context_lines": 20,         # 每个 hunk 上下保留的行数
+    "max_enclosing_lines": 80,   # 向上寻找所在函数/类定义的最大行数
+    "skip_patterns": [
+        # lockfiles
+        "package-lock.json", "*/package-lock.json", "yarn.lock", "*/yarn.lock", "pnpm-lock.yaml", "*/pnpm-lock.yaml",
+        "poetry.lock", "*/poetry.lock", "Pipfile.lock", "*/Pipfile.lock", "Cargo.lock", "*/Cargo.lock",
+        "go.sum", "*/go.sum", "composer.lock", "*/composer.lock", "Gemfile.lock", "*/Gemfile.lock",
+        # generated / vendored
+        "*.min.js", "*.min.css", "*.map", "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.generated.*",
+        "vendor/*", "node_modules/*", "dist/*",
+        # binary
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.ico", "*.pdf", "*.zip", "*.gz", "*.jar", "*.so", "*.dll", "*.exe",
+    ],
+}
+
+# Unified diff hunk header: "@@ -old_start,old_len +new_start,new_len @@"
+_HUNK_RANGE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+# Start of a function/class definition in common languages
+_DEFINITION = re.compile(
+    r"^\s*(?:(?:export|public|private|protected|static|async|abstract|final)\s+)*"
+    r"(?:def|class|function|func|fn|interface|struct|impl)\b"
+)
+
+
+def load_context_packer_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("context_packer") or {}
+    return {**DEFAULT_CONTEXT_PACKER_OPTIONS, **configured}
+
+
+class ContextPacker:
+    """
+    Shrinks the PR review context returned by `get_pr_code_review_info` to fit a token budget.
+
+    Full `original_content`/`updated_content` are replaced by `context`: the lines around each
+    hunk (extended up to the enclosing function/class definition), numbered so findings can
+    cite line numbers. Lockfiles, generated and binary files are dropped. When the budget
+    still runs out, files are ranked by the number of changed lines; lower ranked files keep
+    only their diff, and are omitted once even the diff does not fit.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None, options: Optional[Dict[str, Any]] = None):
+        self.options = {**load_context_packer_options(), **(options or {})}
+        if token_budget is None:
+            provider = ((yaml_configs or {}).get("llm") or {}).get("provider", "gemini")
+            budgets = self.options["token_budgets"]
+            token_budget = budgets.get(provider, budgets["default"])
+        self.token_budget = token_budget
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // self.options["chars_per_token"] + 1
+
+    def _file_tokens(self, file_info: Dict[str, Any]) -> int:
+        return self.estimate_tokens(json.dumps(file_info, ensure_ascii=False))
+
+    def should_skip(self, file_info: Dict[str, Any]) -> bool:
+        filename = file_info["filename"]
+        if any(fnmatch.fnmatch(filename, pattern) for pattern in self.options["skip_patterns"]):
+            return True
+        return any("\x00" in (file_info.get(key) or "") for key in ("original_content", "updated_content"))
+
+    @staticmethod
+    def change_significance(file_info: Dict[str, Any]) -> int:
+        """Number of added and removed lines in the patch."""
+        return sum(
+            1 for line in (file_info.get("diff_info") or "").splitlines()
+            if line[:1] in "+-" and not line.startswith(("+++", "---"))
+        )
+
+    def _hunk_windows(self, patch: str, lines: List[str], use_new_side: bool) -> List[Tuple[int, int]]:
+        """0-based [start, end) line windows of `lines` covering each hunk plus its context."""
+        n = self.options["context_lines"]
+        windows = []
+        for match in _HUNK_RANGE.finditer(patch):
+            start, length = (match.group(3), match.group(4)) if use_new_side else (match.group(1), match.group(2))
+            start, length = int(start), int(length) if length is not None else 1
+            first = max(start - 1, 0)
+            last = min(first + max(length, 1), len(lines))
+            window_start = max(first - n, 0)
+            # 向上扩展到所在函数/类的定义行
+            for i in range(first, max(first - self.options["max_enclosing_lines"], -1), -1):
+                if i < len(lines) and _DEFINITION.match(lines[i]):
+                    window_start = min(window_start, i)
+                    break
+            windows.append((window_start, min(last + n, len(lines))))
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(windows):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def build_context(self, file_info: Dict[str, Any]) -> str:
+        """Numbered excerpts of the updated (or, for removed files, original) content around each hunk."""
+        use_new_side = file_info["status"] != "removed"
+        content = file_info.get("updated_content" if use_new_side else "original_content") or ""
+        lines = content.splitlines()
+        parts = []
+        for start, end in self._hunk_windows(file_info.get("diff_info") or "", lines, use_new_side):
+            parts.append("\n".join(f"{i + 1:>5} | {lines[i]}" for i in range(start, end)))
+        return "\n...\n".join(parts)
+
+    def pack_file(self, file_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Returns the file with `context` instead of full contents, or None if it should be skipped."""
+        if self.should_skip(file_info):
+            return None
+        packed = {key: value for key, value in file_info.items() if key not in ("original_content", "updated_content")}
+        packed["context"] = self.build_context(file_info)
+        return packed
+
+    def pack(self, review_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Packs the result of `get_pr_code_review_info` into the token budget.
+        Adds `skipped_files`, `omitted_files` and `context_stats` (tokens_before/tokens_after).
+        """
+        if not self.options["enabled"]:
+            return review_info
+        files = review_info.get("changed_files", [])
+        tokens_before = self.estimate_tokens(json.dumps(review_info, ensure_ascii=False))
+
+        skipped, candidates = [], []
+        for index, file_info in enumerate(files):
+            packed = self.pack_file(file_info)
+            if packed is None:
+                skipped.append(file_info["filename"])
+            else:
+                candidates.append((index, packed))
+
+        # 预算不足时优先保留改动行数多的文件
+        overhead = self.estimate_tokens(json.dumps({k: v for k, v in review_info.items() if k != "changed_files"}))
+        used = overhead + self.estimate_tokens(json.dumps(skipped))
+        kept, trimmed, omitted = {}, [], []
+        for index, packed in sorted(candidates, key=lambda c: -self.change_significance(c[1])):
+            tokens = self._file_tokens(packed)
+            if used + tokens > self.token_budget:
+                packed = {**packed, "context": ""}
+                tokens = self._file_tokens(packed)
+                if used + tokens > self.token_budget:
+                    omitted.append(packed["filename"])
+                    continue
+                trimmed.append(packed["filename"])
+            kept[index] = packed
+            used += tokens
+
+        result = {**review_info, "changed_files": [kept[i] for i in sorted(kept)]}
+        result["skipped_files"] = skipped
+        result["omitted_files"] = omitted
+        result["context_stats"] = {
+            "tokens_before": tokens_before,
+            "tokens_after": 0,
+            "token_budget": self.token_budget,
+            "context_trimmed_files": trimmed,
+        }
+        result["context_stats"]["tokens_after"] = self.estimate_tokens(json.dumps(result, ensure_ascii=False))
+        logger.info(
+            f"Packed review context: {tokens_before} -> {result['context_stats']['tokens_after']} tokens "
+            f"(budget {self.token_budget}), skipped {len(skipped)}, trimmed {len(trimmed)}, omitted {len(omitted)} files."
+        )
+        return result
@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+DEFAULT_ETAG_CACHE_OPTIONS: Dict[str, Any] = {
+    "backend": "memory",                # "memory", "disk" or "none"
+    "max_entries": 5000,                # memory backend only
+    "max_bytes": 64 * 1024 * 1024,      # memory backend only: budget for the stored bodies
+    "max_item_bytes": 8 * 1024 * 1024,  # memory backend only: larger bodies are not stored
+    "disk_dir": None,                   # disk backend only
+}
+
+
+def load_etag_cache_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("github") or {}).get("etag_cache") or {}
+    return {**DEFAULT_ETAG_CACHE_OPTIONS, **configured}
+
+
+class ETagStore(ABC):
+    """
+    Stores the last ETag and body seen for a GET request so it can be revalidated with
+    `If-None-Match`. GitHub answers unchanged resources with 304, which does not count
+    against the primary rate limit.
+
+    Subclasses implement `_load`/`_save`; entries are {"etag": str, "body": <JSON-serialisable>}.
+    `size` is the byte length of the response the body was parsed from, when the caller has it.
+    Callers on the event loop use `aget`/`aput`; stores doing file I/O run it in a worker thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.conditional_requests = 0
+        self.not_modified = 0
+        self.stored = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._load(key)
+
+    def put(self, key: str, etag: str, body: Any, size: Optional[int] = None) -> None:
+        self._save(key, {"etag": etag, "body": body}, size)
+        with self._lock:
+            self.stored += 1
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.get(key)
+
+    async def aput(self, key: str, etag: str, body: Any, size: Optional[int] = None) -> None:
+        self.put(key, etag, body, size)
+
+    def record_revalidation(self, not_modified: bool) -> None:
+        with self._lock:
+            self.conditional_requests += 1
+            if not_modified:
+                self.not_modified += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "conditional_requests": self.conditional_requests,
+                "not_modified": self.not_modified,
+                "revalidation_hit_ratio": (
+                    self.not_modified / self.conditional_requests if self.conditional_requests else 0.0
+                ),
+                "stored": self.stored,
+            }
+
+    @abstractmethod
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def _save(self, key: str, entry: Dict[str, Any], size: Optional[int]) -> None:
+        ...
+
+
+class MemoryETagStore(ETagStore):
+    """
+    In-process LRU bounded by entry count and by the size of the stored bodies, since a
+    single recursive tree listing can be several MB. The size is the response byte length
+    passed to `put`; only bodies stored without one are serialised to measure them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_ETAG_CACHE_OPTIONS["max_entries"],
+        max_bytes: int = DEFAULT_ETAG_CACHE_OPTIONS["max_bytes"],
+        max_item_bytes: int = DEFAULT_ETAG_CACHE_OPTIONS["max_item_bytes"],
+    ):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _save(self, key: str, entry: Dict[str, Any], size: Optional[int]) -> None:
+        if size is None:
+            size = len(json.dumps(entry["body"], separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            if size > self.max_item_bytes:
+                return
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        with self._lock:
+            return {**stats, "entries": len(self._entries), "memory_bytes": self._bytes, "evictions": self.evictions}
+
+
+class DiskETagStore(ETagStore):
+    """One JSON file per request key; survives restarts and can be shared by workers on one host."""
+
+    def __init__(self, disk_dir: str):
+        super().__init__()
+        self.disk_dir = disk_dir
+        os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read ETag entry for {key}: {e}")
+            return None
+        # A different key hashing to the same file is treated as a miss.
+        return entry if entry.get("key") == key else None
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, etag: str, body: Any, size: Optional[int] = None) -> None:
+        await asyncio.to_thread(self.put, key, etag, body, size)
+
+    def _save(self, key: str, entry: Dict[str, Any], size: Optional[int]) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key": key, **entry}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Failed to write ETag entry for {key}: {e}")
+
+
+def create_etag_store(options: Optional[Dict[str, Any]] = None) -> Optional[ETagStore]:
+    """
+    Builds the store selected by `github.etag_cache.backend`; returns None when disabled.
+    """
+    options = {**load_etag_cache_options(), **(options or {})}
+    backend = options["backend"]
+    if backend == "memory":
+        return MemoryETagStore(
+            max_entries=options["max_entries"],
+            max_bytes=options["max_bytes"],
+            max_item_bytes=options["max_item_bytes"],
+        )
+    if backend == "disk":
+        if not options["disk_dir"]:
+            raise ValueError("github.etag_cache.disk_dir is required for the disk backend")
+        return DiskETagStore(options["disk_dir"])
+    if backend in (None, "none"):
+        return None
+    raise ValueError(f"Unknown ETag cache backend: {backend}")
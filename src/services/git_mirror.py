@@ -0,0 +1,321 @@
+import asyncio
+import base64
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.blob_cache import is_immutable_ref
+
+DEFAULT_GIT_MIRROR_OPTIONS: Dict[str, Any] = {
+    "root_dir": "/tmp/py-github-agent/mirrors",         # one bare repository per owner/repo below this
+    "url_template": "https://github.com/{owner}/{repo}.git",
+    "fetch_ttl": 30,          # seconds after a fetch during which branch names are resolved locally
+    "max_processes": 8,       # concurrent git processes
+    "command_timeout": 300,   # seconds; the first fetch of a large repository is a full clone
+}
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# `git diff --raw` status letters mapped to the PR files API `status` values
+_DIFF_STATUS = {"A": "added", "D": "removed", "M": "modified", "R": "renamed", "C": "copied", "T": "changed"}
+
+
+def load_git_mirror_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("github") or {}).get("mirror") or {}
+    return {**DEFAULT_GIT_MIRROR_OPTIONS, **configured}
+
+
+class GitMirrorError(Exception):
+    """A git command failed or the mirror does not have the requested objects."""
+
+
+class GitObjectSource(ABC):
+    """
+    Where GitHubService reads trees, diffs and blobs from when `fetch_mode` is "mirror".
+    PR metadata (base/head SHA) still comes from the REST API; everything below it is
+    served by the source. Methods raise GitMirrorError, on which the service falls back
+    to the REST API.
+    """
+
+    @abstractmethod
+    async def ensure_pull(self, repo_owner: str, repo_name: str, pull_number: int, base_sha: str, head_sha: str) -> None:
+        """Makes sure both commits of a pull request are available locally."""
+
+    @abstractmethod
+    async def resolve_tree(self, repo_owner: str, repo_name: str, ref: str) -> str:
+        """Returns the tree SHA of a branch, tag or commit SHA."""
+
+    @abstractmethod
+    async def list_tree(self, repo_owner: str, repo_name: str, tree_sha: str) -> List[Tuple[str, int]]:
+        """Returns [(path, size)] of every blob in the tree."""
+
+    @abstractmethod
+    async def tree_blob_shas(self, repo_owner: str, repo_name: str, ref: str) -> Dict[str, str]:
+        """Returns {path: blob sha} of every blob in the tree of `ref`."""
+
+    @abstractmethod
+    async def diff_files(self, repo_owner: str, repo_name: str, base_sha: str, head_sha: str) -> List[Dict[str, Any]]:
+        """Files changed between the merge base and head, shaped like the PR files API."""
+
+    @abstractmethod
+    async def compare(self, repo_owner: str, repo_name: str, base: str, head: str) -> Dict[str, Any]:
+        """Same result as GitHubService.compare_commits."""
+
+    @abstractmethod
+    async def read_blobs(self, repo_owner: str, repo_name: str, blob_shas: List[str]) -> Dict[str, Any]:
+        """Returns {blob sha: content or the exception that prevented reading it}."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class GitMirror(GitObjectSource):
+    """
+    Keeps a bare mirror per repository under `root_dir` and reads objects with local git
+    commands. Branches and tags are fetched at most once per `fetch_ttl`; PR heads are
+    fetched (`refs/pull/N/head`) only when the commits under review are not present yet.
+    Every fetch is incremental, so after the first clone a busy repository costs one
+    small fetch per PR update instead of one API call per file.
+
+    git runs in subprocesses started with asyncio, never in the event loop's executor.
+    """
+
+    def __init__(
+        self,
+        root_dir: str = DEFAULT_GIT_MIRROR_OPTIONS["root_dir"],
+        url_template: str = DEFAULT_GIT_MIRROR_OPTIONS["url_template"],
+        token: Optional[str] = None,
+        fetch_ttl: float = DEFAULT_GIT_MIRROR_OPTIONS["fetch_ttl"],
+        max_processes: int = DEFAULT_GIT_MIRROR_OPTIONS["max_processes"],
+        command_timeout: float = DEFAULT_GIT_MIRROR_OPTIONS["command_timeout"],
+    ):
+        self.root_dir = root_dir
+        self.url_template = url_template
+        self.token = token
+        self.fetch_ttl = fetch_ttl
+        self.max_processes = max_processes
+        self.command_timeout = command_timeout
+        self._refreshed: Dict[Tuple[str, str], float] = {}
+        # Locks and the process semaphore belong to one event loop, recreated when it changes
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._processes: Optional[asyncio.Semaphore] = None
+        self.fetches = 0
+        self.fetch_seconds = 0.0
+        self.blobs_read = 0
+
+    @classmethod
+    def from_config(cls, token: Optional[str] = None) -> "GitMirror":
+        options = load_git_mirror_options()
+        return cls(
+            root_dir=options["root_dir"],
+            url_template=options["url_template"],
+            token=token,
+            fetch_ttl=options["fetch_ttl"],
+            max_processes=options["max_processes"],
+            command_timeout=options["command_timeout"],
+        )
+
+    def _loop_state(self) -> Tuple[Dict[Tuple[str, str], asyncio.Lock], asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._locks = loop, {}
+            self._processes = asyncio.Semaphore(self.max_processes)
+        return self._locks, self._processes
+
+    def repo_dir(self, repo_owner: str, repo_name: str) -> str:
+        for name in (repo_owner, repo_name):
+            if not _NAME_PATTERN.match(name) or name in (".", ".."):
+                raise GitMirrorError(f"Invalid repository name: {repo_owner}/{repo_name}")
+        return os.path.join(self.root_dir, repo_owner, f"{repo_name}.git")
+
+    async def _git(self, git_dir: str, *args: str, stdin: Optional[bytes] = None, fetch: bool = False) -> bytes:
+        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        if fetch and self.token:
+            credentials = base64.b64encode(f"x-access-token:{self.token}".encode()).decode()
+            # Passed through the environment: never written to the mirror's config and not
+            # visible in the process list the way a `-c` argument is
+            env.update({
+                "GIT_CONFIG_COUNT": "1",
+                "GIT_CONFIG_KEY_0": "http.extraHeader",
+                "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+            })
+        _, processes = self._loop_state()
+        async with processes:
+            process = await asyncio.create_subprocess_exec(
+                "git", "--git-dir", git_dir, *args,
+                stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+            )
+            try:
+                out, err = await asyncio.wait_for(process.communicate(stdin), self.command_timeout)
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+        if process.returncode != 0:
+            message = err.decode("utf-8", errors="replace").strip()
+            raise GitMirrorError(f"git {args[0]} failed ({process.returncode}): {message}")
+        return out
+
+    async def _has_commit(self, git_dir: str, sha: str) -> bool:
+        try:
+            await self._git(git_dir, "cat-file", "-e", f"{sha}^{{commit}}")
+            return True
+        except GitMirrorError:
+            return False
+
+    async def _fetch(self, repo_owner: str, repo_name: str, *refspecs: str) -> str:
+        """Creates the bare mirror if needed and fetches `refspecs` into it."""
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        if not os.path.exists(os.path.join(git_dir, "HEAD")):
+            os.makedirs(git_dir, exist_ok=True)
+            await self._git(git_dir, "init", "--bare", "--quiet")
+            logger.info(f"Created git mirror for {repo_owner}/{repo_name} at {git_dir}")
+        url = self.url_template.format(owner=repo_owner, repo=repo_name)
+        start = time.perf_counter()
+        await self._git(git_dir, "fetch", "--quiet", "--no-tags", "--no-write-fetch-head", url, *refspecs, fetch=True)
+        elapsed = time.perf_counter() - start
+        self.fetches += 1
+        self.fetch_seconds += elapsed
+        logger.info(f"Fetched {' '.join(refspecs)} into the {repo_owner}/{repo_name} mirror in {elapsed:.2f}s")
+        return git_dir
+
+    async def _refresh(self, repo_owner: str, repo_name: str, force: bool = False) -> str:
+        """Fetches all branches and tags unless that happened less than `fetch_ttl` ago."""
+        key = (repo_owner, repo_name)
+        locks, _ = self._loop_state()
+        async with locks.setdefault(key, asyncio.Lock()):
+            refreshed = self._refreshed.get(key)
+            if not force and refreshed is not None and time.monotonic() - refreshed < self.fetch_ttl:
+                return self.repo_dir(repo_owner, repo_name)
+            git_dir = await self._fetch(repo_owner, repo_name, "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+            self._refreshed[key] = time.monotonic()
+            return git_dir
+
+    async def ensure_pull(self, repo_owner: str, repo_name: str, pull_number: int, base_sha: str, head_sha: str) -> None:
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        if os.path.exists(git_dir) and all([await self._has_commit(git_dir, sha) for sha in (base_sha, head_sha)]):
+            return
+        locks, _ = self._loop_state()
+        async with locks.setdefault((repo_owner, repo_name), asyncio.Lock()):
+            # The base commit lives on a branch, the head commit on GitHub's refs/pull/N/head
+            await self._fetch(
+                repo_owner, repo_name,
+                "+refs/heads/*:refs/heads/*", f"+refs/pull/{int(pull_number)}/head:refs/pull/{int(pull_number)}/head",
+            )
+            self._refreshed[(repo_owner, repo_name)] = time.monotonic()
+        for sha in (base_sha, head_sha):
+            if not await self._has_commit(git_dir, sha):
+                raise GitMirrorError(f"Commit {sha} of {repo_owner}/{repo_name}#{pull_number} is not in the mirror")
+
+    async def resolve_tree(self, repo_owner: str, repo_name: str, ref: str) -> str:
+        if not ref or ref.startswith("-"):
+            raise GitMirrorError(f"Invalid ref: {ref!r}")
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        if is_immutable_ref(ref) and os.path.exists(git_dir) and await self._has_commit(git_dir, ref):
+            pass  # a commit SHA never moves, no fetch needed
+        else:
+            git_dir = await self._refresh(repo_owner, repo_name)
+        out = await self._git(git_dir, "rev-parse", "--verify", "--quiet", f"{ref}^{{tree}}")
+        return out.decode().strip()
+
+    async def _ls_tree(self, repo_owner: str, repo_name: str, ref: str) -> List[Tuple[str, str, int]]:
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        out = await self._git(git_dir, "ls-tree", "-r", "-l", "-z", "--full-tree", ref)
+        entries = []
+        for record in out.split(b"\0"):
+            if not record:
+                continue
+            meta, _, path = record.partition(b"\t")
+            _, object_type, sha, size = meta.split()
+            if object_type == b"blob":
+                entries.append((path.decode("utf-8", errors="surrogateescape"), sha.decode(), int(size)))
+        return entries
+
+    async def list_tree(self, repo_owner: str, repo_name: str, tree_sha: str) -> List[Tuple[str, int]]:
+        return [(path, size) for path, _, size in await self._ls_tree(repo_owner, repo_name, tree_sha)]
+
+    async def tree_blob_shas(self, repo_owner: str, repo_name: str, ref: str) -> Dict[str, str]:
+        return {path: sha for path, sha, _ in await self._ls_tree(repo_owner, repo_name, ref)}
+
+    async def diff_files(self, repo_owner: str, repo_name: str, base_sha: str, head_sha: str) -> List[Dict[str, Any]]:
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        # base...head diffs against the merge base, which is what the PR files API shows
+        raw, patch = await asyncio.gather(
+            self._git(git_dir, "diff", "--raw", "-z", "-M", "--no-abbrev", f"{base_sha}...{head_sha}"),
+            self._git(git_dir, "diff", "-M", "--no-color", "--no-ext-diff", f"{base_sha}...{head_sha}"),
+        )
+        fields = raw.decode("utf-8", errors="surrogateescape").split("\0")
+        files, i = [], 0
+        while i < len(fields) and fields[i].startswith(":"):
+            _, _, _, new_sha, status = fields[i][1:].split(" ")
+            letter = status[0]
+            file_info = {"status": _DIFF_STATUS.get(letter, "modified")}
+            if letter in "RC":
+                file_info["previous_filename"], file_info["filename"] = fields[i + 1], fields[i + 2]
+                i += 3
+            else:
+                file_info["filename"] = fields[i + 1]
+                i += 2
+            file_info["sha"] = None if letter == "D" else new_sha
+            files.append(file_info)
+
+        # The textual diff lists files in the same order as --raw; keep each hunk body only
+        chunks = re.split(r"^diff --git .*\n", patch.decode("utf-8", errors="replace"), flags=re.MULTILINE)[1:]
+        for file_info, chunk in zip(files, chunks):
+            hunk = chunk.find("@@")
+            file_info["patch"] = chunk[hunk:] if hunk >= 0 else ""
+        return files
+
+    async def compare(self, repo_owner: str, repo_name: str, base: str, head: str) -> Dict[str, Any]:
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        counts = await self._git(git_dir, "rev-list", "--left-right", "--count", f"{base}...{head}")
+        behind, ahead = (int(n) for n in counts.split())
+        status = "identical" if not (ahead or behind) else "ahead" if not behind else "behind" if not ahead else "diverged"
+        filenames = set()
+        for file_info in await self.diff_files(repo_owner, repo_name, base, head):
+            filenames.add(file_info["filename"])
+            if file_info.get("previous_filename"):
+                filenames.add(file_info["previous_filename"])
+        return {"status": status, "files": sorted(filenames), "truncated": False}
+
+    async def read_blobs(self, repo_owner: str, repo_name: str, blob_shas: List[str]) -> Dict[str, Any]:
+        git_dir = self.repo_dir(repo_owner, repo_name)
+        try:
+            out = await self._git(git_dir, "cat-file", "--batch", stdin="".join(f"{sha}\n" for sha in blob_shas).encode())
+        except GitMirrorError as e:
+            return {sha: e for sha in blob_shas}
+
+        contents: Dict[str, Any] = {}
+        offset = 0
+        for sha in blob_shas:
+            end = out.index(b"\n", offset)
+            header = out[offset:end].split()
+            offset = end + 1
+            if len(header) < 3:
+                contents[sha] = GitMirrorError(f"Blob {sha} is not in the {repo_owner}/{repo_name} mirror")
+                continue
+            size = int(header[2])
+            data = out[offset:offset + size]
+            offset += size + 1
+            # Same as the GraphQL path: binary blobs are reviewed as empty
+            contents[sha] = "" if b"\0" in data else data.decode("utf-8", errors="replace")
+        self.blobs_read += len(blob_shas)
+        return contents
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "repos": len(self._refreshed),
+            "fetches": self.fetches,
+            "fetch_seconds": self.fetch_seconds,
+            "blobs_read": self.blobs_read,
+        }
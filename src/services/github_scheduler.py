@@ -0,0 +1,184 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+T = TypeVar("T")
+
+DEFAULT_SCHEDULER_OPTIONS: Dict[str, Any] = {
+    "max_in_flight": 10,          # concurrent requests to GitHub
+    "requests_per_second": 20,    # token bucket refill rate
+    "burst": 40,                  # token bucket capacity
+    "max_retries": 3,             # retries after the first attempt
+    "backoff_base": 0.5,          # seconds, doubled per attempt before jitter
+    "backoff_max": 30,            # upper bound for a single backoff
+    "max_pause": 60,              # upper bound for waiting on a rate-limit reset
+    "low_remaining": 50,          # warn and slow down below this many remaining requests
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def load_scheduler_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("github") or {}).get("scheduler") or {}
+    return {**DEFAULT_SCHEDULER_OPTIONS, **configured}
+
+
+class GitHubRequestError(Exception):
+    """Raised when a GitHub request still fails after the scheduler's retries."""
+
+    def __init__(self, message: str, status: Optional[int] = None, url: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+        self.url = url
+
+
+class GitHubRequestScheduler:
+    """
+    Paces every GitHub request made by GitHubService.
+
+    - caps the number of in-flight requests,
+    - spaces requests with a token bucket,
+    - honours `Retry-After` and `X-RateLimit-Remaining`/`X-RateLimit-Reset` by pausing all
+      callers, since GitHub's limits are per token rather than per request,
+    - retries 429/5xx/connection errors with full-jitter exponential backoff.
+
+    Semaphores are bound to the event loop that first uses them, so one set is kept per loop.
+    """
+
+    def __init__(self, **options: Any):
+        self.options = {**load_scheduler_options(), **options}
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._tokens = float(self.options["burst"])
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_limit_pauses = 0
+        self.rate_limit_remaining: Optional[int] = None
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            # Drop semaphores of loops that are gone (e.g. one loop per test case).
+            self._semaphores = {l: s for l, s in self._semaphores.items() if not l.is_closed()}
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.options["max_in_flight"])
+        return semaphore
+
+    async def _acquire_token(self) -> None:
+        # Reservation-style token bucket: the balance may go negative and each caller sleeps
+        # for its own share, so no lock is needed on a single event loop.
+        now = time.monotonic()
+        rate = self.options["requests_per_second"]
+        self._tokens = min(self.options["burst"], self._tokens + (now - self._last_refill) * rate)
+        self._last_refill = now
+        self._tokens -= 1
+        delay = -self._tokens / rate if self._tokens < 0 else 0.0
+        pause = self._paused_until - now
+        if pause > 0:
+            delay = max(delay, min(pause, self.options["max_pause"]))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.options["backoff_max"], self.options["backoff_base"] * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def _observe_rate_limit(self, response: aiohttp.ClientResponse) -> Optional[float]:
+        """
+        Records rate-limit headers and returns how long to wait before retrying, if GitHub said so.
+        """
+        headers = response.headers
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None and remaining.isdigit():
+            self.rate_limit_remaining = int(remaining)
+            if self.rate_limit_remaining < self.options["low_remaining"]:
+                logger.warning(f"GitHub rate limit is low: {self.rate_limit_remaining} requests remaining.")
+
+        wait = None
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                wait = None
+        elif self.rate_limit_remaining == 0 and headers.get("X-RateLimit-Reset", "").isdigit():
+            wait = max(0.0, int(headers["X-RateLimit-Reset"]) - time.time())
+
+        if wait is not None:
+            wait = min(wait, self.options["max_pause"])
+            self._paused_until = max(self._paused_until, time.monotonic() + wait)
+            self.rate_limit_pauses += 1
+        return wait
+
+    @staticmethod
+    def _is_rate_limited(response: aiohttp.ClientResponse) -> bool:
+        if response.status in RETRYABLE_STATUSES:
+            return True
+        # GitHub reports both primary and secondary rate limits as 403.
+        return response.status == 403 and (
+            "Retry-After" in response.headers or response.headers.get("X-RateLimit-Remaining") == "0"
+        )
+
+    async def request(
+        self,
+        session: aiohttp.ClientSession,
+        method: str,
+        url: str,
+        handler: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        **kwargs: Any,
+    ) -> T:
+        """
+        Performs a request under the scheduler's limits and hands the response to `handler`.
+        Retryable failures are retried; anything else the handler raises propagates.
+        """
+        max_retries = self.options["max_retries"]
+        attempt = 0
+        while True:
+            await self._acquire_token()
+            wait: Optional[float] = None
+            async with self._semaphore():
+                self.in_flight += 1
+                self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+                try:
+                    async with session.request(method, url, **kwargs) as response:
+                        retry_after = self._observe_rate_limit(response)
+                        if not self._is_rate_limited(response):
+                            return await handler(response)
+                        error = GitHubRequestError(
+                            f"GitHub returned {response.status} for {url}", status=response.status, url=url
+                        )
+                        wait = retry_after
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    error = GitHubRequestError(f"Connection error for {url}: {e!r}", url=url)
+                finally:
+                    self.in_flight -= 1
+
+            if attempt >= max_retries:
+                self.failures += 1
+                logger.error(f"Giving up on {url} after {attempt + 1} attempts: {error}")
+                raise error
+            wait = self._backoff(attempt) if wait is None else wait
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"{error}; retry {attempt}/{max_retries} in {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight_seen": self.max_in_flight_seen,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rate_limit_pauses": self.rate_limit_pauses,
+            "rate_limit_remaining": self.rate_limit_remaining,
+        }
@@ -1,25 +1,96 @@
-
 import src.configs.config
 from loguru import logger
 
 import os
+import time
+import asyncio
 import aiohttp
 from loguru import logger
-from typing import List, Dict, Any
+from collections import deque
+from urllib.parse import urlencode
+from typing import AsyncIterator, Deque, List, Dict, Any, Optional, Set, Tuple
+from src.configs.config import yaml_configs
+from src.services.blob_cache import BlobCache, GIT_BLOB_PATH, is_immutable_ref
+from src.services.etag_store import ETagStore, create_etag_store
+from src.services.git_mirror import GitMirror, GitMirrorError, GitObjectSource
+from src.services.github_scheduler import GitHubRequestError, GitHubRequestScheduler
+from src.services.loop_runner import LoopSessions
+from src.services.repo_index import RepoFileIndex, RepoIndexCache, load_repo_index_options
+from src.services.metrics import GITHUB_CALL_SECONDS, GITHUB_HTTP_SECONDS, timed
+from src.services.tracing import tracer
+
+
+# 连接池默认参数，可通过 yaml 的 `github.pool` 覆盖
+DEFAULT_POOL_OPTIONS: Dict[str, Any] = {
+    "limit": 100,               # 连接池总连接数上限
+    "limit_per_host": 30,       # 单个 host (api.github.com) 的连接数上限
+    "keepalive_timeout": 30,    # 空闲连接保活时间 (秒)
+    "ttl_dns_cache": 300,       # DNS 解析缓存时间 (秒)
+    "request_timeout": 60,      # 单次请求总超时 (秒)
+}
 
 
+# 预先取好的 histogram child，请求路径上不再查找标签
+_GITHUB_HTTP_SECONDS = {method: GITHUB_HTTP_SECONDS.labels(method) for method in ("GET", "POST")}
+
+
+def load_pool_options() -> Dict[str, Any]:
+    """
+    合并默认连接池参数与 yaml 配置中的 `github.pool`。
+    """
+    configured = ((yaml_configs or {}).get("github") or {}).get("pool") or {}
+    return {**DEFAULT_POOL_OPTIONS, **configured}
+
 
 class GitHubService:
     """
     一个用于与 GitHub API 交互的服务类。
+
+    服务持有一个长生命周期的 aiohttp.ClientSession (连接池)，所有方法共享同一组
+    keep-alive 连接。FastAPI 启动时调用 `start()`，关闭时调用 `close()`；
+    在脚本或测试中未显式启动时，会在第一次请求时惰性创建。
     """
     BASE_URL = "https://api.github.com"
+    FETCH_MODES = ("contents", "git", "graphql", "mirror")
+    GRAPHQL_BATCH_SIZE = 100
+    PER_PAGE = 100  # GitHub 列表接口允许的最大分页大小
+    COMPARE_FILES_LIMIT = 300  # compare 接口最多返回的文件数
 
-    def __init__(self,_token: str = os.getenv("GITHUB_TOKEN")):
+    def __init__(
+        self,
+        _token: str = os.getenv("GITHUB_TOKEN"),
+        base_url: Optional[str] = None,
+        pool_options: Optional[Dict[str, Any]] = None,
+        blob_cache: Optional[BlobCache] = None,
+        fetch_mode: Optional[str] = None,
+        scheduler: Optional[GitHubRequestScheduler] = None,
+        etag_store: Optional[ETagStore] = None,
+        repo_index_cache: Optional[RepoIndexCache] = None,
+        git_source: Optional[GitObjectSource] = None,
+    ):
         self.token = _token
         if not self.token:
             logger.warning("GITHUB_TOKEN not found in environment variables. API requests will be unauthenticated and subject to lower rate limits.")
         
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.pool_options = {**load_pool_options(), **(pool_options or {})}
+        # (repo, path, commit sha) 对应的内容不可变，可跨 PR / 跨请求复用
+        self.blob_cache = blob_cache if blob_cache is not None else BlobCache.from_config()
+        self.fetch_mode = fetch_mode or ((yaml_configs or {}).get("github") or {}).get("fetch_mode", "contents")
+        # 所有请求都经过调度器：限制并发、令牌桶限速、遵守 GitHub 限流响应头并自动重试
+        self.scheduler = scheduler if scheduler is not None else GitHubRequestScheduler()
+        # GET 的 JSON 响应按 ETag 缓存，下次带 If-None-Match 重新验证；304 不消耗主限流配额
+        self.etag_store = etag_store if etag_store is not None else create_etag_store()
+        # 按 (repo, tree SHA) 缓存的文件树索引，供 list/search 类工具使用
+        self.repo_index_cache = repo_index_cache if repo_index_cache is not None else RepoIndexCache.from_config()
+        self.max_index_subtrees = load_repo_index_options()["max_subtrees"]
+        self._tree_shas: Dict[Tuple[str, str, str], str] = {}  # (repo, commit SHA) -> tree SHA
+        self._index_builds: Dict[Tuple[str, str, str], "asyncio.Future[RepoFileIndex]"] = {}
+        # "mirror" 模式：树、diff 和 blob 从本地 bare mirror 读取，只有 PR 元数据走 API
+        if git_source is None and self.fetch_mode == "mirror":
+            git_source = GitMirror.from_config(token=self.token)
+        self.git_source = git_source
+
         self.headers = {
             "Accept": "application/vnd.github.v3+json",
             "X-GitHub-Api-Version": "2022-11-28",
@@ -27,174 +98,704 @@ class GitHubService:
         if self.token:
             self.headers["Authorization"] = f"token {self.token}"
 
+        self._sessions = LoopSessions(self._create_session)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        options = self.pool_options
+        connector = aiohttp.TCPConnector(
+            limit=options["limit"],
+            limit_per_host=options["limit_per_host"],
+            keepalive_timeout=options["keepalive_timeout"],
+            ttl_dns_cache=options["ttl_dns_cache"],
+            use_dns_cache=True,
+            enable_cleanup_closed=True,
+        )
+        timeout = aiohttp.ClientTimeout(total=options["request_timeout"])
+        return aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout)
+
+    async def start(self) -> None:
+        """
+        创建共享连接池。重复调用是安全的。
+        """
+        await self._get_session()
+        logger.info(
+            f"GitHubService connection pool started "
+            f"(limit={self.pool_options['limit']}, limit_per_host={self.pool_options['limit_per_host']})"
+        )
+
+    async def close(self) -> None:
+        """
+        关闭共享连接池，释放所有 keep-alive 连接。
+        """
+        if await self._sessions.close():
+            logger.info("GitHubService connection pool closed.")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        返回当前事件循环上的共享 session。
+        session 绑定在创建它的事件循环上，每个循环一个 (服务循环与 loop_runner 的后台循环同时存在)，
+        见 `LoopSessions`。
+        """
+        return self._sessions.get()
+
+    async def __aenter__(self) -> "GitHubService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _request(self, method: str, url: str, read: str = "json", allow_404: bool = False, **kwargs: Any) -> Any:
+        """
+        通过调度器发送请求。
+
+        :param read: "json" 返回解析后的 JSON，"text" 返回原始文本，
+            "page" 返回 (JSON, 下一页 URL 或 None)
+        :param allow_404: 为 True 时 404 返回 None，而不是抛出异常
+        :raises GitHubRequestError: 请求在重试后仍然失败
+        """
+        session = await self._get_session()
+        if read == "text":
+            headers = {**self.headers, "Accept": "application/vnd.github.v3.raw", **kwargs.pop("headers", {})}
+            kwargs["headers"] = headers
+
+        # 条件请求：文件内容已由 blob cache 覆盖，这里只处理 JSON 类型的 GET
+        etag_key = None
+        cached = None
+        if self.etag_store is not None and method == "GET" and read in ("json", "page"):
+            query = urlencode(sorted((kwargs.get("params") or {}).items()))
+            etag_key = f"{read} {url}?{query}" if query else f"{read} {url}"
+            cached = await self.etag_store.aget(etag_key)
+            if cached is not None:
+                kwargs["headers"] = {**kwargs.get("headers", {}), "If-None-Match": cached["etag"]}
+
+        async def handle(response: aiohttp.ClientResponse) -> Any:
+            if response.status == 304 and cached is not None:
+                self.etag_store.record_revalidation(not_modified=True)
+                return tuple(cached["body"]) if read == "page" else cached["body"]
+            if allow_404 and response.status == 404:
+                return None
+            if response.status >= 400:
+                raise GitHubRequestError(f"GitHub returned {response.status} for {url}", status=response.status, url=url)
+            if read == "text":
+                return (await response.read()).decode("utf-8", errors="replace")
+            if read == "page":
+                next_link = response.links.get("next")
+                body = (await response.json(), str(next_link["url"]) if next_link else None)
+            else:
+                body = await response.json()
+            if etag_key is not None:
+                if cached is not None:
+                    self.etag_store.record_revalidation(not_modified=False)
+                etag = response.headers.get("ETag")
+                if etag:
+                    # read() 返回 json() 已读取的响应体，用它的长度计算缓存大小，不必重新序列化
+                    size = len(await response.read())
+                    await self.etag_store.aput(etag_key, etag, list(body) if read == "page" else body, size)
+            return body
+
+        start = time.perf_counter()
+        try:
+            return await self.scheduler.request(session, method, url, handle, **kwargs)
+        finally:
+            (_GITHUB_HTTP_SECONDS.get(method) or GITHUB_HTTP_SECONDS.labels(method)).observe(time.perf_counter() - start)
+
+    async def _iter_pages(self, url: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[Any]]:
+        """
+        按 `Link: rel="next"` 逐页获取列表接口，每页 PER_PAGE 条。
+        在调用方处理当前页时，下一页已经在后台请求中 (预取一页)。
+        """
+        params = {"per_page": self.PER_PAGE, **(params or {})}
+        pending: Optional[asyncio.Future] = asyncio.ensure_future(self._request("GET", url, read="page", params=params))
+        try:
+            while pending is not None:
+                items, next_url = await pending
+                # next 链接已包含 per_page/page 等全部查询参数
+                pending = asyncio.ensure_future(self._request("GET", next_url, read="page")) if next_url else None
+                yield items
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def iter_pull_requests(
+        self, repo_owner: str, repo_name: str, state: str = "open"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        逐条产出指定仓库的 Pull Request (跟随分页)，调用方可以在完整列表返回前开始处理。
+
+        :raises GitHubRequestError: 某一页在重试后仍然失败
+        """
+        url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/pulls"
+        async for page in self._iter_pages(url, {"state": state}):
+            for pr in page:
+                # 提取关键信息
+                yield {
+                    "number": pr.get("number"),
+                    "title": pr.get("title"),
+                    "state": pr.get("state"),
+                    "url": pr.get("html_url"),
+                    "user": pr.get("user", {}).get("login"),
+                    "head_sha": (pr.get("head") or {}).get("sha"),
+                }
+
+    @timed(GITHUB_CALL_SECONDS.labels("get_pull_requests"))
     async def get_pull_requests(
         self, repo_owner: str, repo_name: str, state: str = "open"
     ) -> List[Dict[str, Any]]:
         """
-        异步获取指定 GitHub 仓库的 Pull Request 列表。
+        异步获取指定 GitHub 仓库的 Pull Request 列表 (全部分页)。
 
         :param repo_owner: 仓库所有者
         :param repo_name: 仓库名称
         :param state: PR 的状态 ('open', 'closed', 'all')
         :return: 一个包含 PR 关键信息的字典列表
         """
-        url = f"{self.BASE_URL}/repos/{repo_owner}/{repo_name}/pulls"
-        params = {"state": state}
-        logger.info(f"Fetching pull requests from {url} with state: {state}")
+        logger.info(f"Fetching pull requests for {repo_owner}/{repo_name} with state: {state}")
 
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(url, params=params) as response:
-                    response.raise_for_status()  # 如果状态码是 4xx 或 5xx，则抛出异常
-                    pulls_data = await response.json()
-            
-            # 提取关键信息
-            simplified_pulls = [
-                {
-                    "number": pr.get("number"),
-                    "title": pr.get("title"),
-                    "state": pr.get("state"),
-                    "url": pr.get("html_url"),
-                    "user": pr.get("user", {}).get("login"),
-                }
-                for pr in pulls_data
-            ]
+            simplified_pulls = [pr async for pr in self.iter_pull_requests(repo_owner, repo_name, state)]
             logger.success(f"Successfully fetched {len(simplified_pulls)} pull requests.")
             return simplified_pulls
 
-        except aiohttp.ClientError as e:
+        except (aiohttp.ClientError, GitHubRequestError) as e:
             logger.error(f"Error fetching pull requests for {repo_owner}/{repo_name}: {e}")
             return []
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
             return []
 
+    @timed(GITHUB_CALL_SECONDS.labels("get_all_files_list"))
     async def get_all_files_list(self, repo_owner: str, repo_name: str, branch: str = "main") -> List[str]:
         """
-        异步获取指定 GitHub 仓库分支中所有文件的完整路径列表。
+        异步获取指定 GitHub 仓库分支中所有文件的完整路径列表 (按路径排序)。
+        结果来自 `get_repo_index`，同一个 tree 只下载一次；大仓库不会被 API 截断。
         """
-        url = f"{self.BASE_URL}/repos/{repo_owner}/{repo_name}/git/trees/{branch}?recursive=1"
         logger.info(f"Fetching file list for {repo_owner}/{repo_name} on branch {branch}")
 
         try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    tree_data = await response.json()
-            
-            if tree_data.get("truncated"):
-                logger.warning(f"File list for {repo_owner}/{repo_name} is truncated because it exceeds the API limit.")
-
-            if "tree" not in tree_data:
-                logger.error("API response does not contain a 'tree' field.")
-                return []
-
-            file_paths = [item["path"] for item in tree_data["tree"] if item.get("type") == "blob"]
-            logger.success(f"Successfully fetched {len(file_paths)} file paths.")
-            return file_paths
-
-        except aiohttp.ClientError as e:
+            index = await self.get_repo_index(repo_owner, repo_name, branch)
+            if index.truncated:
+                logger.warning(f"File list for {repo_owner}/{repo_name} is incomplete: the tree exceeds max_subtrees.")
+            logger.success(f"Successfully fetched {len(index)} file paths.")
+            return list(index.paths)
+
+        except (aiohttp.ClientError, GitHubRequestError) as e:
             logger.error(f"Error fetching file list for {repo_owner}/{repo_name}: {e}")
             return []
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
             return []
 
+    @timed(GITHUB_CALL_SECONDS.labels("get_repo_index"))
+    async def get_repo_index(self, repo_owner: str, repo_name: str, ref: str = "main") -> RepoFileIndex:
+        """
+        返回 `ref` (分支、tag 或 commit SHA) 对应文件树的索引。
+
+        先用一次非递归的 /git/trees/{ref} 解析出 tree SHA (带 ETag，分支未变化时是 304)，
+        再按 (repo, tree SHA) 查缓存；未命中时才下载完整的树并建索引。同一棵树的并发请求共享一次构建。
+        "mirror" 模式下 tree SHA 和文件列表都从本地 mirror 读取，mirror 不可用时退回 API。
 
+        :raises GitHubRequestError: 请求在重试后仍然失败
+        """
+        commit_key = (repo_owner, repo_name, ref)
+        root = None
+        source = None
+        tree_sha = self._tree_shas.get(commit_key) if is_immutable_ref(ref) else None
+        if tree_sha is None and self.fetch_mode == "mirror" and self.git_source is not None:
+            try:
+                tree_sha = await self.git_source.resolve_tree(repo_owner, repo_name, ref)
+                source = self.git_source
+            except GitMirrorError as e:
+                logger.warning(f"Mirror cannot resolve {repo_owner}/{repo_name}@{ref}, using the REST API: {e}")
+        if tree_sha is None:
+            root = await self._request("GET", f"{self.base_url}/repos/{repo_owner}/{repo_name}/git/trees/{ref}")
+            tree_sha = root["sha"]
+            if is_immutable_ref(ref):
+                if len(self._tree_shas) >= 4096:
+                    self._tree_shas.clear()
+                self._tree_shas[commit_key] = tree_sha
 
+        key = (repo_owner, repo_name, tree_sha)
+        index = self.repo_index_cache.get(key)
+        if index is not None:
+            return index
+        build = self._index_builds.get(key)
+        if build is None or build.get_loop() is not asyncio.get_running_loop():
+            build = asyncio.ensure_future(self._build_repo_index(repo_owner, repo_name, tree_sha, root, source))
+            self._index_builds[key] = build
+            build.add_done_callback(lambda _: self._index_builds.pop(key, None))
+        # shield: 一个调用方被取消不影响其他等待同一构建的调用方
+        return await asyncio.shield(build)
 
+    async def _build_repo_index(
+        self, repo_owner: str, repo_name: str, tree_sha: str, root: Optional[Dict[str, Any]],
+        source: Optional[GitObjectSource] = None,
+    ) -> RepoFileIndex:
+        start = time.perf_counter()
+        if source is not None:
+            entries, truncated = await source.list_tree(repo_owner, repo_name, tree_sha), False
+        else:
+            entries, truncated = await self._collect_tree(repo_owner, repo_name, tree_sha, "", root, [self.max_index_subtrees])
+        index = RepoFileIndex(tree_sha, entries, truncated=truncated)
+        self.repo_index_cache.put((repo_owner, repo_name, tree_sha), index)
+        logger.info(
+            f"Indexed {len(index)} files of {repo_owner}/{repo_name}@{tree_sha[:7]} "
+            f"in {time.perf_counter() - start:.2f}s (truncated={truncated})."
+        )
+        return index
 
+    async def _collect_tree(
+        self, repo_owner: str, repo_name: str, tree_sha: str, prefix: str,
+        level: Optional[Dict[str, Any]], budget: List[int],
+    ) -> Tuple[List[Tuple[str, int]], bool]:
+        """
+        返回 tree 下所有文件的 [(路径, 大小)] 和是否仍不完整。
 
+        先请求递归的树；GitHub 对超大的树只返回一部分并标记 `truncated`，此时改为列出当前这一层
+        (`level`，非递归结果)，对每个子目录重复这个过程。`budget` 是还能展开的子目录数，所有分支共享。
+        """
+        url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/git/trees/{tree_sha}"
+        data = await self._request("GET", url, params={"recursive": "1"})
+        if not data.get("truncated"):
+            return [
+                (prefix + item["path"], item.get("size") or 0)
+                for item in data.get("tree", []) if item.get("type") == "blob"
+            ], False
 
+        logger.info(f"Recursive tree of {repo_owner}/{repo_name}:{prefix or '/'} is truncated, listing it level by level.")
+        if level is None:
+            level = await self._request("GET", url)
+        items = level.get("tree", [])
+        entries = [(prefix + item["path"], item.get("size") or 0) for item in items if item.get("type") == "blob"]
+        subtrees = [item for item in items if item.get("type") == "tree"]
+        if len(subtrees) > budget[0]:
+            logger.warning(f"Not expanding {len(subtrees)} directories under {prefix or '/'}: max_subtrees reached.")
+            return entries, True
+        budget[0] -= len(subtrees)
+        results = await asyncio.gather(*(
+            self._collect_tree(repo_owner, repo_name, item["sha"], f"{prefix}{item['path']}/", None, budget)
+            for item in subtrees
+        ))
+        truncated = False
+        for sub_entries, sub_truncated in results:
+            entries.extend(sub_entries)
+            truncated = truncated or sub_truncated
+        return entries, truncated
 
-    async def _fetch_file_content(self, session: aiohttp.ClientSession, repo_owner: str, repo_name: str, path: str, ref: str) -> str:
+    async def _fetch_file_content(self, repo_owner: str, repo_name: str, path: str, ref: str) -> str:
         """
         Helper to fetch raw file content from GitHub API.
+        Content at a full commit SHA is immutable, so it is served from the blob cache when possible.
+        A missing file yields ""; any other failure raises GitHubRequestError so callers can report it.
         """
-        url = f"{self.BASE_URL}/repos/{repo_owner}/{repo_name}/contents/{path}"
-        params = {"ref": ref}
-        # Create a new headers dict for this request to include the raw accept header
-        headers = self.headers.copy()
-        headers["Accept"] = "application/vnd.github.v3.raw"
-        
-        try:
-            async with session.get(url, params=params, headers=headers) as response:
-                if response.status == 404:
-                    logger.warning(f"File {path} not found at ref {ref} (possibly deleted or new)")
-                    return ""
-                response.raise_for_status()
-                return await response.text()
-        except Exception as e:
-            logger.error(f"Failed to fetch content for {path} at {ref}: {e}")
+        with tracer.span("github.fetch_file_content", {"file.path": path, "git.ref": ref}) as span:
+            cache_key = (repo_owner, repo_name, path, ref)
+            cacheable = is_immutable_ref(ref)
+            if cacheable:
+                cached = await self.blob_cache.aget(cache_key)
+                if cached is not None:
+                    span.set_attributes({"cache_hit": True, "bytes": len(cached)})
+                    return cached
+
+            url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/contents/{path}"
+            content = await self._request("GET", url, read="text", allow_404=True, params={"ref": ref})
+            if content is None:
+                logger.warning(f"File {path} not found at ref {ref} (possibly deleted or new)")
+                span.set_attributes({"cache_hit": False, "not_found": True, "bytes": 0})
+                return ""
+
+            span.set_attributes({"cache_hit": False, "bytes": len(content)})
+            if cacheable:
+                await self.blob_cache.aput(cache_key, content)
+            return content
+
+    async def _fetch_tree_blob_shas(self, repo_owner: str, repo_name: str, sha: str) -> Tuple[Dict[str, str], bool]:
+        """
+        Fetches the recursive tree of a commit and returns ({path: blob sha}, truncated).
+        """
+        url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/git/trees/{sha}"
+        tree_data = await self._request("GET", url, params={"recursive": "1"})
+        blob_shas = {item["path"]: item["sha"] for item in tree_data.get("tree", []) if item.get("type") == "blob"}
+        return blob_shas, bool(tree_data.get("truncated"))
+
+    async def _fetch_blob(self, repo_owner: str, repo_name: str, blob_sha: str) -> str:
+        """
+        Fetches a single raw blob by its SHA via /git/blobs.
+        """
+        url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/git/blobs/{blob_sha}"
+        return await self._request("GET", url, read="text")
+
+    async def _fetch_blobs_rest(self, repo_owner: str, repo_name: str, blob_shas: List[str]) -> Dict[str, Any]:
+        """
+        Returns {blob sha: content or the exception that prevented fetching it}.
+        """
+        contents = await asyncio.gather(
+            *(self._fetch_blob(repo_owner, repo_name, blob_sha) for blob_sha in blob_shas),
+            return_exceptions=True,
+        )
+        return dict(zip(blob_shas, contents))
+
+    async def _fetch_blobs_graphql(self, repo_owner: str, repo_name: str, blob_shas: List[str]) -> Dict[str, Any]:
+        """
+        Fetches many blobs with one GraphQL query per GRAPHQL_BATCH_SIZE blobs.
+        Blobs the query could not return are fetched through REST instead.
+        """
+        contents: Dict[str, Any] = {}
+        for offset in range(0, len(blob_shas), self.GRAPHQL_BATCH_SIZE):
+            batch = blob_shas[offset:offset + self.GRAPHQL_BATCH_SIZE]
+            # blob SHA 是纯十六进制字符串，可以安全地内联到查询中
+            fields = " ".join(
+                f'b{i}: object(expression: "{blob_sha}") {{ ... on Blob {{ text isBinary }} }}'
+                for i, blob_sha in enumerate(batch)
+            )
+            query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+            payload = {"query": query, "variables": {"owner": repo_owner, "name": repo_name}}
+            try:
+                data = await self._request("POST", f"{self.base_url}/graphql", json=payload)
+                if data.get("errors"):
+                    logger.warning(f"GraphQL blob query returned errors: {data['errors']}")
+                repository = (data.get("data") or {}).get("repository") or {}
+                for i, blob_sha in enumerate(batch):
+                    blob = repository.get(f"b{i}")
+                    if blob is not None:
+                        contents[blob_sha] = "" if blob.get("isBinary") else (blob.get("text") or "")
+            except GitHubRequestError as e:
+                logger.error(f"GraphQL blob query failed, falling back to REST: {e}")
+
+        missing = [blob_sha for blob_sha in blob_shas if blob_sha not in contents]
+        if missing:
+            contents.update(await self._fetch_blobs_rest(repo_owner, repo_name, missing))
+        return contents
+
+    async def _fetch_contents_per_file(
+        self, repo_owner: str, repo_name: str, files_data: List[Dict[str, Any]], base_sha: str, head_sha: str,
+    ) -> List[Tuple[Any, Any]]:
+        """
+        "contents" 模式：每个文件分别请求 base 和 head 版本的 /contents/{path}。
+        返回每个文件的 (原始内容, 修改后内容)，失败的一侧为对应的异常对象。
+        """
+        async def no_content() -> str:
             return ""
-        
 
+        requests = []
+        for file_info in files_data:
+            filename = file_info["filename"]
+            status = file_info["status"]
+            original_path = file_info.get("previous_filename") or filename
+            # 新增文件没有原始内容，删除文件没有修改后内容
+            requests.append(
+                no_content() if status == "added"
+                else self._fetch_file_content(repo_owner, repo_name, original_path, base_sha)
+            )
+            requests.append(
+                no_content() if status == "removed"
+                else self._fetch_file_content(repo_owner, repo_name, filename, head_sha)
+            )
 
+        # 调度器负责限制并发，这里可以一次性提交所有请求
+        outcomes = await asyncio.gather(*requests, return_exceptions=True)
+        return [(outcomes[i], outcomes[i + 1]) for i in range(0, len(outcomes), 2)]
 
-        
-    async def get_pr_code_review_info(self, repo_owner: str, repo_name: str, pull_number: int) -> Dict[str, Any]:
+    async def _fetch_trees(self, repo_owner: str, repo_name: str, base_sha: str, head_sha: str) -> Tuple[Tuple[Dict[str, str], bool], Tuple[Dict[str, str], bool]]:
+        return await asyncio.gather(
+            self._fetch_tree_blob_shas(repo_owner, repo_name, base_sha),
+            self._fetch_tree_blob_shas(repo_owner, repo_name, head_sha),
+        )
+
+    async def _fetch_contents_by_blob(
+        self, repo_owner: str, repo_name: str, files_data: List[Dict[str, Any]], base_sha: str, head_sha: str,
+        trees: Tuple[Tuple[Dict[str, str], bool], Tuple[Dict[str, str], bool]],
+        blob_tasks: Dict[str, asyncio.Future], fetch_mode: str = "git",
+    ) -> List[Tuple[Any, Any]]:
+        """
+        "git" / "graphql" 模式：根据 base 和 head 的完整树在本地比较 blob SHA，只拉取真正需要的 blob。
+        相同内容 (相同 blob SHA) 无论出现在 base/head、多个文件还是多页中都只拉取一次：
+        `blob_tasks` 记录同一个 PR 内已经发起的 blob 请求，后续页直接复用。
+        """
+        (base_tree, base_truncated), (head_tree, head_truncated) = trees
+
+        pairs = []
+        for file_info in files_data:
+            filename = file_info["filename"]
+            status = file_info["status"]
+            # 重命名的文件在 base 中位于 previous_filename
+            original_path = file_info.get("previous_filename") or filename
+            original_sha = None if status == "added" else base_tree.get(original_path)
+            updated_sha = None if status == "removed" else head_tree.get(filename)
+            pairs.append((original_sha, updated_sha))
+
+        blob_contents: Dict[str, Any] = {}
+        wanted = []
+        for blob_sha in dict.fromkeys(sha for pair in pairs for sha in pair if sha):
+            if blob_sha in blob_tasks:
+                continue
+            cached = await self.blob_cache.aget((repo_owner, repo_name, GIT_BLOB_PATH, blob_sha))
+            if cached is not None:
+                blob_contents[blob_sha] = cached
+            else:
+                wanted.append(blob_sha)
+
+        logger.info(f"Fetching {len(wanted)} unique blobs ({len(blob_contents)} cached) for {len(files_data)} files.")
+        # 每个 blob 任务的结果都是 {blob sha: 内容或异常}，GraphQL 模式下整批共享一个任务
+        if fetch_mode in ("graphql", "mirror") and wanted:
+            if fetch_mode == "mirror":
+                batch = asyncio.ensure_future(self.git_source.read_blobs(repo_owner, repo_name, wanted))
+            else:
+                batch = asyncio.ensure_future(self._fetch_blobs_graphql(repo_owner, repo_name, wanted))
+            for blob_sha in wanted:
+                blob_tasks[blob_sha] = batch
+        elif wanted:
+            for blob_sha in wanted:
+                blob_tasks[blob_sha] = asyncio.ensure_future(self._fetch_blobs_rest(repo_owner, repo_name, [blob_sha]))
+
+        for blob_sha in dict.fromkeys(sha for pair in pairs for sha in pair if sha):
+            if blob_sha not in blob_contents:
+                content = (await blob_tasks[blob_sha])[blob_sha]
+                if isinstance(content, str):
+                    await self.blob_cache.aput((repo_owner, repo_name, GIT_BLOB_PATH, blob_sha), content)
+                blob_contents[blob_sha] = content
+
+        async def resolve(blob_sha: Optional[str], missing: bool, path: str, ref: str) -> Any:
+            if blob_sha:
+                return blob_contents.get(blob_sha, "")
+            if not missing:
+                return ""
+            # 树被截断时，缺失的路径退回到 contents API
+            try:
+                return await self._fetch_file_content(repo_owner, repo_name, path, ref)
+            except GitHubRequestError as e:
+                return e
+
+        results = []
+        for file_info, (original_sha, updated_sha) in zip(files_data, pairs):
+            status = file_info["status"]
+            filename = file_info["filename"]
+            original_path = file_info.get("previous_filename") or filename
+            results.append((
+                await resolve(original_sha, status != "added" and base_truncated, original_path, base_sha),
+                await resolve(updated_sha, status != "removed" and head_truncated, filename, head_sha),
+            ))
+        return results
+
+    async def _read_pull_from_mirror(
+        self, repo_owner: str, repo_name: str, pull_number: int, base_sha: str, head_sha: str,
+    ) -> Tuple[List[Dict[str, Any]], Tuple[Tuple[Dict[str, str], bool], Tuple[Dict[str, str], bool]]]:
+        """
+        从本地 mirror 读取 PR 的变更文件列表 (与 /pulls/{n}/files 相同的字段) 以及 base/head 两棵树。
+        """
+        source = self.git_source
+        await source.ensure_pull(repo_owner, repo_name, pull_number, base_sha, head_sha)
+        files_data, base_tree, head_tree = await asyncio.gather(
+            source.diff_files(repo_owner, repo_name, base_sha, head_sha),
+            source.tree_blob_shas(repo_owner, repo_name, base_sha),
+            source.tree_blob_shas(repo_owner, repo_name, head_sha),
+        )
+        return files_data, ((base_tree, False), (head_tree, False))
+
+    async def _fetch_page_contents(
+        self, repo_owner: str, repo_name: str, files_data: List[Dict[str, Any]], base_sha: str, head_sha: str,
+        fetch_mode: str, trees_task: Optional[asyncio.Future], blob_tasks: Dict[str, asyncio.Future],
+    ) -> List[Tuple[Any, Any]]:
+        """
+        获取一页变更文件的 (原始内容, 修改后内容)。
+        """
+        if fetch_mode != "contents":
+            try:
+                trees = await trees_task
+            except GitHubRequestError as e:
+                logger.warning(f"Failed to fetch trees, falling back to per-file contents: {e}")
+            else:
+                return await self._fetch_contents_by_blob(
+                    repo_owner, repo_name, files_data, base_sha, head_sha, trees, blob_tasks, fetch_mode=fetch_mode,
+                )
+        return await self._fetch_contents_per_file(repo_owner, repo_name, files_data, base_sha, head_sha)
+
+    @staticmethod
+    def _build_file_result(file_info: Dict[str, Any], outcomes: Tuple[Any, Any]) -> Dict[str, Any]:
+        # 失败的一侧以异常对象返回：内容置空，并在文件上标记错误
+        errors = [str(outcome) for outcome in outcomes if isinstance(outcome, BaseException)]
+        original_content, updated_content = ("" if isinstance(o, BaseException) else o for o in outcomes)
+        file_result = {
+            "filename": file_info["filename"],
+            "status": file_info["status"],
+            "diff_info": file_info.get("patch", ""),
+            "original_content": original_content,
+            "updated_content": updated_content
+        }
+        if errors:
+            file_result["fetch_error"] = "; ".join(errors)
+        return file_result
+
+    @timed(GITHUB_CALL_SECONDS.labels("get_pull_request"))
+    async def get_pull_request(self, repo_owner: str, repo_name: str, pull_number: int) -> Dict[str, Any]:
+        """
+        获取单个 PR 的详细信息 (包括 base/head SHA)。
+
+        :raises GitHubRequestError: 请求失败
+        """
+        pr_url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
+        return await self._request("GET", pr_url)
+
+    @timed(GITHUB_CALL_SECONDS.labels("compare_commits"))
+    async def compare_commits(self, repo_owner: str, repo_name: str, base: str, head: str) -> Dict[str, Any]:
+        """
+        比较两个提交，返回 {"status": "ahead" | "behind" | "diverged" | "identical", "files": [...], "truncated": bool}。
+        `files` 包含重命名前后的路径。GitHub 的 compare 接口最多返回 300 个文件，超出时 truncated 为 True。
+
+        :raises GitHubRequestError: 请求失败
+        """
+        if self.fetch_mode == "mirror" and self.git_source is not None:
+            try:
+                return await self.git_source.compare(repo_owner, repo_name, base, head)
+            except GitMirrorError as e:
+                logger.warning(f"Mirror cannot compare {base}...{head}, using the REST API: {e}")
+        url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/compare/{base}...{head}"
+        data = await self._request("GET", url)
+        files = data.get("files", [])
+        filenames = set()
+        for file_info in files:
+            filenames.add(file_info["filename"])
+            if file_info.get("previous_filename"):
+                filenames.add(file_info["previous_filename"])
+        return {
+            "status": data.get("status"),
+            "files": sorted(filenames),
+            "truncated": len(files) >= self.COMPARE_FILES_LIMIT,
+        }
+
+    async def iter_pr_code_review_files(
+        self, repo_owner: str, repo_name: str, pull_number: int, fetch_mode: Optional[str] = None,
+        only_files: Optional[Set[str]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式获取 PR 的变更文件及其内容，按 PR 文件顺序逐个产出。
+
+        变更文件列表按页 (每页 PER_PAGE 个) 获取，每到达一页就立即开始拉取这一页的文件内容，
+        同时预取下一页；因此调用方可以在完整列表到达之前开始处理前面的文件。
+        GitHub 对 /pulls/{n}/files 最多返回 3000 个文件。
+
+        :param only_files: 只产出 (并只拉取内容) 这些文件，用于增量评审
+        :raises GitHubRequestError: PR 信息或文件列表获取失败
+        """
+        fetch_mode = fetch_mode or self.fetch_mode
+        if fetch_mode not in self.FETCH_MODES:
+            raise ValueError(f"Unknown fetch_mode '{fetch_mode}', expected one of {self.FETCH_MODES}")
+        if fetch_mode == "mirror" and self.git_source is None:
+            raise ValueError("fetch_mode 'mirror' requires a git source (see github.mirror)")
+
+        # 1. Get PR details to find base and head SHA
+        pr_data = await self.get_pull_request(repo_owner, repo_name, pull_number)
+        base_sha = pr_data["base"]["sha"]
+        head_sha = pr_data["head"]["sha"]
+
+        if fetch_mode == "mirror":
+            # mirror 中的读取都在本地完成，先全部取完再产出；失败时整个 PR 退回 "git" 模式
+            try:
+                files_data, trees = await self._read_pull_from_mirror(repo_owner, repo_name, pull_number, base_sha, head_sha)
+                if only_files is not None:
+                    files_data = [file_info for file_info in files_data if file_info["filename"] in only_files]
+                outcomes = await self._fetch_contents_by_blob(
+                    repo_owner, repo_name, files_data, base_sha, head_sha, trees, {}, fetch_mode="mirror",
+                )
+            except GitMirrorError as e:
+                logger.warning(f"Mirror cannot serve {repo_owner}/{repo_name}#{pull_number}, using the REST API: {e}")
+                fetch_mode = "git"
+            else:
+                for file_info, file_outcomes in zip(files_data, outcomes):
+                    yield self._build_file_result(file_info, file_outcomes)
+                return
+
+        # 2. 树与文件列表并行获取；blob 模式下每一页都依赖这两棵树
+        trees_task = None
+        if fetch_mode != "contents":
+            trees_task = asyncio.ensure_future(self._fetch_trees(repo_owner, repo_name, base_sha, head_sha))
+        blob_tasks: Dict[str, asyncio.Future] = {}
+        page_tasks: Deque[Tuple[List[Dict[str, Any]], asyncio.Future]] = deque()
+
+        files_url = f"{self.base_url}/repos/{repo_owner}/{repo_name}/pulls/{pull_number}/files"
+        try:
+            async for page in self._iter_pages(files_url):
+                if only_files is not None:
+                    page = [file_info for file_info in page if file_info["filename"] in only_files]
+                # 3. 每页到达后立即开始拉取内容，已完成的页先产出
+                page_tasks.append((page, asyncio.ensure_future(self._fetch_page_contents(
+                    repo_owner, repo_name, page, base_sha, head_sha, fetch_mode, trees_task, blob_tasks
+                ))))
+                while page_tasks and page_tasks[0][1].done():
+                    done_page, task = page_tasks.popleft()
+                    for file_info, outcomes in zip(done_page, task.result()):
+                        yield self._build_file_result(file_info, outcomes)
+            while page_tasks:
+                done_page, task = page_tasks.popleft()
+                for file_info, outcomes in zip(done_page, await task):
+                    yield self._build_file_result(file_info, outcomes)
+        finally:
+            # 调用方提前结束迭代时，取消仍在进行的请求
+            for _, task in page_tasks:
+                task.cancel()
+            for task in [trees_task, *blob_tasks.values()]:
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @timed(GITHUB_CALL_SECONDS.labels("get_pr_code_review_info"))
+    async def get_pr_code_review_info(
+        self, repo_owner: str, repo_name: str, pull_number: int, fetch_mode: Optional[str] = None,
+        only_files: Optional[Set[str]] = None,
+    ) -> Dict[str, Any]:
         """
         获取 PR 的 Code Review 所需的所有信息：
         包括变更的文件列表、Diff、以及每个文件的原始内容和修改后内容。
+
+        :param fetch_mode: 文件内容的获取方式，默认使用 yaml 中的 `github.fetch_mode`
+            - "contents": 每个变更文件请求两次 /contents/{path}
+            - "git": 获取 base/head 两棵树，按去重后的 blob SHA 请求 /git/blobs
+            - "graphql": 同 "git"，但每页的 blob 合并为 GraphQL 批量查询
+            - "mirror": 只请求 PR 信息，文件列表、diff 和内容从本地 bare mirror 读取
+        :param only_files: 只返回这些文件 (增量评审时使用)，为 None 时返回全部变更文件
+        :return: {"changed_files": [...], "fetch_status": "complete" | "partial" | "failed", "failed_files": [...]}
+            某个文件内容获取失败时，该文件带有 `fetch_error` 字段，而不是静默返回空字符串。
         """
-        import asyncio
-        
-        logger.info(f"Fetching PR info for {repo_owner}/{repo_name}#{pull_number}")
-        
-        try:
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                # 1. Get PR details to find base and head SHA
-                pr_url = f"{self.BASE_URL}/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
-                async with session.get(pr_url) as response:
-                    response.raise_for_status()
-                    pr_data = await response.json()
-                
-                base_sha = pr_data["base"]["sha"]
-                head_sha = pr_data["head"]["sha"]
-                
-                # 2. Get list of changed files
-                files_url = f"{self.BASE_URL}/repos/{repo_owner}/{repo_name}/pulls/{pull_number}/files"
-                async with session.get(files_url) as response:
-                    response.raise_for_status()
-                    files_data = await response.json()
-                
-                logger.info(f"Found {len(files_data)} changed files. Fetching contents...")
-                
-                # 3. Concurrently fetch content for all files
-                tasks = []
-                for file_info in files_data:
-                    filename = file_info["filename"]
-                    status = file_info["status"]
-                    
-                    # Fetch original content (from base)
-                    if status == "added":
-                        original_task = asyncio.create_task(asyncio.sleep(0, result="")) # No original content
-                    else:
-                        original_task = self._fetch_file_content(session, repo_owner, repo_name, filename, base_sha)
-                        
-                    # Fetch updated content (from head)
-                    if status == "removed":
-                        updated_task = asyncio.create_task(asyncio.sleep(0, result="")) # No updated content
-                    else:
-                        updated_task = self._fetch_file_content(session, repo_owner, repo_name, filename, head_sha)
-                        
-                    tasks.append((file_info, original_task, updated_task))
-                
-                results = []
-                for file_info, original_task, updated_task in tasks:
-                    original_content = await original_task
-                    updated_content = await updated_task
-                    
-                    results.append({
-                        "filename": file_info["filename"],
-                        "status": file_info["status"],
-                        "diff_info": file_info.get("patch", ""),
-                        "original_content": original_content,
-                        "updated_content": updated_content
+        fetch_mode = fetch_mode or self.fetch_mode
+        if fetch_mode not in self.FETCH_MODES:
+            raise ValueError(f"Unknown fetch_mode '{fetch_mode}', expected one of {self.FETCH_MODES}")
+
+        logger.info(f"Fetching PR info for {repo_owner}/{repo_name}#{pull_number} (fetch_mode={fetch_mode})")
+
+        with tracer.span("github.get_pr_code_review_info", {
+            "github.repo": f"{repo_owner}/{repo_name}", "github.pull_number": pull_number, "github.fetch_mode": fetch_mode,
+        }) as span:
+            try:
+                results = [
+                    file_result
+                    async for file_result in self.iter_pr_code_review_files(
+                        repo_owner, repo_name, pull_number, fetch_mode, only_files=only_files
+                    )
+                ]
+                failed_files = [f["filename"] for f in results if "fetch_error" in f]
+
+                if failed_files:
+                    logger.warning(f"Failed to fetch contents for {len(failed_files)} of {len(results)} files: {failed_files}")
+                logger.info(f"Fetched {len(results)} changed files. Blob cache stats: {self.blob_cache.stats()}, scheduler stats: {self.scheduler.stats()}")
+                if span.is_recording:
+                    span.set_attributes({
+                        "pr.changed_files": len(results),
+                        "pr.diff_bytes": sum(len(f.get("diff_info") or "") for f in results),
+                        "pr.failed_files": len(failed_files),
+                        "bytes_fetched": sum(
+                            len(f.get("original_content") or "") + len(f.get("updated_content") or "") for f in results
+                        ),
                     })
-                
-                return {"changed_files": results}
+                return {
+                    "changed_files": results,
+                    "fetch_status": "partial" if failed_files else "complete",
+                    "failed_files": failed_files,
+                }
 
-        except Exception as e:
-            logger.error(f"Error getting PR code review info: {e}")
-            return {"changed_files": []}
+            except Exception as e:
+                logger.error(f"Error getting PR code review info: {e}")
+                span.record_exception(e)
+                return {"changed_files": [], "fetch_status": "failed", "failed_files": [], "error": str(e)}
+
+
+# 进程级共享实例：所有工具和服务复用同一个连接池，由 server.py 的 lifespan 负责 start/close
+github_service = GitHubService()
@@ -1,21 +1,47 @@
 import src.configs.config
+from typing import Any, Optional
 from langchain_core.runnables import Runnable
 from loguru import logger
 
+from src.configs.config import yaml_configs
+from src.services.response_cache import ResponseCache
+
+_DEFAULT_CACHE = object()
+
 class LLMService:
-    def __init__(self, runnable: Runnable):
+    def __init__(self, runnable: Runnable, cache: Any = _DEFAULT_CACHE):
+        """
+        :param cache: ResponseCache for `ainvoke`; defaults to `llm.response_cache` in the yaml config, None disables caching
+        """
         logger.info("Initializing LLMService...")
         self.runnable = runnable
+        self.cache: Optional[ResponseCache] = ResponseCache.from_config() if cache is _DEFAULT_CACHE else cache
         logger.info("LLMService initialized.")
 
+    def _cache_identity(self) -> dict:
+        """Provider, model and temperature of the wrapped runnable, part of the cache key."""
+        return {
+            "provider": ((yaml_configs or {}).get("llm") or {}).get("provider"),
+            "model": getattr(self.runnable, "model_name", None) or getattr(self.runnable, "model", None),
+            "temperature": getattr(self.runnable, "temperature", None),
+        }
+
     async def ainvoke(self, prompt: str):
-        logger.info(f"LLMService ainvoking with prompt: {prompt}")
-        response = await self.runnable.ainvoke(prompt)
+        # 完整 prompt 只在 DEBUG 级别输出 (超长时由日志 filter 截断)
+        logger.info(f"LLMService ainvoking with a {len(str(prompt))}-char prompt.")
+        logger.debug(f"LLMService prompt: {prompt}")
+        if self.cache is None:
+            response = await self.runnable.ainvoke(prompt)
+        else:
+            response = await self.cache.get_or_compute(
+                prompt, lambda: self.runnable.ainvoke(prompt), **self._cache_identity()
+            )
         logger.info("LLMService ainvocation complete.")
         return response
 
     async def astream(self, prompt: str):
         """Streams the response from the Runnable (LLM or Agent)."""
-        logger.info(f"LLMService astreaming with prompt: {prompt}")
+        logger.info(f"LLMService astreaming with a {len(str(prompt))}-char prompt.")
+        logger.debug(f"LLMService prompt: {prompt}")
         async for chunk in self.runnable.astream(prompt):
             yield chunk
@@ -0,0 +1,159 @@
+"""
+同步代码 (LangChain 工具的 `_run`、模型的 `_generate`) 调用异步 service 的桥接。
+
+`asyncio.run()` 每次调用都新建一个事件循环，共享的 GitHub / Gemini 连接池 (绑定在服务的事件循环上)
+因此每次都要重建，而且在已运行的事件循环中直接报错。这里改为把协程提交到一个长期运行的循环上，
+调用线程只等待结果：
+- 服务启动后 (server.py 的 lifespan 调用 `attach`)，提交到服务自己的事件循环，复用同一个连接池；
+  同步的 agent 通常运行在线程池中，等待结果不会阻塞服务的事件循环。
+- 没有服务循环时 (脚本、测试)，提交到一个后台线程里的专用事件循环。
+
+注意不要在服务循环的默认 executor (`asyncio.to_thread`、`run_in_executor(None, ...)`) 里大量调用同步入口：
+aiohttp 在这个 executor 里做 DNS 解析，线程全部阻塞等待时会死锁。请使用单独的线程池
+(FastAPI 的同步端点使用的是 anyio 的线程池，不受影响)。
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class LoopRunner:
+    def __init__(self):
+        self._service_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._background_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def attach(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """把服务的事件循环 (默认为当前运行的循环) 设为同步调用的目标。"""
+        self._service_loop = loop or asyncio.get_running_loop()
+
+    def detach(self) -> None:
+        self._service_loop = None
+
+    def _get_background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._background_loop is None or self._background_loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="loop-runner", daemon=True)
+                thread.start()
+                self._background_loop, self._background_thread = loop, thread
+            return self._background_loop
+
+    def target_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        返回执行协程的事件循环。当前线程正在运行事件循环时不能提交给它自己 (会死锁)，
+        此时使用后台循环。
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        service_loop = self._service_loop
+        if service_loop is not None and service_loop.is_running() and service_loop is not running:
+            return service_loop
+        if running is not None:
+            logger.warning("Sync call made from inside a running event loop blocks that loop until it finishes; use the async entry point instead.")
+        return self._get_background_loop()
+
+    def submit(self, coro: Awaitable[T]) -> "Future[T]":
+        return asyncio.run_coroutine_threadsafe(coro, self.target_loop())
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """
+        在长期运行的事件循环上执行 `coro` 并阻塞当前线程等待结果。
+        超时时取消协程并抛出 TimeoutError。
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self) -> None:
+        """停止后台循环 (如果启动过)。"""
+        with self._lock:
+            loop, thread = self._background_loop, self._background_thread
+            self._background_loop = self._background_thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+class LoopSessions:
+    """
+    每个事件循环各自持有一个 aiohttp.ClientSession。
+
+    session 及其连接器绑定在创建它的事件循环上。服务循环和 `LoopRunner` 的后台循环同时存在时，
+    各用各的 session，不会在同一个槽位里互相替换、反复重建连接池。
+    循环关闭后它的 session 无法再正常关闭，下次取用时丢弃；其余的由 `close()` 在各自的循环上关闭。
+    """
+
+    def __init__(self, factory: Callable[[], aiohttp.ClientSession], close_timeout: float = 5.0):
+        self._factory = factory
+        self._close_timeout = close_timeout
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> aiohttp.ClientSession:
+        """返回当前运行循环上的 session，没有 (或已关闭) 时创建。"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for other in [other for other in self._sessions if other.is_closed()]:
+                logger.debug("Dropping aiohttp session of a closed event loop.")
+                del self._sessions[other]
+            session = self._sessions.get(loop)
+            if session is None or session.closed:
+                session = self._sessions[loop] = self._factory()
+            return session
+
+    def current(self) -> Optional[aiohttp.ClientSession]:
+        """当前运行循环上的 session (没有时为 None)，不会创建。"""
+        with self._lock:
+            return self._sessions.get(asyncio.get_running_loop())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(1 for session in self._sessions.values() if not session.closed)
+
+    async def close(self) -> int:
+        """
+        关闭所有循环上的 session：当前循环上的直接等待，其他仍在运行的循环上的提交过去并等待
+        (最多 `close_timeout` 秒)。返回关闭的数量。
+        """
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        current = asyncio.get_running_loop()
+        closed = 0
+        for loop, session in sessions.items():
+            if session.closed:
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(session.close(), loop)
+                try:
+                    await asyncio.wait_for(asyncio.wrap_future(future), self._close_timeout)
+                except (asyncio.TimeoutError, RuntimeError) as e:
+                    logger.warning(f"Could not close an aiohttp session on another event loop: {e!r}")
+                    continue
+            else:
+                # 循环已停止，连接随循环一起释放
+                continue
+            closed += 1
+        return closed
+
+
+# 进程级共享实例
+loop_runner = LoopRunner()
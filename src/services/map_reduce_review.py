@@ -0,0 +1,189 @@
+import asyncio
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.runnables import Runnable
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.context_packer import ContextPacker
+from src.services.github_service import GitHubService
+from src.services.review_events import ReviewEventCallback, emit
+from src.services.review_report import message_text, parse_review_report, render_review_report
+
+DEFAULT_MAP_REDUCE_OPTIONS: Dict[str, Any] = {
+    "max_concurrency": 8,      # 同时进行的 LLM 调用上限
+    "max_chunk_chars": 24000,  # 单个 chunk 的上下文字符数上限，超出的文件按 hunk 分组
+}
+
+# Unified diff hunk header, e.g. "@@ -10,7 +10,8 @@ def foo():"
+_HUNK_HEADER = re.compile(r"^@@ .* @@", re.MULTILINE)
+
+
+def load_map_reduce_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("map_reduce") or {}
+    return {**DEFAULT_MAP_REDUCE_OPTIONS, **configured}
+
+
+def split_hunks(patch: str) -> List[str]:
+    """Splits a unified diff patch into hunks, each starting with its "@@" header."""
+    starts = [m.start() for m in _HUNK_HEADER.finditer(patch)]
+    if not starts:
+        return [patch] if patch else []
+    return [patch[start:end] for start, end in zip(starts, starts[1:] + [len(patch)])]
+
+
+def build_chunks(file_info: Dict[str, Any], max_chunk_chars: int) -> List[str]:
+    """
+    Renders the review context for one changed file.
+
+    Small files become a single chunk with the patch and the packed `context` excerpt (or,
+    for unpacked files, the full updated/original content). Files over `max_chunk_chars` are
+    split into groups of hunks without the content, so each group fits the budget on its own.
+    """
+    filename, status = file_info["filename"], file_info["status"]
+    patch = file_info.get("diff_info") or ""
+    if "context" in file_info:
+        content = file_info["context"]
+    else:
+        content = file_info["original_content"] if status == "removed" else file_info["updated_content"]
+    header = f"File: {filename} (status: {status})"
+    if file_info.get("fetch_error"):
+        header += f"\nNote: the file content could not be fetched ({file_info['fetch_error']}); review the patch only."
+        content = ""
+
+    full = f"{header}\n\nPatch:\n```diff\n{patch}\n```\n\nContent:\n```\n{content}\n```\n"
+    if len(full) <= max_chunk_chars:
+        return [full]
+
+    hunks = split_hunks(patch)
+    groups: List[List[str]] = [[]]
+    size = 0
+    for hunk in hunks:
+        if groups[-1] and size + len(hunk) > max_chunk_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(hunk)
+        size += len(hunk)
+    chunks = []
+    for i, group in enumerate(groups, start=1):
+        patch_part = "".join(group)
+        chunks.append(
+            f"{header}\nHunk group {i} of {len(groups)} (the file is too large to include in full).\n\n"
+            f"Patch:\n```diff\n{patch_part}\n```\n"
+        )
+    return chunks
+
+
+class MapReduceReviewer:
+    """
+    Reviews a PR by fanning out one LLM call per file (or per hunk group of a large file)
+    and merging the partial reports into a single `## Code Review Report`.
+
+    Map calls start as soon as each file's content arrives from `iter_pr_code_review_files`
+    and run with bounded concurrency, so the wall-clock time follows the slowest chunk
+    rather than the sum of all chunks. The reduce step is a deterministic merge.
+    """
+
+    def __init__(
+        self,
+        file_reviewer: Runnable,
+        github: GitHubService,
+        max_concurrency: Optional[int] = None,
+        max_chunk_chars: Optional[int] = None,
+        packer: Optional[ContextPacker] = None,
+    ):
+        options = load_map_reduce_options()
+        self.file_reviewer = file_reviewer
+        self.github_service = github
+        self.packer = packer or ContextPacker()
+        self.max_concurrency = max_concurrency or options["max_concurrency"]
+        self.max_chunk_chars = max_chunk_chars or options["max_chunk_chars"]
+
+    async def _review_chunk(
+        self, semaphore: asyncio.Semaphore, filename: str, chunk: str, on_event: Optional[ReviewEventCallback]
+    ) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                message = await self.file_reviewer.ainvoke({"file_context": chunk})
+            except Exception as e:
+                logger.error(f"Map step failed for {filename}: {e}")
+                await emit(on_event, "file_reviewed", {"filename": filename, "error": str(e)})
+                return {"filename": filename, "error": str(e)}
+        summary, findings = parse_review_report(message_text(message))
+        await emit(on_event, "file_reviewed", {"filename": filename, "summary": summary, "findings": findings})
+        return {"filename": filename, "summary": summary, "findings": findings}
+
+    async def review(
+        self, repo_owner: str, repo_name: str, pull_number: int, only_files: Optional[Set[str]] = None,
+        on_event: Optional[ReviewEventCallback] = None,
+    ) -> str:
+        """
+        Runs the map and reduce steps and returns the merged markdown report.
+
+        :raises GitHubRequestError: PR 信息或文件列表获取失败
+        """
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: List[asyncio.Task] = []
+        fetch_failed: List[str] = []
+        skipped: List[str] = []
+        tokens_before = tokens_after = 0
+        try:
+            async for file_info in self.github_service.iter_pr_code_review_files(
+                repo_owner, repo_name, pull_number, only_files=only_files
+            ):
+                tokens_before += self.packer.estimate_tokens(json.dumps(file_info, ensure_ascii=False))
+                await emit(on_event, "file_fetched", {
+                    "filename": file_info["filename"], "status": file_info["status"],
+                    "fetch_error": file_info.get("fetch_error"),
+                })
+                if self.packer.options["enabled"]:
+                    packed = self.packer.pack_file(file_info)
+                    if packed is None:
+                        skipped.append(file_info["filename"])
+                        continue
+                    file_info = packed
+                if file_info.get("fetch_error"):
+                    fetch_failed.append(file_info["filename"])
+                for chunk in build_chunks(file_info, self.max_chunk_chars):
+                    tokens_after += self.packer.estimate_tokens(chunk)
+                    tasks.append(asyncio.create_task(
+                        self._review_chunk(semaphore, file_info["filename"], chunk, on_event)
+                    ))
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        report = self._reduce(results, fetch_failed, skipped)
+        logger.info(
+            f"Map-reduce review of {repo_owner}/{repo_name}#{pull_number}: {len(results)} chunks, "
+            f"context {tokens_before} -> {tokens_after} tokens, {time.perf_counter() - start:.2f}s"
+        )
+        return report
+
+    @staticmethod
+    def _reduce(results: List[Dict[str, Any]], fetch_failed: List[str], skipped: List[str]) -> str:
+        files = list(dict.fromkeys(result["filename"] for result in results))
+        failed = list(dict.fromkeys(result["filename"] for result in results if "error" in result))
+        findings = [finding for result in results if "error" not in result for finding in result["findings"]]
+
+        lines = [f"Reviewed {len(files)} file(s) in {len(results)} chunk(s); {len(findings)} finding(s)."]
+        if not files:
+            lines = ["The pull request has no changed files to review."]
+        for filename in files:
+            summaries = [r["summary"] for r in results if r["filename"] == filename and r.get("summary")]
+            if summaries:
+                lines.append(f"- `{filename}`: {' '.join(s.replace(chr(10), ' ') for s in summaries)}")
+        if failed:
+            lines.append(f"Not reviewed (LLM call failed): {', '.join(failed)}.")
+        if fetch_failed:
+            lines.append(f"Reviewed from the patch only (content fetch failed): {', '.join(fetch_failed)}.")
+        if skipped:
+            lines.append(f"Skipped (lockfile, generated or binary): {', '.join(skipped)}.")
+        if not findings and files and not failed:
+            lines.append("The code looks good.")
+        return render_review_report("\n".join(lines), findings)
@@ -0,0 +1,238 @@
+"""
+进程内的 Prometheus 指标 (text exposition format 0.0.4)，由 `GET /metrics` 输出。
+
+热路径上的开销尽量小：
+- 带标签的指标通过 `labels(*values)` 返回缓存的 child，标签值固定的调用点 (GitHub 操作名、LLM provider)
+  在定义时就取好 child，每次调用只做一次 bisect 和几个整数加法，不分配标签 dict。
+- 各组件已有的 stats() (缓存命中率、队列深度等) 通过 collector 在抓取时读取，不在热路径上计数。
+"""
+import functools
+import math
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 秒级延迟的默认桶，覆盖从缓存命中 (毫秒) 到长评审 (分钟)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    kind = ""
+    child_class: Callable[..., Any] = _CounterChild
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[Any, ...], Any] = {}
+        if not self.labelnames:
+            self._unlabelled = self._children[()] = self._new_child()
+
+    def _new_child(self) -> Any:
+        return self.child_class()
+
+    def labels(self, *values: Any) -> Any:
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    child_class = _GaugeChild
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabelled.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabelled.set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(b for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled.observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}"
+
+
+# collector 在抓取时返回 (name, type, help, [(labels dict, value), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, Any], float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+
+    def _register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        blocks = [metric.render() for metric in self._metrics.values()]
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(float(value))}")
+                blocks.append("\n".join(lines))
+        return "\n".join(blocks) + "\n"
+
+
+def timed(child: _HistogramChild) -> Callable:
+    """装饰协程函数，把每次调用的耗时 (包括失败的调用) 记录到一个预先取好的 histogram child。"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+metrics_registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    "http_request_duration_seconds", "HTTP handler latency, including streamed bodies.", ["method", "route"]
+)
+HTTP_REQUESTS_TOTAL = metrics_registry.counter(
+    "http_requests_total", "HTTP requests by response status.", ["method", "route", "status"]
+)
+HTTP_REQUESTS_IN_FLIGHT = metrics_registry.gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+
+GITHUB_CALL_SECONDS = metrics_registry.histogram(
+    "github_call_duration_seconds", "GitHubService call latency by operation.", ["operation"]
+)
+GITHUB_HTTP_SECONDS = metrics_registry.histogram(
+    "github_http_request_duration_seconds", "Latency of individual GitHub API requests, including retries.", ["method"]
+)
+
+LLM_CALL_SECONDS = metrics_registry.histogram("llm_call_duration_seconds", "LLM call latency by provider.", ["provider"])
+LLM_TOKENS_TOTAL = metrics_registry.counter(
+    "llm_tokens_total", "Tokens reported by the provider, by direction (input/output).", ["provider", "direction"]
+)
+LLM_ERRORS_TOTAL = metrics_registry.counter("llm_errors_total", "Failed LLM calls by provider.", ["provider"])
+LLM_CALLS_IN_FLIGHT = metrics_registry.gauge("llm_calls_in_flight", "LLM calls currently waiting for the provider.", ["provider"])
+
+AGENT_STEPS = metrics_registry.histogram(
+    "review_agent_steps", "Model and tool steps taken by the code review agent per review.", ["kind"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+REVIEW_SECONDS = metrics_registry.histogram("review_duration_seconds", "End-to-end review latency by mode.", ["mode"])
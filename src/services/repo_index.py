@@ -0,0 +1,256 @@
+import re
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from src.configs.config import yaml_configs
+
+# (repo_owner, repo_name, tree_sha)
+IndexKey = Tuple[str, str, str]
+
+DEFAULT_REPO_INDEX_OPTIONS: Dict[str, Any] = {
+    "max_repos": 16,            # (repo, tree SHA) indexes kept in memory
+    "default_limit": 200,       # paths returned per query unless the caller asks for fewer
+    "max_subtrees": 2000,       # directories listed one by one when the recursive tree is truncated
+    "max_regex_length": 256,    # longest regex accepted by RepoFileIndex.regex
+}
+
+_GLOB_SPECIAL = "*?["
+_REGEX_SPECIAL = ".^$*+?{}[]\\|()"
+
+
+def load_repo_index_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("github") or {}).get("repo_index") or {}
+    return {**DEFAULT_REPO_INDEX_OPTIONS, **configured}
+
+
+def _prefix_end(prefix: str) -> str:
+    # Every string starting with `prefix` sorts below prefix + U+10FFFF
+    return prefix + "\U0010ffff"
+
+
+def glob_to_regex(pattern: str) -> Pattern[str]:
+    """
+    Compiles a path glob: `*` and `?` stay within one directory level, `**` spans levels
+    (`src/**/*.py` also matches `src/a.py`), `[...]` is a character class.
+    """
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def regex_literal_prefix(pattern: str) -> str:
+    """
+    The literal text every match of an anchored regex (`^src/app/.*`) starts with, or "" when
+    there is none. Used to narrow the scan to one sorted range, as `glob` does.
+    """
+    if not pattern.startswith("^") or "|" in pattern:
+        return ""
+    out: List[str] = []
+    for c in pattern[1:]:
+        if c in _REGEX_SPECIAL:
+            # The last literal is optional under `*`, `?` or `{0,n}`
+            if c in "*?{" and out:
+                out.pop()
+            break
+        out.append(c)
+    return "".join(out)
+
+
+def extension_of(path: str) -> str:
+    name = path.rsplit("/", 1)[-1]
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot > 0 else ""
+
+
+class RepoFileIndex:
+    """
+    Immutable index of the files in one git tree: a sorted tuple of interned paths plus a
+    parallel array of blob sizes. Prefix queries are two bisects (O(log n)) and a slice;
+    globs narrow to the range of their literal prefix before matching. Directory
+    summaries and extension stats only walk the range under the requested directory.
+    """
+
+    def __init__(self, tree_sha: str, entries: Iterable[Tuple[str, int]], truncated: bool = False):
+        ordered = sorted(entries)
+        self.tree_sha = tree_sha
+        self.paths: Tuple[str, ...] = tuple(sys.intern(path) for path, _ in ordered)
+        self.sizes = array("q", (size or 0 for _, size in ordered))
+        # True only if even the non-recursive fallback could not list everything
+        self.truncated = truncated
+        self._extension_stats: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        if not prefix:
+            return 0, len(self.paths)
+        return bisect_left(self.paths, prefix), bisect_left(self.paths, _prefix_end(prefix))
+
+    @staticmethod
+    def _dir_prefix(directory: str) -> str:
+        directory = directory.strip("/")
+        return directory + "/" if directory else ""
+
+    def list_prefix(self, prefix: str = "", limit: Optional[int] = None) -> Dict[str, Any]:
+        """Paths starting with `prefix` (a directory like `src/` or any leading substring)."""
+        lo, hi = self._range(prefix)
+        end = hi if limit is None else min(hi, lo + limit)
+        return {"matches": list(self.paths[lo:end]), "match_count": hi - lo, "limit_reached": end < hi}
+
+    def _search(self, pattern: Pattern[str], lo: int, hi: int, limit: Optional[int]) -> Dict[str, Any]:
+        matches, count = [], 0
+        for path in self.paths[lo:hi]:
+            if pattern.match(path):
+                count += 1
+                if limit is None or len(matches) < limit:
+                    matches.append(path)
+        return {"matches": matches, "match_count": count, "limit_reached": len(matches) < count}
+
+    def glob(self, pattern: str, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Paths matching a glob such as `src/**/*.py` or `*.md`."""
+        cut = min((pattern.find(c) for c in _GLOB_SPECIAL if c in pattern), default=len(pattern))
+        lo, hi = self._range(pattern[:cut])
+        return self._search(glob_to_regex(pattern), lo, hi, limit)
+
+    def regex(self, pattern: str, limit: Optional[int] = None,
+              max_length: int = DEFAULT_REPO_INDEX_OPTIONS["max_regex_length"]) -> Dict[str, Any]:
+        """
+        Paths where the regular expression matches anywhere (re.search). Anchored patterns
+        only scan the range of their literal prefix.
+
+        :raises ValueError: the pattern is longer than `max_length` or does not compile
+        """
+        if len(pattern) > max_length:
+            raise ValueError(f"Regex is too long ({len(pattern)} > {max_length} characters)")
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid regex {pattern!r}: {e}")
+        lo, hi = self._range(regex_literal_prefix(pattern))
+        matches, count = [], 0
+        for path in self.paths[lo:hi]:
+            if compiled.search(path):
+                count += 1
+                if limit is None or len(matches) < limit:
+                    matches.append(path)
+        return {"matches": matches, "match_count": count, "limit_reached": len(matches) < count}
+
+    def extension_stats(self, directory: str = "") -> List[Dict[str, Any]]:
+        """[{"extension", "files", "bytes"}] under `directory`, most common first."""
+        prefix = self._dir_prefix(directory)
+        if not prefix and self._extension_stats is not None:
+            return self._extension_stats
+        lo, hi = self._range(prefix)
+        totals: Dict[str, List[int]] = {}
+        for i in range(lo, hi):
+            total = totals.setdefault(extension_of(self.paths[i]), [0, 0])
+            total[0] += 1
+            total[1] += self.sizes[i]
+        stats = [
+            {"extension": ext or "(none)", "files": files, "bytes": size}
+            for ext, (files, size) in sorted(totals.items(), key=lambda item: (-item[1][0], item[0]))
+        ]
+        if not prefix:
+            self._extension_stats = stats
+        return stats
+
+    def directory_summary(self, directory: str = "", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Immediate children of `directory`: subdirectories with their recursive file count and
+        size, and the files directly inside it.
+        """
+        prefix = self._dir_prefix(directory)
+        lo, hi = self._range(prefix)
+        directories: Dict[str, List[int]] = {}
+        files = []
+        for i in range(lo, hi):
+            rest = self.paths[i][len(prefix):]
+            slash = rest.find("/")
+            if slash < 0:
+                files.append({"name": rest, "bytes": self.sizes[i]})
+            else:
+                total = directories.setdefault(rest[:slash], [0, 0])
+                total[0] += 1
+                total[1] += self.sizes[i]
+        dirs = [{"name": name, "files": count, "bytes": size} for name, (count, size) in directories.items()]
+        return {
+            "directory": prefix.rstrip("/") or "/",
+            "total_files": hi - lo,
+            "directories": dirs if limit is None else dirs[:limit],
+            "files": files if limit is None else files[:limit],
+            "limit_reached": limit is not None and (len(dirs) > limit or len(files) > limit),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tree_sha": self.tree_sha, "files": len(self.paths), "truncated": self.truncated}
+
+
+class RepoIndexCache:
+    """
+    LRU of RepoFileIndex keyed by (owner, repo, tree SHA). A tree SHA names immutable
+    content, so entries never need invalidation; a moved branch simply resolves to a new key.
+    """
+
+    def __init__(self, max_repos: int = DEFAULT_REPO_INDEX_OPTIONS["max_repos"]):
+        self.max_repos = max_repos
+        self._indexes: "OrderedDict[IndexKey, RepoFileIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls) -> "RepoIndexCache":
+        return cls(max_repos=load_repo_index_options()["max_repos"])
+
+    def get(self, key: IndexKey) -> Optional[RepoFileIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                self.misses += 1
+                return None
+            self._indexes.move_to_end(key)
+            self.hits += 1
+            return index
+
+    def put(self, key: IndexKey, index: RepoFileIndex) -> None:
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_repos:
+                self._indexes.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "repos": len(self._indexes),
+            "files": sum(len(index) for index in self._indexes.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import math
+import operator
+import re
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+DEFAULT_RESPONSE_CACHE_OPTIONS: Dict[str, Any] = {
+    "enabled": True,
+    "max_entries": 1000,           # LRU 条目上限
+    "ttl": 3600,                   # 缓存秒数
+    "similarity_threshold": None,  # 设置后 (如 0.95) 对近似问题做 embedding 相似度查找
+    "embedding_model": None,       # 相似度查找使用的 embedding 模型，如 "models/text-embedding-004"
+    "similarity_candidates": 200,  # 相似度查找只比较同一模型最近的这些条目
+}
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def load_response_cache_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("llm") or {}).get("response_cache") or {}
+    return {**DEFAULT_RESPONSE_CACHE_OPTIONS, **configured}
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Unicode form and whitespace differences do not change the cache key. Case does: in code
+    questions `getUser` and `GetUser` (or SQL identifiers, env var names) are different things.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", prompt)).strip()
+
+
+def _unit_vector(values: List[float]) -> Optional[array]:
+    """The embedding scaled to length 1, so cosine similarity is a plain dot product."""
+    norm = math.sqrt(sum(x * x for x in values))
+    return array("f", (x / norm for x in values)) if norm else None
+
+
+def _best_match(query: array, candidates: List[array], threshold: float) -> Optional[int]:
+    """Index of the candidate with the highest dot product >= `threshold`, or None."""
+    best, best_score = None, threshold
+    for i, vector in enumerate(candidates):
+        score = sum(map(operator.mul, query, vector))
+        if score >= best_score:
+            best, best_score = i, score
+    return best
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of LLM responses keyed by (provider, model, temperature, normalized prompt hash).
+
+    - Concurrent misses for the same key are coalesced: one upstream call, every caller gets its result.
+    - With an `embeddings` object (LangChain `Embeddings`, `aembed_query`) and a `similarity_threshold`,
+      a miss is answered by the most similar cached prompt of the same model if it is close enough.
+      Only the `similarity_candidates` most recent prompts of that model are compared, in a worker thread.
+    - `stats()` reports hit ratio and the upstream latency saved by hits.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_RESPONSE_CACHE_OPTIONS["max_entries"],
+        ttl: float = DEFAULT_RESPONSE_CACHE_OPTIONS["ttl"],
+        embeddings: Any = None,
+        similarity_threshold: Optional[float] = None,
+        similarity_candidates: int = DEFAULT_RESPONSE_CACHE_OPTIONS["similarity_candidates"],
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.similarity_candidates = similarity_candidates
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # namespace -> keys of its entries that have an embedding, least recently used first
+        self._embedded: Dict[str, "OrderedDict[str, None]"] = {}
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.saved_latency = 0.0
+        self.upstream_latency = 0.0
+
+    @classmethod
+    def from_config(cls) -> Optional["ResponseCache"]:
+        """Builds the cache from `llm.response_cache`; returns None when disabled."""
+        options = load_response_cache_options()
+        if not options["enabled"]:
+            return None
+        embeddings = None
+        if options["similarity_threshold"] and options["embedding_model"]:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            embeddings = GoogleGenerativeAIEmbeddings(model=options["embedding_model"])
+        return cls(
+            max_entries=options["max_entries"],
+            ttl=options["ttl"],
+            embeddings=embeddings,
+            similarity_threshold=options["similarity_threshold"] if embeddings is not None else None,
+            similarity_candidates=options["similarity_candidates"],
+        )
+
+    @staticmethod
+    def make_key(provider: Any, model: Any, temperature: Any, prompt: str) -> Tuple[str, str]:
+        """Returns (key, namespace); similarity lookups only compare prompts within one namespace."""
+        namespace = f"{provider}|{model}|{temperature}"
+        digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        return f"{namespace}|{digest}", namespace
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["stored_at"] > self.ttl:
+            del self._entries[key]
+            self._forget(key, entry)
+            return None
+        self._entries.move_to_end(key)
+        if entry["embedding"] is not None:
+            self._embedded[entry["namespace"]].move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: Dict[str, Any]) -> None:
+        previous = self._entries.get(key)
+        if previous is not None:
+            self._forget(key, previous)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if entry["embedding"] is not None:
+            self._embedded.setdefault(entry["namespace"], OrderedDict())[key] = None
+        while len(self._entries) > self.max_entries:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._forget(evicted_key, evicted)
+            self.evictions += 1
+
+    def _forget(self, key: str, entry: Dict[str, Any]) -> None:
+        keys = self._embedded.get(entry["namespace"])
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._embedded[entry["namespace"]]
+
+    def _record_hit(self, entry: Dict[str, Any]) -> Any:
+        self.saved_latency += entry["latency"]
+        return entry["response"]
+
+    async def _similar(self, namespace: str, embedding: array) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        candidates: List[Tuple[str, array]] = []
+        for key in reversed(self._embedded.get(namespace, ())):
+            entry = self._entries[key]
+            if now - entry["stored_at"] <= self.ttl:
+                candidates.append((key, entry["embedding"]))
+                if len(candidates) >= self.similarity_candidates:
+                    break
+        if not candidates:
+            return None
+        # 逐个比较 embedding 是纯 Python 计算，放到线程里，不阻塞事件循环
+        best = await asyncio.to_thread(
+            _best_match, embedding, [vector for _, vector in candidates], self.similarity_threshold
+        )
+        # 等待期间条目可能已过期或被淘汰
+        return self._lookup(candidates[best][0]) if best is not None else None
+
+    async def get_or_compute(
+        self, prompt: str, compute: Callable[[], Awaitable[Any]],
+        provider: Any = None, model: Any = None, temperature: Any = None,
+    ) -> Any:
+        """Returns the cached response for `prompt`, or runs `compute` once and caches its result."""
+        key, namespace = self.make_key(provider, model, temperature, prompt)
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return self._record_hit(entry)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.coalesced += 1
+            # shield: 一个调用方取消不会取消其他调用方共享的上游请求
+            return await asyncio.shield(in_flight)
+
+        task = asyncio.ensure_future(self._compute(key, namespace, prompt, compute))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, namespace: str, prompt: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        embedding = None
+        if self.embeddings is not None and self.similarity_threshold:
+            try:
+                embedding = _unit_vector(await self.embeddings.aembed_query(normalize_prompt(prompt)))
+            except Exception as e:
+                logger.warning(f"Prompt embedding failed, skipping similarity lookup: {e}")
+            if embedding is not None:
+                similar = await self._similar(namespace, embedding)
+                if similar is not None:
+                    self.hits += 1
+                    self.similar_hits += 1
+                    return self._record_hit(similar)
+
+        self.misses += 1
+        start = time.perf_counter()
+        response = await compute()
+        latency = time.perf_counter() - start
+        self.upstream_latency += latency
+        self._store(key, {
+            "response": response,
+            "namespace": namespace,
+            "embedding": embedding,
+            "latency": latency,
+            "stored_at": time.monotonic(),
+        })
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        # 合并到进行中请求的调用方也算命中
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "saved_latency_seconds": self.saved_latency,
+            "upstream_latency_seconds": self.upstream_latency,
+        }
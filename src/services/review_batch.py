@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.code_review_service import CodeReviewService
+from src.services.github_service import GitHubService, github_service
+from src.services.review_job_queue import ReviewJobQueue, ReviewQueueFullError
+
+DEFAULT_BATCH_OPTIONS: Dict[str, Any] = {
+    "max_prs": 50,                 # PRs accepted per batch request
+    "submit_retry_interval": 1.0,  # seconds to wait before resubmitting when the job queue is full
+}
+
+
+def load_batch_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("batch") or {}
+    return {**DEFAULT_BATCH_OPTIONS, **configured}
+
+
+class ReviewBatch:
+    """
+    Reviews many PRs through the shared ReviewJobQueue.
+
+    Every PR becomes an ordinary job, so the batch competes for the same worker pool (the
+    LLM concurrency budget) as single reviews, joins jobs already running for the same PR
+    head, and hits the same GitHub, blob and review-result caches. When the PRs come from a
+    repository listing, their head SHAs are taken from the listing instead of one PR lookup
+    each. Results are yielded in completion order, followed by one summary record.
+    """
+
+    def __init__(
+        self,
+        job_queue: ReviewJobQueue,
+        github: Optional[GitHubService] = None,
+        max_prs: Optional[int] = None,
+        submit_retry_interval: Optional[float] = None,
+    ):
+        options = load_batch_options()
+        self.job_queue = job_queue
+        self.github_service = github or getattr(job_queue.review_service, "github_service", None) or github_service
+        self.max_prs = max_prs or options["max_prs"]
+        self.submit_retry_interval = (
+            submit_retry_interval if submit_retry_interval is not None else options["submit_retry_interval"]
+        )
+
+    async def resolve_targets(
+        self,
+        pull_request_urls: Optional[List[str]] = None,
+        repo_owner: Optional[str] = None,
+        repo_name: Optional[str] = None,
+        state: str = "open",
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns [{"pr_url", "head_sha"}] for an explicit URL list (head unknown, duplicates
+        dropped) or for the PRs of a repository in `state`, newest first.
+
+        :raises ValueError: neither or both sources given, or more than `max_prs` URLs
+        :raises GitHubRequestError: the PR listing failed
+        """
+        limit = min(limit or self.max_prs, self.max_prs)
+        if bool(pull_request_urls) == bool(repo_owner and repo_name):
+            raise ValueError("Provide either pull_request_urls or repo_owner and repo_name")
+        if pull_request_urls:
+            urls = list(dict.fromkeys(pull_request_urls))
+            if len(urls) > self.max_prs:
+                raise ValueError(f"A batch accepts at most {self.max_prs} pull requests, got {len(urls)}")
+            return [{"pr_url": url, "head_sha": None} for url in urls]
+
+        targets = []
+        async for pr in self.github_service.iter_pull_requests(repo_owner, repo_name, state):
+            targets.append({"pr_url": pr["url"], "head_sha": pr.get("head_sha")})
+            if len(targets) >= limit:
+                break
+        return targets
+
+    async def _submit(self, target: Dict[str, Any]) -> Dict[str, Any]:
+        # A full queue is back-pressure, not an error: the batch waits for room
+        while True:
+            try:
+                return await self.job_queue.submit(target["pr_url"], head_sha=target["head_sha"])
+            except ReviewQueueFullError:
+                await asyncio.sleep(self.submit_retry_interval)
+
+    async def _review_one(self, target: Dict[str, Any], batch_start: float, batch_started_at: float) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"type": "result", "pull_request_url": target["pr_url"]}
+        try:
+            CodeReviewService.parse_pr_url(target["pr_url"])
+            job = await self._submit(target)
+            job = await self.job_queue.wait(job["id"])
+        except ValueError as e:
+            return {**record, "status": "failed", "error": str(e), "elapsed_seconds": time.perf_counter() - batch_start}
+        except Exception as e:
+            # One PR failing (e.g. its job evicted before it could be waited on) must not end the stream
+            logger.exception(f"Review of {target['pr_url']} in a batch failed")
+            error = f"Job no longer available: {e}" if isinstance(e, KeyError) else f"{type(e).__name__}: {e}"
+            return {**record, "status": "failed", "error": error, "elapsed_seconds": time.perf_counter() - batch_start}
+        started, finished = job["started_at"], job["finished_at"]
+        return {
+            **record,
+            "job_id": job["id"],
+            "head_sha": job["head_sha"],
+            "status": job["status"],
+            "review_report": job["result"],
+            "error": job["error"],
+            # Joined a job submitted before this batch (another request or an earlier batch)
+            "reused": job["created_at"] < batch_started_at,
+            "queued_seconds": max(0.0, started - max(job["created_at"], batch_started_at)) if started else None,
+            "review_seconds": finished - started if started and finished else None,
+            "elapsed_seconds": time.perf_counter() - batch_start,
+        }
+
+    async def run(self, targets: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields one {"type": "result", ...} record per PR as it finishes, then a
+        {"type": "summary", ...} record with status counts and aggregate timing.
+        Closing the iterator stops waiting but leaves submitted jobs running; they may be
+        shared with other requests and their results are cached.
+        """
+        batch_start, batch_started_at = time.perf_counter(), time.time()
+        tasks = [asyncio.ensure_future(self._review_one(target, batch_start, batch_started_at)) for target in targets]
+        statuses: Dict[str, int] = {}
+        review_seconds, queued_seconds, reused = [], [], 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                record = await next_result
+                statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+                if record.get("review_seconds") is not None:
+                    review_seconds.append(record["review_seconds"])
+                if record.get("queued_seconds") is not None:
+                    queued_seconds.append(record["queued_seconds"])
+                reused += bool(record.get("reused"))
+                yield record
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        wall_seconds = time.perf_counter() - batch_start
+        total_review = sum(review_seconds)
+        logger.info(f"Review batch of {len(targets)} PRs finished in {wall_seconds:.1f}s: {statuses}")
+        yield {
+            "type": "summary",
+            "total": len(targets),
+            "statuses": statuses,
+            "reused": reused,
+            "wall_seconds": wall_seconds,
+            "review_seconds_total": total_review,
+            "review_seconds_max": max(review_seconds, default=0.0),
+            "queued_seconds_mean": sum(queued_seconds) / len(queued_seconds) if queued_seconds else 0.0,
+            # How much review work overlapped: total review time over wall time
+            "parallelism": total_review / wall_seconds if wall_seconds > 0 else 0.0,
+        }
@@ -0,0 +1,10 @@
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Progress callback used by streaming reviews: await on_event(event_name, data).
+# Awaiting it applies backpressure: a slow consumer pauses the review instead of buffering without bound.
+ReviewEventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+async def emit(on_event: Optional[ReviewEventCallback], event: str, data: Dict[str, Any]) -> None:
+    if on_event is not None:
+        await on_event(event, data)
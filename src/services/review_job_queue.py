@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.callback_guard import PublicOnlyResolver, validate_callback_url
+from src.services.code_review_service import CodeReviewService
+from src.services.github_scheduler import GitHubRequestError
+from src.services.tracing import tracer
+
+DEFAULT_JOB_QUEUE_OPTIONS: Dict[str, Any] = {
+    "max_workers": 4,         # 同时执行的评审数
+    "max_queue": 100,         # 排队中的评审上限，超出时拒绝提交
+    "job_ttl": 3600,          # 已结束的任务保留秒数
+    "callback_timeout": 10,   # 回调请求超时秒数
+    "callback_allowed_hosts": [],     # 允许的回调主机 (支持 "*.example.com")，为空时允许任意公网主机
+    "callback_allow_private": False,  # 允许回调到内网/回环/链路本地地址，仅用于测试
+}
+
+JOB_ACTIVE_STATUSES = ("queued", "running")
+
+
+def load_job_queue_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("jobs") or {}
+    return {**DEFAULT_JOB_QUEUE_OPTIONS, **configured}
+
+
+class ReviewQueueFullError(Exception):
+    """Raised when a review is submitted while the queue is at `max_queue`."""
+
+
+class ReviewJobQueue:
+    """
+    Runs `CodeReviewService.perform_code_review` in a bounded pool of background workers.
+
+    `submit` returns a job immediately; clients poll `get` or register a callback URL that
+    receives the finished job as a JSON POST. Callback URLs are limited to http(s) hosts on
+    `callback_allowed_hosts` that resolve to public addresses. Jobs are deduplicated by
+    (PR, head SHA): a submission for a PR whose current head is already queued, running or
+    reviewed joins that job instead of starting a new run. Failed and cancelled jobs can be resubmitted.
+    Reviews of a superseded head can be cancelled with `cancel_stale`.
+    """
+
+    def __init__(
+        self,
+        review_service: CodeReviewService,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        job_ttl: Optional[float] = None,
+        callback_timeout: Optional[float] = None,
+        callback_allowed_hosts: Optional[List[str]] = None,
+        callback_allow_private: Optional[bool] = None,
+    ):
+        options = load_job_queue_options()
+        self.review_service = review_service
+        self.max_workers = max_workers or options["max_workers"]
+        self.max_queue = max_queue or options["max_queue"]
+        self.job_ttl = job_ttl if job_ttl is not None else options["job_ttl"]
+        self.callback_timeout = callback_timeout or options["callback_timeout"]
+        self.callback_allowed_hosts = (
+            callback_allowed_hosts if callback_allowed_hosts is not None else options["callback_allowed_hosts"]
+        )
+        self.callback_allow_private = (
+            callback_allow_private if callback_allow_private is not None else options["callback_allow_private"]
+        )
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._job_ids_by_key: Dict[Tuple[str, str, int, Optional[str]], str] = {}
+        self._trace_parents: Dict[str, Any] = {}
+        self._running: Dict[str, asyncio.Future] = {}
+        # 任务结束时 set，`wait` 等待它而不是轮询状态
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._callback_session: Optional[aiohttp.ClientSession] = None
+        self.deduplicated = 0
+        self.cancelled = 0
+
+    # --- lifecycle ---
+
+    async def start(self) -> None:
+        """Starts the worker pool on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._workers:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # 发送时再次检查解析结果，防止通过校验后域名被改指向内网地址
+        resolver = None if self.callback_allow_private else PublicOnlyResolver()
+        self._callback_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(resolver=resolver),
+            timeout=aiohttp.ClientTimeout(total=self.callback_timeout),
+        )
+        # 每个 worker 使用空的 context，不继承启动它的请求的 contextvars (例如当前 trace span)
+        self._workers = [
+            asyncio.create_task(self._worker(i), context=contextvars.Context()) for i in range(self.max_workers)
+        ]
+        logger.info(f"ReviewJobQueue started with {self.max_workers} workers.")
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._trace_parents.clear()
+        if self._callback_session is not None:
+            await self._callback_session.close()
+            self._callback_session = None
+        logger.info("ReviewJobQueue stopped.")
+
+    # --- API ---
+
+    async def submit(self, pr_url: str, callback_url: Optional[str] = None, head_sha: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queues a review of `pr_url`, or joins the existing job for the same PR head.
+        `head_sha` skips the PR lookup when the caller already knows the head (e.g. a webhook).
+
+        :raises ValueError: invalid PR URL, or a `callback_url` that is not http(s), not on the
+            allowed hosts or resolves to a private address
+        :raises ReviewQueueFullError: `max_queue` reviews are already waiting
+        """
+        await self.start()
+        pr_info = CodeReviewService.parse_pr_url(pr_url)
+        if callback_url:
+            await validate_callback_url(callback_url, self.callback_allowed_hosts, self.callback_allow_private)
+        head_sha = head_sha or await self._resolve_head_sha(pr_info)
+        key = (pr_info["repo_owner"], pr_info["repo_name"], pr_info["pull_number"], head_sha)
+        self._evict_expired()
+
+        existing = self._jobs.get(self._job_ids_by_key.get(key, ""))
+        # 已完成的任务只有在 head SHA 已知时才复用
+        if existing is not None and (
+            existing["status"] in JOB_ACTIVE_STATUSES or (existing["status"] == "succeeded" and head_sha)
+        ):
+            self.deduplicated += 1
+            if callback_url:
+                if existing["status"] in JOB_ACTIVE_STATUSES:
+                    existing["callback_urls"].append(callback_url)
+                else:
+                    asyncio.create_task(self._send_callback(existing, callback_url))
+            logger.info(f"Review of {pr_url}@{head_sha} joined existing job {existing['id']}.")
+            return existing
+
+        if self._queue.full():
+            raise ReviewQueueFullError(f"Review queue is full ({self.max_queue} jobs waiting)")
+        job = {
+            "id": uuid.uuid4().hex,
+            "pr_url": pr_url,
+            "head_sha": head_sha,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "callback_urls": [callback_url] if callback_url else [],
+        }
+        self._jobs[job["id"]] = job
+        self._job_ids_by_key[key] = job["id"]
+        self._finished[job["id"]] = asyncio.Event()
+        self._queue.put_nowait(job)
+        # 后台 worker 中的评审 span 挂在提交请求的 span 下
+        parent_span = tracer.current_span()
+        if parent_span is not None:
+            self._trace_parents[job["id"]] = parent_span
+        logger.info(f"Queued review job {job['id']} for {pr_url}@{head_sha}.")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """
+        Cancels a queued or running job; a running review is interrupted, including its
+        in-flight LLM calls. Returns False if the job has already finished.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] not in JOB_ACTIVE_STATUSES:
+            return False
+        was_running = job["status"] == "running"
+        job["status"], job["error"] = "cancelled", reason
+        self.cancelled += 1
+        running = self._running.get(job_id)
+        if running is not None:
+            running.cancel()
+        elif not was_running:
+            # 排队中的任务不会再被执行，worker 取到时直接跳过
+            job["finished_at"] = time.time()
+            self._mark_finished(job_id)
+            self._trace_parents.pop(job_id, None)
+            callback_urls, job["callback_urls"] = job["callback_urls"], []
+            for url in callback_urls:
+                asyncio.create_task(self._send_callback(job, url))
+        logger.info(f"Cancelled review job {job_id} ({reason}).")
+        return True
+
+    def cancel_stale(self, repo_owner: str, repo_name: str, pull_number: int, head_sha: str) -> List[str]:
+        """Cancels active jobs of the PR that review a head other than `head_sha`; returns their ids."""
+        stale = [
+            job_id for (owner, repo, number, sha), job_id in self._job_ids_by_key.items()
+            if (owner, repo, number) == (repo_owner, repo_name, pull_number) and sha != head_sha
+        ]
+        return [job_id for job_id in stale if self.cancel(job_id, reason=f"superseded by {head_sha}")]
+
+    async def wait(self, job_id: str) -> Dict[str, Any]:
+        """
+        Waits until the job has finished and returns it. The job is returned even if it
+        expires from the queue while waiting.
+
+        :raises KeyError: no such job (never submitted, or already expired)
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown review job {job_id}")
+        finished = self._finished.get(job_id)
+        if finished is not None and job["finished_at"] is None:
+            await finished.wait()
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+        return {
+            "jobs": statuses,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "workers": len(self._workers),
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+        }
+
+    # --- internals ---
+
+    async def _resolve_head_sha(self, pr_info: dict) -> Optional[str]:
+        try:
+            pr_data = await self.review_service.github_service.get_pull_request(
+                pr_info["repo_owner"], pr_info["repo_name"], pr_info["pull_number"]
+            )
+            return pr_data["head"]["sha"]
+        except GitHubRequestError as e:
+            # 拿不到 head SHA 时只按 PR 去重，评审本身会报告具体错误
+            logger.warning(f"Could not resolve PR head for deduplication: {e}")
+            return None
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.job_ttl
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id)
+            self._finished.pop(job_id, None)
+        for key, job_id in list(self._job_ids_by_key.items()):
+            if job_id not in self._jobs:
+                del self._job_ids_by_key[key]
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                if job["status"] == "queued":
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            parent_span = self._trace_parents.pop(job["id"], None)
+            with tracer.span("review_job.run", {"review.job_id": job["id"]}, parent=parent_span):
+                # 单独的任务，`cancel` 只取消这次评审而不是 worker
+                review = asyncio.ensure_future(self.review_service.perform_code_review(job["pr_url"]))
+                self._running[job["id"]] = review
+                result = await review
+            if result.startswith("Error:") or result.startswith("An error occurred"):
+                job["status"], job["error"] = "failed", result
+            else:
+                job["status"], job["result"] = "succeeded", result
+        except asyncio.CancelledError:
+            if job["status"] != "cancelled":
+                raise  # the worker itself is being stopped
+        except Exception as e:
+            logger.error(f"Review job {job['id']} failed: {e}")
+            job["status"], job["error"] = "failed", str(e)
+        finally:
+            self._running.pop(job["id"], None)
+        job["finished_at"] = time.time()
+        self._mark_finished(job["id"])
+        logger.info(f"Review job {job['id']} {job['status']} in {job['finished_at'] - job['started_at']:.1f}s.")
+        callback_urls, job["callback_urls"] = job["callback_urls"], []
+        await asyncio.gather(*(self._send_callback(job, url) for url in callback_urls))
+
+    def _mark_finished(self, job_id: str) -> None:
+        finished = self._finished.get(job_id)
+        if finished is not None:
+            finished.set()
+
+    async def _send_callback(self, job: Dict[str, Any], callback_url: str) -> None:
+        payload = {key: value for key, value in job.items() if key != "callback_urls"}
+        try:
+            # 不跟随重定向：跳转目标没有经过 validate_callback_url，IP 字面量也不会经过 PublicOnlyResolver
+            async with self._callback_session.post(callback_url, json=payload, allow_redirects=False) as response:
+                if response.status >= 300:
+                    logger.warning(f"Callback {callback_url} for job {job['id']} was not delivered: {response.status}.")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Callback {callback_url} for job {job['id']} failed: {e}")
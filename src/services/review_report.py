@@ -0,0 +1,64 @@
+import re
+from typing import Any, Dict, List, Tuple
+
+REPORT_TITLE = "## Code Review Report"
+SUMMARY_HEADING = "### Summary"
+FINDINGS_HEADING = "### Detailed Findings"
+TABLE_HEADER = "| Filename | Line Number | Issue | Suggestion |"
+TABLE_SEPARATOR = "| :--- | :--- | :--- | :--- |"
+FINDING_FIELDS = ("filename", "line_number", "issue", "suggestion")
+
+# Cells are separated by pipes that are not escaped as "\|".
+_CELL_SPLIT = re.compile(r"(?<!\\)\|")
+
+
+def parse_review_report(report: str) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Splits a `## Code Review Report` markdown document into its summary text and finding rows.
+    Reports that do not follow the format are returned as summary-only.
+    """
+    summary = report.strip()
+    if SUMMARY_HEADING in report:
+        summary = report.split(SUMMARY_HEADING, 1)[1]
+        summary = summary.split(FINDINGS_HEADING, 1)[0].strip()
+
+    findings: List[Dict[str, str]] = []
+    in_table = False
+    for line in report.splitlines():
+        stripped = line.strip()
+        if stripped.replace(" ", "") == TABLE_HEADER.replace(" ", ""):
+            in_table = True
+            continue
+        if not in_table:
+            continue
+        if not stripped.startswith("|"):
+            if stripped:
+                in_table = False
+            continue
+        cells = [cell.strip() for cell in _CELL_SPLIT.split(stripped.strip("|"))]
+        # Skip the alignment row and the "| ... | ... |" placeholder row from the prompt.
+        if all(set(cell) <= set(":- ") for cell in cells) or all(cell == "..." for cell in cells):
+            continue
+        cells = (cells + [""] * len(FINDING_FIELDS))[:len(FINDING_FIELDS)]
+        findings.append(dict(zip(FINDING_FIELDS, cells)))
+    return summary, findings
+
+
+def render_review_report(summary: str, findings: List[Dict[str, str]]) -> str:
+    """Renders the report in the format required by the code review system prompt."""
+    lines = [REPORT_TITLE, "", SUMMARY_HEADING, summary.strip(), "", FINDINGS_HEADING, "", TABLE_HEADER, TABLE_SEPARATOR]
+    for finding in findings:
+        lines.append("| " + " | ".join(str(finding.get(field, "")) for field in FINDING_FIELDS) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def message_text(message: Any) -> str:
+    """Extracts the text of an LLM/agent message whose content may be a string or a list of blocks."""
+    if not hasattr(message, 'content'):
+        return str(message)
+    # If content is a list, extract text part
+    if isinstance(message.content, list) and len(message.content) > 0:
+        # Extract first text block content
+        first_block = message.content[0]
+        return first_block.get('text', '') if isinstance(first_block, dict) else str(first_block)
+    return str(message.content)
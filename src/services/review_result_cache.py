@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+DEFAULT_RESULT_CACHE_OPTIONS: Dict[str, Any] = {
+    "backend": "sqlite",  # "sqlite" 或 "none"
+    "path": "/tmp/py-github-agent/review_results.sqlite3",
+    "max_entries": 10000,
+    "trim_interval": 100,  # 每写入多少次检查一次 max_entries
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_results (
+    cache_key TEXT PRIMARY KEY,
+    repo_owner TEXT NOT NULL,
+    repo_name TEXT NOT NULL,
+    pull_number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    base_sha TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    report TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS review_results_by_variant
+    ON review_results (repo_owner, repo_name, pull_number, model, prompt_hash);
+CREATE INDEX IF NOT EXISTS review_results_by_age ON review_results (created_at);
+"""
+
+
+def load_result_cache_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("result_cache") or {}
+    return {**DEFAULT_RESULT_CACHE_OPTIONS, **configured}
+
+
+def prompt_hash(*prompts: str) -> str:
+    return hashlib.sha256("\0".join(prompts).encode("utf-8")).hexdigest()[:16]
+
+
+class ReviewResultCache:
+    """
+    Persistent store of finished review reports keyed by
+    (repo_owner, repo_name, pull_number, head_sha, base_sha, model, prompt_hash).
+
+    A change to any component is a different key, so a new push, a moved base, another
+    model or an edited system prompt all miss automatically. Storing a result replaces the
+    older results of the same PR, model and prompt (earlier head or base SHAs); results of
+    other models and prompt versions are kept side by side. The table is trimmed to
+    `max_entries` every `trim_interval` writes rather than on every write.
+
+    Calls block on SQLite; async callers use `aget`/`aput`, which run them in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int = DEFAULT_RESULT_CACHE_OPTIONS["max_entries"],
+        trim_interval: int = DEFAULT_RESULT_CACHE_OPTIONS["trim_interval"],
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.trim_interval = max(1, trim_interval)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["ReviewResultCache"]:
+        """Builds the cache from `review.result_cache`; returns None when disabled."""
+        options = load_result_cache_options()
+        if options["backend"] in (None, "none"):
+            return None
+        if options["backend"] != "sqlite":
+            raise ValueError(f"Unknown review result cache backend: {options['backend']}")
+        try:
+            return cls(options["path"], max_entries=options["max_entries"], trim_interval=options["trim_interval"])
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Review result cache disabled, could not open {options['path']}: {e}")
+            return None
+
+    @staticmethod
+    def make_key(
+        repo_owner: str, repo_name: str, pull_number: int, head_sha: str, base_sha: str, model: str, prompt_hash: str
+    ) -> str:
+        parts = [repo_owner, repo_name, pull_number, head_sha, base_sha, model, prompt_hash]
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, repo_owner: str, repo_name: str, pull_number: int, head_sha: str, base_sha: str,
+            model: str, prompt_hash: str) -> Optional[str]:
+        key = self.make_key(repo_owner, repo_name, pull_number, head_sha, base_sha, model, prompt_hash)
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT report FROM review_results WHERE cache_key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read review result cache: {e}")
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, repo_owner: str, repo_name: str, pull_number: int, head_sha: str, base_sha: str,
+            model: str, prompt_hash: str, report: str) -> None:
+        key = self.make_key(repo_owner, repo_name, pull_number, head_sha, base_sha, model, prompt_hash)
+        try:
+            with self._lock:
+                # 同一个 PR、模型和 prompt 只保留最新 head/base 的结果，其他模型或 prompt 版本的结果保留
+                self._conn.execute(
+                    "DELETE FROM review_results WHERE repo_owner = ? AND repo_name = ? AND pull_number = ? "
+                    "AND model = ? AND prompt_hash = ? AND (head_sha != ? OR base_sha != ?)",
+                    (repo_owner, repo_name, pull_number, model, prompt_hash, head_sha, base_sha),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO review_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, repo_owner, repo_name, pull_number, head_sha, base_sha, model, prompt_hash,
+                     report, time.time()),
+                )
+                self._writes_since_trim += 1
+                if self._writes_since_trim >= self.trim_interval:
+                    self._trim()
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write review result cache: {e}")
+
+    async def aget(self, *args: Any) -> Optional[str]:
+        return await asyncio.to_thread(self.get, *args)
+
+    async def aput(self, *args: Any) -> None:
+        await asyncio.to_thread(self.put, *args)
+
+    def _trim(self) -> None:
+        # 调用方持有锁；按 created_at 索引删除最旧的行，不扫描整张表
+        self._writes_since_trim = 0
+        self._conn.execute(
+            "DELETE FROM review_results WHERE created_at < "
+            "(SELECT created_at FROM review_results ORDER BY created_at DESC LIMIT 1 OFFSET ?)",
+            (self.max_entries - 1,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM review_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
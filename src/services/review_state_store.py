@@ -0,0 +1,102 @@
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+
+# (repo_owner, repo_name, pull_number)
+PullKey = Tuple[str, str, int]
+
+DEFAULT_MAX_STATES = 1000  # PRs whose state is kept in memory
+
+
+class ReviewStateStore:
+    """
+    Remembers the last completed review of each PR: the head/base SHAs it covered, its summary
+    and its findings, so the next review can be limited to files changed since then.
+
+    The states of the `max_states` most recently used PRs are kept in memory; when `state_dir`
+    is set they are also written as one JSON file per PR, read back after a restart or after
+    being evicted. Callers on the event loop use `aget`/`aput`, which do the file I/O in a
+    worker thread.
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, max_states: int = DEFAULT_MAX_STATES):
+        self.state_dir = state_dir
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self.max_states = max_states
+        self._states: "OrderedDict[PullKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "ReviewStateStore":
+        review_config = (yaml_configs or {}).get("review") or {}
+        return cls(
+            state_dir=review_config.get("state_dir"),
+            max_states=review_config.get("max_states") or DEFAULT_MAX_STATES,
+        )
+
+    def _path(self, key: PullKey) -> str:
+        repo_owner, repo_name, pull_number = key
+        return os.path.join(self.state_dir, f"{repo_owner}__{repo_name}__{pull_number}.json")
+
+    def get(self, repo_owner: str, repo_name: str, pull_number: int) -> Optional[Dict[str, Any]]:
+        key = (repo_owner, repo_name, pull_number)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+        if state is not None or not self.state_dir:
+            return state
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read review state for {key}: {e}")
+            return None
+        self._remember(key, state)
+        return state
+
+    def put(self, repo_owner: str, repo_name: str, pull_number: int, state: Dict[str, Any]) -> None:
+        key = (repo_owner, repo_name, pull_number)
+        self._remember(key, state)
+        if not self.state_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write review state for {key}: {e}")
+
+    async def aget(self, repo_owner: str, repo_name: str, pull_number: int) -> Optional[Dict[str, Any]]:
+        if not self.state_dir:
+            return self.get(repo_owner, repo_name, pull_number)
+        return await asyncio.to_thread(self.get, repo_owner, repo_name, pull_number)
+
+    async def aput(self, repo_owner: str, repo_name: str, pull_number: int, state: Dict[str, Any]) -> None:
+        if not self.state_dir:
+            self.put(repo_owner, repo_name, pull_number, state)
+            return
+        await asyncio.to_thread(self.put, repo_owner, repo_name, pull_number, state)
+
+    def _remember(self, key: PullKey, state: Dict[str, Any]) -> None:
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._states)
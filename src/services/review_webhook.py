@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import hmac
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.review_job_queue import ReviewJobQueue, ReviewQueueFullError
+
+DEFAULT_WEBHOOK_OPTIONS: Dict[str, Any] = {
+    "secret_env": "GITHUB_WEBHOOK_SECRET",   # environment variable holding the webhook secret
+    "debounce_seconds": 10.0,                # quiet period after the last push before a review starts
+    "actions": ["opened", "reopened", "synchronize", "ready_for_review"],
+    "skip_drafts": True,
+}
+
+# (repo_owner, repo_name, pull_number)
+PullKey = Tuple[str, str, int]
+
+
+def load_webhook_options() -> Dict[str, Any]:
+    configured = ((yaml_configs or {}).get("review") or {}).get("webhook") or {}
+    return {**DEFAULT_WEBHOOK_OPTIONS, **configured}
+
+
+def verify_signature(secret: str, body: bytes, signature_header: Optional[str]) -> bool:
+    """Checks GitHub's `X-Hub-Signature-256: sha256=<hex HMAC of the raw body>` in constant time."""
+    if not secret or not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256="):])
+
+
+class ReviewWebhookDispatcher:
+    """
+    Turns verified `pull_request` webhook events into review jobs.
+
+    Pushes to a PR often arrive in bursts (a rebase, several force-pushes). Each event
+    cancels the jobs still reviewing an older head right away, then (re)starts a
+    `debounce_seconds` timer for the PR; only the head seen when the timer fires is
+    submitted. Intermediate commits never reach the LLM.
+    """
+
+    def __init__(
+        self,
+        job_queue: ReviewJobQueue,
+        debounce_seconds: Optional[float] = None,
+        actions: Optional[list] = None,
+        skip_drafts: Optional[bool] = None,
+    ):
+        options = load_webhook_options()
+        self.job_queue = job_queue
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else options["debounce_seconds"]
+        self.actions = set(actions if actions is not None else options["actions"])
+        self.skip_drafts = skip_drafts if skip_drafts is not None else options["skip_drafts"]
+        self._pending: Dict[PullKey, Tuple[str, asyncio.Task]] = {}
+        self.received = 0
+        self.ignored = 0
+        self.superseded = 0
+        self.submitted = 0
+        self.stale_cancelled = 0
+
+    async def handle_event(self, event: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Handles a verified webhook delivery and returns a summary for the HTTP response:
+        {"status": "scheduled" | "ignored" | "pong", ...}.
+        """
+        self.received += 1
+        if event == "ping":
+            return {"status": "pong"}
+        action = payload.get("action")
+        pull = payload.get("pull_request") or {}
+        repository = payload.get("repository") or {}
+        if event != "pull_request" or action not in self.actions:
+            self.ignored += 1
+            return {"status": "ignored", "reason": f"event {event}/{action} does not trigger reviews"}
+        if self.skip_drafts and pull.get("draft"):
+            self.ignored += 1
+            return {"status": "ignored", "reason": "draft pull request"}
+        try:
+            owner = repository["owner"]["login"]
+            repo = repository["name"]
+            number = int(pull["number"])
+            head_sha = pull["head"]["sha"]
+            pr_url = pull.get("html_url") or f"https://github.com/{owner}/{repo}/pull/{number}"
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Malformed pull_request payload: missing {e}")
+
+        key = (owner, repo, number)
+        # 新的 head 到达后，旧 head 的评审已经没有意义，立即取消以释放 LLM 容量
+        cancelled = self.job_queue.cancel_stale(owner, repo, number, head_sha)
+        self.stale_cancelled += len(cancelled)
+
+        previous = self._pending.pop(key, None)
+        if previous is not None:
+            previous[1].cancel()
+            self.superseded += 1
+        task = asyncio.create_task(self._submit_after_quiet_period(key, pr_url, head_sha))
+        self._pending[key] = (head_sha, task)
+        logger.info(
+            f"Webhook {action} for {owner}/{repo}#{number}@{head_sha[:7]}: review in {self.debounce_seconds}s"
+            f"{f', cancelled stale jobs {cancelled}' if cancelled else ''}."
+        )
+        return {
+            "status": "scheduled",
+            "pull_request_url": pr_url,
+            "head_sha": head_sha,
+            "debounce_seconds": self.debounce_seconds,
+            "cancelled_jobs": cancelled,
+        }
+
+    async def _submit_after_quiet_period(self, key: PullKey, pr_url: str, head_sha: str) -> None:
+        try:
+            await asyncio.sleep(self.debounce_seconds)
+            # 等待期间又有新的推送时，本任务已被取消，不会走到这里
+            self._pending.pop(key, None)
+            job = await self.job_queue.submit(pr_url, head_sha=head_sha)
+            self.submitted += 1
+            logger.info(f"Webhook review job {job['id']} for {pr_url}@{head_sha[:7]} is {job['status']}.")
+        except (ValueError, ReviewQueueFullError) as e:
+            logger.error(f"Could not queue webhook review of {pr_url}@{head_sha[:7]}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error while queueing webhook review of {pr_url}: {e}")
+
+    async def close(self) -> None:
+        """Drops reviews still waiting for their quiet period."""
+        pending = [task for _, task in self._pending.values()]
+        self._pending.clear()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "received": self.received,
+            "ignored": self.ignored,
+            "superseded": self.superseded,
+            "submitted": self.submitted,
+            "stale_cancelled": self.stale_cancelled,
+            "pending": len(self._pending),
+        }
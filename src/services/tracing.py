@@ -0,0 +1,351 @@
+"""
+OpenTelemetry 风格的轻量 tracing：span 通过 contextvars 组成调用树，结束后按 OTLP/JSON 格式
+批量导出到文件 (每行一个 ExportTraceServiceRequest，可被 OTel Collector 的 otlpjsonfile receiver 读取)
+或直接 POST 到 Collector 的 OTLP/HTTP 端点 (`/v1/traces`)。
+
+未启用时 `span()` 返回共享的 no-op span，调用点几乎没有开销。
+"""
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set
+
+import aiohttp
+from loguru import logger
+
+from src.configs.config import yaml_configs
+from src.services.loop_runner import LoopSessions
+
+DEFAULT_TRACING_OPTIONS: Dict[str, Any] = {
+    "enabled": False,
+    "exporter": "file",                                  # "file" | "otlp" | "memory"
+    "path": "/tmp/py-github-agent/traces.jsonl",         # exporter 为 file 时的输出文件
+    "endpoint": "http://localhost:4318/v1/traces",       # exporter 为 otlp 时的 Collector 地址
+    "service_name": "py-github-agent",
+    "batch_size": 256,                                   # 攒够这么多 span 就导出一次
+    "flush_interval": 5,                                 # 后台定时导出的间隔 (秒)
+}
+
+_STATUS_UNSET, _STATUS_OK, _STATUS_ERROR = 0, 1, 2
+
+
+def load_tracing_options() -> Dict[str, Any]:
+    return {**DEFAULT_TRACING_OPTIONS, **((yaml_configs or {}).get("tracing") or {})}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = _STATUS_UNSET
+        self.status_message = ""
+
+    @property
+    def is_recording(self) -> bool:
+        return self.end_ns is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = _STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_seconds(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message} if self.status_message else {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+class _NoOpSpan:
+    """未启用 tracing 时使用；所有方法都是空操作。"""
+    is_recording = False
+    trace_id = span_id = parent_span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoOpSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, spans: List[Span]) -> None:
+        ...
+
+    async def aexport(self, spans: List[Span]) -> None:
+        await asyncio.to_thread(self.export, spans)
+
+    async def close(self) -> None:
+        """释放导出用的资源 (连接等)。"""
+
+
+class InMemorySpanExporter(SpanExporter):
+    """测试和调试用：保留已结束的 span。"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+
+class FileSpanExporter(SpanExporter):
+    def __init__(self, path: str, service_name: str):
+        self.path = path
+        self.service_name = service_name
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(otlp_request(spans, self.service_name), separators=(",", ":"))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPHTTPSpanExporter(SpanExporter):
+    """
+    以 OTLP/HTTP JSON 发送到 Collector；失败只记录日志，不影响请求。
+    各批次复用同一个连接池 (每个事件循环一个 session)，`close()` 时关闭。
+    """
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 10):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._sessions = LoopSessions(self._create_session)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def _post(self, session: aiohttp.ClientSession, spans: List[Span]) -> None:
+        try:
+            async with session.post(self.endpoint, json=otlp_request(spans, self.service_name)) as response:
+                if response.status >= 300:
+                    logger.warning(f"Trace export to {self.endpoint} returned {response.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Trace export to {self.endpoint} failed: {e}")
+
+    async def aexport(self, spans: List[Span]) -> None:
+        await self._post(self._sessions.get(), spans)
+
+    def export(self, spans: List[Span]) -> None:
+        # 没有运行中的事件循环 (同步调用) 时使用一次性的 session，随临时循环一起关闭
+        async def export_once() -> None:
+            async with self._create_session() as session:
+                await self._post(session, spans)
+
+        asyncio.run(export_once())
+
+    async def close(self) -> None:
+        await self._sessions.close()
+
+
+def otlp_request(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "py-github-agent"}, "spans": [span.to_otlp() for span in spans]}],
+        }]
+    }
+
+
+class Tracer:
+    """
+    创建 span 并批量导出。span 结束后进入缓冲区，攒够 `batch_size` 个、后台任务定时
+    (见 `run_flush_loop`) 或关闭时 (`shutdown`) 导出。
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, enabled: bool = True, batch_size: int = 256, flush_interval: float = 5):
+        self.exporter = exporter
+        self.enabled = enabled and exporter is not None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        # 后台导出任务需要保留引用，否则可能在完成前被回收；`shutdown` 等待它们结束
+        self._exports: Set[asyncio.Task] = set()
+
+    @classmethod
+    def from_config(cls) -> "Tracer":
+        options = load_tracing_options()
+        if not options["enabled"]:
+            return cls(None, enabled=False)
+        exporter_name = options["exporter"]
+        if exporter_name == "otlp":
+            exporter = OTLPHTTPSpanExporter(options["endpoint"], options["service_name"])
+        elif exporter_name == "memory":
+            exporter = InMemorySpanExporter()
+        else:
+            exporter = FileSpanExporter(options["path"], options["service_name"])
+        logger.info(f"Tracing enabled, exporting spans via {exporter_name}.")
+        return cls(exporter, batch_size=options["batch_size"], flush_interval=options["flush_interval"])
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional[Span] = None) -> Any:
+        """创建 span 但不设为当前 span，用于开始和结束不在同一个调用栈上的操作 (例如 LLM 回调)。"""
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parent or _current_span.get()
+        trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        return Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+
+    def end_span(self, span: Any) -> None:
+        if not isinstance(span, Span) or span.end_ns is not None:
+            return
+        span.end_ns = time.time_ns()
+        if span.status == _STATUS_UNSET:
+            span.status = _STATUS_OK
+        with self._lock:
+            self._buffer.append(span)
+            batch = self._take_batch() if len(self._buffer) >= self.batch_size else None
+        if batch:
+            self._export_in_background(batch)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional[Span] = None) -> Iterator[Any]:
+        """开始一个 span 并设为当前 span；异常会记录到 span 上后继续抛出。"""
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        span = self.start_span(name, attributes, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if not isinstance(e, (GeneratorExit, asyncio.CancelledError)):
+                span.record_exception(e)
+            else:
+                span.set_attribute("cancelled", True)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # async generator 在另一个 context 中被关闭 (例如客户端断开后 aclose)
+                pass
+            self.end_span(span)
+
+    def _take_batch(self) -> List[Span]:
+        batch, self._buffer = self._buffer, []
+        return batch
+
+    def _export_in_background(self, batch: List[Span]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.exporter.export(batch)
+            return
+        task = loop.create_task(self.exporter.aexport(batch))
+        with self._lock:
+            self._exports.add(task)
+        task.add_done_callback(self._export_done)
+
+    def _export_done(self, task: asyncio.Task) -> None:
+        with self._lock:
+            self._exports.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Trace export failed: {task.exception()!r}")
+
+    async def flush(self) -> None:
+        with self._lock:
+            batch = self._take_batch()
+        if batch and self.exporter is not None:
+            await self.exporter.aexport(batch)
+
+    async def run_flush_loop(self) -> None:
+        """由 server.py 的 lifespan 在后台运行，定时导出缓冲的 span。"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def shutdown(self) -> None:
+        """导出缓冲的 span，等待进行中的后台导出完成，然后关闭 exporter。"""
+        await self.flush()
+        with self._lock:
+            exports = list(self._exports)
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(task for task in exports if task.get_loop() is loop), return_exceptions=True)
+        # 在其他事件循环 (loop_runner 的后台循环) 上启动的导出，在它们自己的循环上等待
+        for other in {task.get_loop() for task in exports if task.get_loop() is not loop}:
+            if other.is_running():
+                pending = [task for task in exports if task.get_loop() is other]
+                waiter = asyncio.run_coroutine_threadsafe(_gather_quietly(pending), other)
+                await asyncio.wrap_future(waiter)
+        if self.exporter is not None:
+            await self.exporter.close()
+
+
+async def _gather_quietly(tasks: List[asyncio.Task]) -> None:
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def trace_stream(name: str, attributes: Optional[Dict[str, Any]], events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    在 span 中迭代 `events` 并原样转发，用于流式响应：handler 返回后 body 才开始生成，
+    所以 span 要覆盖到最后一个事件 (或客户端断开) 为止。
+    """
+    with tracer.span(name, attributes) as span:
+        count = 0
+        async for event in events:
+            count += 1
+            yield event
+        span.set_attribute("stream.events", count)
+
+
+tracer = Tracer.from_config()
@@ -1,13 +1,15 @@
 import asyncio
-from typing import List, Type
+from contextvars import ContextVar
+from typing import Any, Dict, List, Literal, Optional, Type
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel, Field
-from src.services.github_service import GitHubService
+from src.services.context_packer import ContextPacker
+from src.services.github_service import github_service
+from src.services.loop_runner import loop_runner
+from src.services.repo_index import load_repo_index_options
+from src.services.tracing import tracer
 from loguru import logger
 
-# 实例化 GitHub 服务，可以在模块级别共享
-github_service = GitHubService()
-
 class ListRepoFilesInput(BaseModel):
     """Input for the list_repository_files tool."""
     repo_owner: str = Field(description="The owner of the GitHub repository.")
@@ -20,12 +22,10 @@ class ListRepoFilesTool(BaseTool):
     args_schema: Type[BaseModel] = ListRepoFilesInput
 
     def _run(self, repo_owner: str, repo_name: str, branch: str = "main") -> List[str]:
-        # LangChain 的 BaseTool.run 是同步的，但我们的 service 方法是异步的
-        # 在这里，我们使用 asyncio.run() 来桥接同步和异步
-        # 注意：这在已经有运行的事件循环（如 FastAPI）中可能会有问题
-        # 但对于 LangChain Agent 的同步执行流程是可行的
+        # LangChain 的 BaseTool.run 是同步的，但我们的 service 方法是异步的。
+        # loop_runner 把协程提交到服务的事件循环 (或后台循环) 上执行，复用共享的 GitHub 连接池
         logger.info("Running ListRepoFilesTool synchronously...")
-        return asyncio.run(self._arun(repo_owner, repo_name, branch))
+        return loop_runner.run(self._arun(repo_owner, repo_name, branch))
 
     async def _arun(self, repo_owner: str, repo_name: str, branch: str = "main") -> List[str]:
         # 异步执行，这是 Agent 在异步模式下会调用的方法
@@ -35,6 +35,68 @@ class ListRepoFilesTool(BaseTool):
 # 实例化工具，以便在别处导入和使用
 list_repo_files_tool = ListRepoFilesTool()
 
+RepoQueryOperation = Literal["list_prefix", "glob", "regex", "extension_stats", "directory_summary"]
+
+class QueryRepoFilesInput(BaseModel):
+    """Input for the query_repository_files tool."""
+    repo_owner: str = Field(description="The owner of the GitHub repository.")
+    repo_name: str = Field(description="The name of the GitHub repository.")
+    branch: str = Field(description="The branch, tag or commit SHA to query.", default="main")
+    operation: RepoQueryOperation = Field(
+        description="list_prefix: paths starting with pattern; glob: paths matching a glob like 'src/**/*.py'; "
+                    "regex: paths where the regular expression matches; extension_stats: file count and size per "
+                    "extension under the directory in pattern; directory_summary: subdirectories and files directly "
+                    "inside the directory in pattern.",
+        default="directory_summary",
+    )
+    pattern: str = Field(description="Prefix, glob, regex or directory, depending on the operation. Empty means the repository root.", default="")
+    limit: Optional[int] = Field(description="Maximum number of paths (or entries) to return.", default=None)
+
+class QueryRepoFilesTool(BaseTool):
+    name: str = "query_repository_files"
+    description: str = (
+        "Useful for exploring a large GitHub repository without listing every file: search paths by prefix, "
+        "glob or regex, summarize a directory, or count files per extension."
+    )
+    args_schema: Type[BaseModel] = QueryRepoFilesInput
+
+    def _run(self, repo_owner: str, repo_name: str, branch: str = "main", operation: str = "directory_summary",
+             pattern: str = "", limit: Optional[int] = None) -> dict:
+        logger.info("Running QueryRepoFilesTool synchronously...")
+        return loop_runner.run(self._arun(repo_owner, repo_name, branch, operation, pattern, limit))
+
+    async def _arun(self, repo_owner: str, repo_name: str, branch: str = "main", operation: str = "directory_summary",
+                    pattern: str = "", limit: Optional[int] = None) -> dict:
+        logger.info(f"Running QueryRepoFilesTool asynchronously: {operation} {pattern!r}")
+        # 索引按 tree SHA 缓存，同一分支上的多次查询只会重新验证一次根目录 (通常是 304)
+        index = await github_service.get_repo_index(repo_owner, repo_name, branch)
+        options = load_repo_index_options()
+        limit = limit or options["default_limit"]
+        try:
+            if operation == "list_prefix":
+                result = index.list_prefix(pattern, limit)
+            elif operation == "glob":
+                result = index.glob(pattern, limit)
+            elif operation == "regex":
+                # 模式由 LLM 提供，可能回溯很慢：放到线程里执行，不阻塞事件循环
+                result = await asyncio.to_thread(index.regex, pattern, limit, options["max_regex_length"])
+            elif operation == "extension_stats":
+                result = {"extensions": index.extension_stats(pattern)[:limit]}
+            elif operation == "directory_summary":
+                result = index.directory_summary(pattern, limit)
+            else:
+                raise ValueError(f"Unknown operation: {operation}")
+        except ValueError as e:
+            # 返回给模型让它修正参数，而不是中断整个 agent
+            return {"error": str(e), "operation": operation, "pattern": pattern}
+        return {**result, "tree_sha": index.tree_sha, "total_files": len(index), "truncated": index.truncated}
+
+query_repo_files_tool = QueryRepoFilesTool()
+
+# 由 CodeReviewService 在增量评审时设置：{"repo_owner", "repo_name", "pull_number", "filenames"}。
+# 工具只返回 filenames 中的文件，不依赖 LLM 自己传入过滤条件。
+review_file_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("review_file_scope", default=None)
+
 class GetPrReviewContextInput(BaseModel):
     """Input for the get_pr_code_review_context tool."""
     repo_owner: str = Field(description="The owner of the GitHub repository.")
@@ -48,10 +110,31 @@ class GetPrReviewContextTool(BaseTool):
 
     def _run(self, repo_owner: str, repo_name: str, pull_number: int) -> dict:
         logger.info("Running GetPrReviewContextTool synchronously...")
-        return asyncio.run(self._arun(repo_owner, repo_name, pull_number))
+        return loop_runner.run(self._arun(repo_owner, repo_name, pull_number))
 
     async def _arun(self, repo_owner: str, repo_name: str, pull_number: int) -> dict:
         logger.info("Running GetPrReviewContextTool asynchronously...")
-        return await github_service.get_pr_code_review_info(repo_owner, repo_name, pull_number)
+        with tracer.span("tool.get_pr_code_review_context", {
+            "github.repo": f"{repo_owner}/{repo_name}", "github.pull_number": pull_number,
+        }) as span:
+            only_files = None
+            scope = review_file_scope.get()
+            if scope and (scope["repo_owner"], scope["repo_name"], scope["pull_number"]) == (repo_owner, repo_name, pull_number):
+                only_files = set(scope["filenames"])
+                logger.info(f"Review scope limited to {len(only_files)} files changed since the last review.")
+            span.set_attribute("review.incremental", only_files is not None)
+            review_info = await github_service.get_pr_code_review_info(repo_owner, repo_name, pull_number, only_files=only_files)
+            # 完整文件内容替换为 hunk 附近的上下文，并裁剪到模型的 token 预算内
+            packed = context_packer.pack(review_info)
+            context_stats = packed.get("context_stats") or {}
+            span.set_attributes({
+                "pr.changed_files": len(packed.get("changed_files") or []),
+                "context.tokens_before": context_stats.get("tokens_before"),
+                "context.tokens_after": context_stats.get("tokens_after"),
+                "context.skipped_files": len(packed.get("skipped_files") or []),
+                "context.omitted_files": len(packed.get("omitted_files") or []),
+            })
+            return packed
 
+context_packer = ContextPacker()
 get_pr_review_context_tool = GetPrReviewContextTool()
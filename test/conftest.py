@@ -0,0 +1,306 @@
+import asyncio
+import difflib
+import hashlib
+import itertools
+import json
+import re
+
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+
+def git_blob_sha(content: str) -> str:
+    """Computes the git object id of a blob, the same way `git hash-object` does."""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeGitHub:
+    """
+    In-memory stand-in for the subset of the GitHub REST API used by GitHubService.
+
+    Commits are flat {path: content} snapshots, PR file lists are computed by diffing
+    the base and head snapshots. Every request is recorded so tests can assert on
+    round-trips, and every TCP peer is recorded so tests can assert on connection reuse.
+    """
+
+    def __init__(self):
+        self.refs = {}
+        self.commits = {}
+        self.pulls = {}
+        self.blobs = {}
+        self.latency = 0.0
+        self.requests = []
+        self.connections = set()
+        self.faults = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.not_modified = 0
+        self.compare_status = "ahead"
+        # Recursive tree responses with more entries than this are truncated, like GitHub's limit
+        self.tree_limit = None
+        self.trees = {}
+        self.base_url = ""
+        self._sha_counter = itertools.count(1)
+
+    # --- fixture data ---
+
+    def add_commit(self, files: dict, sha: str = None, ref: str = None) -> str:
+        sha = sha or f"{next(self._sha_counter):040x}"
+        self.commits[sha] = dict(files)
+        for content in files.values():
+            self.blobs[git_blob_sha(content)] = content
+        if ref:
+            self.refs[ref] = sha
+        return sha
+
+    def add_pull(self, number: int, base: str, head: str, title: str = None, state: str = "open", user: str = "octocat"):
+        self.pulls[number] = {
+            "number": number,
+            "title": title or f"PR #{number}",
+            "state": state,
+            "html_url": f"https://github.com/octo/repo/pull/{number}",
+            "user": {"login": user},
+            "base": {"sha": base, "ref": "main"},
+            "head": {"sha": head, "ref": f"feature-{number}"},
+        }
+
+    def add_fault(self, match: str, status: int, times: int = 1, headers: dict = None):
+        """Makes the next `times` requests whose path contains `match` fail with `status`."""
+        self.faults.append({"match": match, "status": status, "times": times, "headers": headers or {}})
+
+    def resolve(self, ref: str) -> str:
+        return self.refs.get(ref, ref)
+
+    def pull_files(self, number: int) -> list:
+        pr = self.pulls[number]
+        return self.diff(pr["base"]["sha"], pr["head"]["sha"])
+
+    def diff(self, base_sha: str, head_sha: str) -> list:
+        base = self.commits[base_sha]
+        head = self.commits[head_sha]
+        files = []
+        for path in sorted(set(base) | set(head)):
+            old, new = base.get(path), head.get(path)
+            if old == new:
+                continue
+            status = "added" if old is None else "removed" if new is None else "modified"
+            patch = "".join(
+                difflib.unified_diff((old or "").splitlines(True), (new or "").splitlines(True), n=3)
+            )
+            patch = patch.split("\n", 2)[2] if patch.count("\n") >= 2 else patch
+            files.append({
+                "filename": path,
+                "status": status,
+                "sha": git_blob_sha(new) if new is not None else None,
+                "patch": patch,
+            })
+        return files
+
+    # --- HTTP handlers ---
+
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._record])
+        prefix = "/repos/{owner}/{repo}"
+        app.router.add_get(prefix + "/pulls", self._list_pulls)
+        app.router.add_get(prefix + "/pulls/{number}", self._get_pull)
+        app.router.add_get(prefix + "/pulls/{number}/files", self._list_pull_files)
+        app.router.add_get(prefix + "/compare/{basehead}", self._compare)
+        app.router.add_get(prefix + "/git/trees/{ref}", self._get_tree)
+        app.router.add_get(prefix + "/contents/{path:.*}", self._get_contents)
+        app.router.add_get(prefix + "/git/blobs/{sha}", self._get_blob)
+        app.router.add_post("/graphql", self._graphql)
+        return app
+
+    @web.middleware
+    async def _record(self, request, handler):
+        self.requests.append(request.path_qs)
+        self.connections.add(request.transport.get_extra_info("peername"))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            for fault in self.faults:
+                if fault["times"] > 0 and fault["match"] in request.path_qs:
+                    fault["times"] -= 1
+                    return web.json_response({"message": "injected"}, status=fault["status"], headers=fault["headers"])
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def _json(self, request, data, headers: dict = None) -> web.Response:
+        """JSON response with a content-derived ETag, answering If-None-Match with 304."""
+        body = json.dumps(data, sort_keys=True)
+        etag = f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"'
+        headers = {"ETag": etag, **(headers or {})}
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=body, content_type="application/json", headers=headers)
+
+    def _paginate(self, request, items: list) -> web.Response:
+        per_page = int(request.query.get("per_page", 30))
+        page = int(request.query.get("page", 1))
+        headers = {}
+        if page * per_page < len(items):
+            next_url = request.url.update_query({"per_page": per_page, "page": page + 1})
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return self._json(request, items[(page - 1) * per_page:page * per_page], headers)
+
+    async def _list_pulls(self, request):
+        state = request.query.get("state", "open")
+        pulls = [pr for pr in self.pulls.values() if state == "all" or pr["state"] == state]
+        return self._paginate(request, pulls)
+
+    async def _get_pull(self, request):
+        number = int(request.match_info["number"])
+        if number not in self.pulls:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return self._json(request, self.pulls[number])
+
+    async def _list_pull_files(self, request):
+        number = int(request.match_info["number"])
+        return self._paginate(request, self.pull_files(number))
+
+    async def _compare(self, request):
+        base, _, head = request.match_info["basehead"].partition("...")
+        base, head = self.resolve(base), self.resolve(head)
+        if base not in self.commits or head not in self.commits:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return self._json(request, {"status": self.compare_status, "files": self.diff(base, head)})
+
+    def _tree_entries(self, commit_sha: str, prefix: str, recursive: bool) -> list:
+        entries, subdirs = [], set()
+        for path, content in sorted(self.commits[commit_sha].items()):
+            if not path.startswith(prefix):
+                continue
+            rest = path[len(prefix):]
+            if recursive or "/" not in rest:
+                entries.append({
+                    "path": rest, "type": "blob", "sha": git_blob_sha(content), "size": len(content.encode("utf-8")),
+                })
+            else:
+                subdirs.add(rest.split("/", 1)[0])
+        for name in sorted(subdirs):
+            tree_sha = hashlib.sha1(f"{commit_sha}:{prefix}{name}/".encode()).hexdigest()
+            self.trees[tree_sha] = (commit_sha, f"{prefix}{name}/")
+            entries.append({"path": name, "type": "tree", "sha": tree_sha})
+        return entries
+
+    async def _get_tree(self, request):
+        ref = request.match_info["ref"]
+        commit_sha, prefix = self.trees.get(ref) or (self.resolve(ref), "")
+        if commit_sha not in self.commits:
+            return web.json_response({"message": "Not Found"}, status=404)
+        recursive = bool(request.query.get("recursive"))
+        tree = self._tree_entries(commit_sha, prefix, recursive)
+        truncated = recursive and self.tree_limit is not None and len(tree) > self.tree_limit
+        if truncated:
+            tree = tree[:self.tree_limit]
+        return self._json(request, {"sha": ref if prefix else commit_sha, "tree": tree, "truncated": truncated})
+
+    async def _get_contents(self, request):
+        sha = self.resolve(request.query.get("ref", "main"))
+        content = self.commits.get(sha, {}).get(request.match_info["path"])
+        if content is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.Response(text=content)
+
+    async def _get_blob(self, request):
+        content = self.blobs.get(request.match_info["sha"])
+        if content is None:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.Response(text=content)
+
+    async def _graphql(self, request):
+        payload = await request.json()
+        repository = {}
+        for alias, oid in re.findall(r'(\w+): object\(expression: "([0-9a-f]+)"\)', payload["query"]):
+            content = self.blobs.get(oid)
+            repository[alias] = None if content is None else {"text": content, "isBinary": False}
+        return web.json_response({"data": {"repository": repository}})
+
+
+@pytest_asyncio.fixture
+async def fake_github():
+    fake = FakeGitHub()
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    fake.base_url = str(server.make_url("")).rstrip("/")
+    try:
+        yield fake
+    finally:
+        await server.close()
+
+
+class FakeGemini:
+    """
+    Local stand-in for the Gemini REST API (generateContent / streamGenerateContent?alt=sse).
+
+    Answers with the queued `replies` (text, or a {"functionCall": ...} part) in order and
+    falls back to echoing the last user text. Records request bodies and TCP peers.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.requests = []
+        self.connections = set()
+        self.status = 200
+        self.base_url = ""
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/models/{model_action}", self._handle)
+        app.router.add_post("/{version}/models/{model_action}", self._handle)
+        return app
+
+    def _parts(self, payload) -> list:
+        if self.replies:
+            reply = self.replies.pop(0)
+            return [reply] if isinstance(reply, dict) else [{"text": reply}]
+        last = payload["contents"][-1]["parts"][-1]
+        return [{"text": f"echo: {last.get('text', '')}"}]
+
+    async def _handle(self, request):
+        self.connections.add(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        self.requests.append({"path": request.path_qs, "payload": payload})
+        if self.status != 200:
+            return web.json_response({"error": {"code": self.status, "message": "injected"}}, status=self.status)
+        model, _, action = request.match_info["model_action"].partition(":")
+        parts = self._parts(payload)
+        usage = {"promptTokenCount": 10, "candidatesTokenCount": 5, "totalTokenCount": 15}
+        if action == "generateContent":
+            return web.json_response({
+                "candidates": [{"content": {"role": "model", "parts": parts}, "finishReason": "STOP"}],
+                "usageMetadata": usage,
+                "modelVersion": model,
+            })
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        # Text replies are streamed word by word; the last event carries finishReason.
+        pieces = [{"text": w} for w in re.findall(r"\S+\s*", parts[0]["text"])] if "text" in parts[0] else parts
+        for i, piece in enumerate(pieces):
+            event = {"candidates": [{"content": {"role": "model", "parts": [piece]}}], "usageMetadata": usage}
+            if i == len(pieces) - 1:
+                event["candidates"][0]["finishReason"] = "STOP"
+            await response.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+        await response.write_eof()
+        return response
+
+
+@pytest_asyncio.fixture
+async def fake_gemini(monkeypatch):
+    # The local config routes outbound traffic through a proxy; the mock must be reached directly.
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    fake = FakeGemini()
+    server = TestServer(fake.build_app())
+    await server.start_server()
+    fake.base_url = str(server.make_url("")).rstrip("/")
+    try:
+        yield fake
+    finally:
+        await server.close()
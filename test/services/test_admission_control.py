@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+
+from src.routers.admission import admission
+from src.services.admission_control import AdmissionLimiter, AdmissionRejectedError, admission_controller
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_excess_requests_queue_then_shed_when_the_queue_is_full():
+    limiter = AdmissionLimiter("chat", max_concurrency=2, max_queue=2, queue_timeout=5)
+    await limiter.acquire("a")
+    await limiter.acquire("b")
+    queued = [asyncio.create_task(limiter.acquire(c)) for c in ("c", "d")]
+    await _settle()
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await limiter.acquire("e")
+    assert rejected.value.reason == "queue_full"
+    assert limiter.stats()["queue_depth"] == 2
+
+    limiter.release()
+    limiter.release()
+    await asyncio.gather(*queued)
+    stats = limiter.stats()
+    assert (stats["active"], stats["queue_depth"], stats["admitted"]) == (2, 0, 4)
+    assert stats["shed"] == {"queue_full": 1, "timeout": 0}
+    assert stats["wait_histogram"]["+Inf"] == 4
+
+
+@pytest.mark.asyncio
+async def test_waiting_past_the_deadline_is_shed():
+    limiter = AdmissionLimiter("review", max_concurrency=1, max_queue=10, queue_timeout=0.05)
+    await limiter.acquire("a")
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        await limiter.acquire("b")
+
+    assert rejected.value.reason == "timeout"
+    assert limiter.stats()["queue_depth"] == 0
+    limiter.release()
+    assert limiter.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_freed_slots_rotate_between_clients():
+    limiter = AdmissionLimiter("chat", max_concurrency=1, max_queue=10, queue_timeout=5)
+    await limiter.acquire("holder")
+    order = []
+
+    async def request(client):
+        await limiter.acquire(client)
+        order.append(client)
+
+    # A burst of four requests from one client, then one from another client.
+    tasks = [asyncio.create_task(request("burst")) for _ in range(4)]
+    await _settle()
+    tasks.append(asyncio.create_task(request("other")))
+    await _settle()
+
+    for _ in range(5):
+        limiter.release()
+        await _settle()
+    await asyncio.gather(*tasks)
+
+    assert order == ["burst", "other", "burst", "burst", "burst"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_its_slot():
+    limiter = AdmissionLimiter("chat", max_concurrency=1, max_queue=10, queue_timeout=5)
+    await limiter.acquire("a")
+    waiter = asyncio.create_task(limiter.acquire("b"))
+    await _settle()
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+
+    assert (limiter.active, limiter.queue_depth) == (0, 0)
+
+
+@pytest.mark.asyncio
+async def test_endpoint_holds_its_slot_while_streaming_and_answers_503(monkeypatch):
+    monkeypatch.setattr(admission_controller, "limiters", {
+        "test": AdmissionLimiter("test", max_concurrency=1, max_queue=0, queue_timeout=3),
+    })
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.get("/stream", dependencies=[Depends(admission("test"))])
+    async def stream():
+        async def body():
+            yield "first\n"
+            await release.wait()
+            yield "last\n"
+        return StreamingResponse(body())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.get("/stream"))
+        while admission_controller.limiters["test"].active == 0:
+            await asyncio.sleep(0.01)
+
+        rejected = await client.get("/stream")
+        release.set()
+        assert (await first).text == "first\nlast\n"
+
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "3"
+    assert admission_controller.limiters["test"].stats()["active"] == 0
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from src.services.blob_cache import BlobCache, is_immutable_ref
+from src.services.github_service import GitHubService
+
+SHA = "a" * 40
+
+
+def test_lru_respects_byte_budget():
+    cache = BlobCache(max_bytes=10, max_item_bytes=10)
+    cache.put(("o", "r", "a.py", SHA), "aaaa")
+    cache.put(("o", "r", "b.py", SHA), "bbbb")
+    assert cache.get(("o", "r", "a.py", SHA)) == "aaaa"  # a becomes most recent
+
+    cache.put(("o", "r", "c.py", SHA), "cccc")  # evicts b, the least recently used
+
+    assert cache.get(("o", "r", "b.py", SHA)) is None
+    assert cache.get(("o", "r", "a.py", SHA)) == "aaaa"
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_bytes"] == 8
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["bytes_saved"] == 8
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    big = "x" * 4096
+    cache = BlobCache(max_bytes=100, max_item_bytes=100, disk_dir=str(tmp_path))
+    cache.put(("o", "r", "big.bin", SHA), big)  # too large for memory, lands on disk only
+    cache.put(("o", "r", "small.py", SHA), "ok")
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get(("o", "r", "big.bin", SHA)) == big
+    assert cache.stats()["disk_hits"] == 1
+
+    # A fresh process (new cache object) still sees the on-disk blobs.
+    reopened = BlobCache(max_bytes=100, disk_dir=str(tmp_path))
+    assert reopened.get(("o", "r", "small.py", SHA)) == "ok"
+    assert reopened.stats()["disk_hits"] == 1
+    assert reopened.get(("o", "r", "small.py", SHA)) == "ok"
+    assert reopened.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_access_reads_and_writes_disk_off_the_event_loop(tmp_path, monkeypatch):
+    cache = BlobCache(max_bytes=100, max_item_bytes=100, disk_dir=str(tmp_path))
+    loop_thread = threading.get_ident()
+    io_threads = set()
+    read_disk, write_disk = cache._read_disk, cache._write_disk
+    monkeypatch.setattr(cache, "_read_disk", lambda key: io_threads.add(threading.get_ident()) or read_disk(key))
+    monkeypatch.setattr(cache, "_write_disk", lambda *a: io_threads.add(threading.get_ident()) or write_disk(*a))
+
+    await cache.aput(("o", "r", "big.bin", SHA), "y" * 500)
+    assert await cache.aget(("o", "r", "big.bin", SHA)) == "y" * 500
+    assert await cache.aget(("o", "r", "missing.py", SHA)) is None
+
+    assert io_threads and loop_thread not in io_threads
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_only_full_shas_are_cacheable():
+    assert is_immutable_ref(SHA)
+    assert not is_immutable_ref("main")
+    assert not is_immutable_ref("abc1234")
+
+
+@pytest.mark.asyncio
+async def test_rereview_is_served_from_blob_cache(fake_github):
+    base = fake_github.add_commit({"a.py": "old\n", "b.py": "same\n"})
+    head = fake_github.add_commit({"a.py": "new\n", "b.py": "same\n", "c.py": "added\n"})
+    fake_github.add_pull(1, base, head)
+    fake_github.add_pull(2, base, head)
+
+    service = GitHubService(_token="t", base_url=fake_github.base_url, blob_cache=BlobCache(), fetch_mode="contents")
+    try:
+        first = await service.get_pr_code_review_info("octo", "repo", 1)
+        content_requests = [p for p in fake_github.requests if "/contents/" in p]
+        assert len(content_requests) == 3  # a.py at base and head, c.py at head
+
+        fake_github.requests.clear()
+        second = await service.get_pr_code_review_info("octo", "repo", 2)
+        assert not [p for p in fake_github.requests if "/contents/" in p]
+        assert second == first
+        assert service.blob_cache.stats()["bytes_saved"] == len("old\nnew\nadded\n")
+    finally:
+        await service.close()
@@ -0,0 +1,176 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+import src.tools.github_tools as github_tools
+from src.services.blob_cache import BlobCache
+from src.services.code_review_service import CodeReviewService
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.review_report import parse_review_report, render_review_report
+from src.services.review_result_cache import ReviewResultCache
+from src.services.review_state_store import ReviewStateStore
+
+PR_URL = "https://github.com/octo/repo/pull/1"
+
+
+class FakeReviewAgent:
+    """Calls the real PR context tool and reports one finding per file it was shown."""
+
+    def __init__(self):
+        self.seen = []
+
+    async def ainvoke(self, inputs):
+        context = await github_tools.get_pr_review_context_tool._arun("octo", "repo", 1)
+        filenames = [f["filename"] for f in context["changed_files"]]
+        self.seen.append(filenames)
+        findings = [
+            {"filename": name, "line_number": "1", "issue": f"review {len(self.seen)}", "suggestion": "-"}
+            for name in filenames
+        ]
+        return {"messages": [AIMessage(content=render_review_report("Looks fine.", findings))]}
+
+
+@pytest.fixture
+def review_env(fake_github, monkeypatch):
+    service = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode="git",
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    monkeypatch.setattr(github_tools, "github_service", service)
+    agent = FakeReviewAgent()
+    review = CodeReviewService(
+        agent, github=service, state_store=ReviewStateStore(), incremental=True, result_cache=None
+    )
+    return fake_github, service, agent, review
+
+
+@pytest.mark.asyncio
+async def test_re_review_only_covers_new_commits(review_env):
+    fake, service, agent, review = review_env
+    base = fake.add_commit({"a.py": "a\n", "b.py": "b\n", "c.py": "c\n"}, ref="main")
+    head1 = fake.add_commit({"a.py": "a1\n", "b.py": "b1\n", "c.py": "c\n"})
+    fake.add_pull(1, base, head1)
+    try:
+        first = await review.perform_code_review(PR_URL)
+        fake.pulls[1]["head"]["sha"] = fake.add_commit({"a.py": "a1\n", "b.py": "b2\n", "c.py": "c2\n"})
+        second = await review.perform_code_review(PR_URL)
+    finally:
+        await service.close()
+
+    assert agent.seen == [["a.py", "b.py"], ["b.py", "c.py"]]
+    assert [f["filename"] for f in parse_review_report(first)[1]] == ["a.py", "b.py"]
+    summary, findings = parse_review_report(second)
+    # New findings for the re-reviewed files, the previous one for untouched a.py.
+    assert [(f["filename"], f["issue"]) for f in findings] == [
+        ("b.py", "review 2"), ("c.py", "review 2"), ("a.py", "review 1"),
+    ]
+    assert "1 finding(s) carried over" in summary
+
+
+@pytest.mark.asyncio
+async def test_unchanged_head_reuses_previous_report(review_env):
+    fake, service, agent, review = review_env
+    base = fake.add_commit({"a.py": "a\n"}, ref="main")
+    fake.add_pull(1, base, fake.add_commit({"a.py": "a1\n"}))
+    try:
+        first = await review.perform_code_review(PR_URL)
+        second = await review.perform_code_review(PR_URL)
+    finally:
+        await service.close()
+
+    assert second == first
+    assert len(agent.seen) == 1
+
+
+@pytest.mark.asyncio
+async def test_force_push_falls_back_to_full_review(review_env):
+    fake, service, agent, review = review_env
+    base = fake.add_commit({"a.py": "a\n", "b.py": "b\n"}, ref="main")
+    fake.add_pull(1, base, fake.add_commit({"a.py": "a1\n", "b.py": "b1\n"}))
+    try:
+        await review.perform_code_review(PR_URL)
+        fake.pulls[1]["head"]["sha"] = fake.add_commit({"a.py": "a2\n", "b.py": "b1\n"})
+        fake.compare_status = "diverged"
+        await review.perform_code_review(PR_URL)
+    finally:
+        await service.close()
+
+    assert agent.seen == [["a.py", "b.py"], ["a.py", "b.py"]]
+
+
+@pytest.mark.asyncio
+async def test_result_cache_survives_restart_and_invalidates(review_env, tmp_path):
+    fake, service, agent, _ = review_env
+    base = fake.add_commit({"a.py": "a\n"}, ref="main")
+    fake.add_pull(1, base, fake.add_commit({"a.py": "a1\n"}))
+    path = str(tmp_path / "results.sqlite3")
+
+    def new_review(model_id="gemini/gemini-2.5-pro"):
+        # A fresh state store each time: only the persistent result cache carries over.
+        return CodeReviewService(
+            agent, github=service, state_store=ReviewStateStore(), incremental=True,
+            result_cache=ReviewResultCache(path), model_id=model_id,
+        )
+
+    try:
+        first = await new_review().perform_code_review(PR_URL)
+        cached = await new_review().perform_code_review(PR_URL)
+        assert cached == first and len(agent.seen) == 1
+
+        await new_review(model_id="deepseek/deepseek-chat").perform_code_review(PR_URL)
+        assert len(agent.seen) == 2
+        fake.pulls[1]["base"]["sha"] = fake.add_commit({"a.py": "a\n", "b.py": "b\n"})
+        await new_review().perform_code_review(PR_URL)
+        assert len(agent.seen) == 3
+    finally:
+        await service.close()
+
+
+def test_result_cache_key_covers_every_component():
+    cache = ReviewResultCache()
+    key = ("octo", "repo", 1, "h" * 40, "b" * 40, "gemini/x", "p1")
+    cache.put(*key, "report")
+    assert cache.get(*key) == "report"
+    for i, changed in enumerate(["other", "other", 2, "x" * 40, "y" * 40, "deepseek/x", "p2"]):
+        assert cache.get(*key[:i], changed, *key[i + 1:]) is None
+    # Storing a newer result for the PR replaces the old one.
+    cache.put(*key[:3], "n" * 40, *key[4:], "newer")
+    assert cache.get(*key) is None
+    assert cache.stats()["entries"] == 1
+
+
+def test_result_cache_keeps_other_models_and_prompts_of_a_pr():
+    cache = ReviewResultCache()
+    pr = ("octo", "repo", 1, "h" * 40, "b" * 40)
+    for model, prompt in [("gemini/x", "p1"), ("deepseek/x", "p1"), ("gemini/x", "p2")]:
+        cache.put(*pr, model, prompt, f"{model} {prompt}")
+    # Alternating providers or A/B prompt versions keep hitting.
+    assert cache.get(*pr, "gemini/x", "p1") == "gemini/x p1"
+    assert cache.get(*pr, "deepseek/x", "p1") == "deepseek/x p1"
+    assert cache.get(*pr, "gemini/x", "p2") == "gemini/x p2"
+
+    cache.put(*pr[:3], "n" * 40, pr[4], "gemini/x", "p1", "new head")
+    assert cache.get(*pr, "gemini/x", "p1") is None
+    assert cache.get(*pr, "deepseek/x", "p1") == "deepseek/x p1"
+    assert cache.stats()["entries"] == 3
+
+
+def test_result_cache_is_trimmed_periodically():
+    cache = ReviewResultCache(max_entries=3, trim_interval=4)
+    for number in range(1, 4 + 1):
+        cache.put("octo", "repo", number, "h" * 40, "b" * 40, "m", "p", f"report {number}")
+    assert cache.stats()["entries"] == 3
+    assert cache.get("octo", "repo", 1, "h" * 40, "b" * 40, "m", "p") is None
+
+    for number in range(5, 7 + 1):
+        cache.put("octo", "repo", number, "h" * 40, "b" * 40, "m", "p", f"report {number}")
+    assert cache.stats()["entries"] == 6  # trimmed again on the next interval, not on every write
+
+
+def test_report_round_trip():
+    findings = [{"filename": "a.py", "line_number": "3", "issue": "uses `a \\| b`", "suggestion": "split"}]
+    report = render_review_report("Summary text.", findings)
+    assert parse_review_report(report) == ("Summary text.", findings)
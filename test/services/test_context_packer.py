@@ -0,0 +1,73 @@
+import difflib
+
+from src.services.context_packer import ContextPacker
+
+
+def _file(filename, old, new, status="modified"):
+    patch = "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), n=3))
+    patch = patch.split("\n", 2)[2] if patch.count("\n") >= 2 else patch
+    return {
+        "filename": filename, "status": status, "diff_info": patch,
+        "original_content": old, "updated_content": new,
+    }
+
+
+def _module(changed_line=None):
+    lines = [f"x{i} = {i}" for i in range(500)]
+    lines[300:303] = ["def handler(event):", "    total = 0", "    return total"]
+    lines[320] = "    value = 1" if changed_line is None else changed_line
+    return "\n".join(lines) + "\n"
+
+
+def _review_info(*files):
+    return {"changed_files": list(files), "fetch_status": "complete", "failed_files": []}
+
+
+def test_keeps_hunks_with_context_and_enclosing_definition():
+    packer = ContextPacker(token_budget=100_000, options={"context_lines": 5})
+    info = _review_info(_file("app.py", _module(), _module("    value = 2")))
+
+    packed = packer.pack(info)
+
+    context = packed["changed_files"][0]["context"]
+    assert "original_content" not in packed["changed_files"][0]
+    assert "  321 |     value = 2" in context
+    assert "  301 | def handler(event):" in context
+    assert "x100 = 100" not in context and "x400 = 400" not in context
+    stats = packed["context_stats"]
+    assert stats["tokens_after"] * 10 < stats["tokens_before"]
+
+
+def test_drops_lockfiles_generated_and_binary_files():
+    packer = ContextPacker(token_budget=100_000)
+    info = _review_info(
+        _file("web/package-lock.json", "{}\n", '{"a": 1}\n'),
+        _file("static/app.min.js", "a\n", "b\n"),
+        _file("logo.bin", "\x00a\n", "\x00b\n"),
+        _file("main.py", "a = 1\n", "a = 2\n"),
+    )
+
+    packed = packer.pack(info)
+
+    assert [f["filename"] for f in packed["changed_files"]] == ["main.py"]
+    assert packed["skipped_files"] == ["web/package-lock.json", "static/app.min.js", "logo.bin"]
+
+
+def test_most_significant_files_win_when_the_budget_runs_out():
+    packer = ContextPacker(token_budget=100_000, options={"context_lines": 50})
+    big_change = _file("core.py", _module(), _module().replace("x3", "y3"))
+    small_change = _file("notes.py", _module(), _module("    value = 3"))
+    full = packer.pack(_review_info(small_change, big_change))
+    sizes = {f["filename"]: packer._file_tokens(f) for f in full["changed_files"]}
+    diff_only = packer._file_tokens({**full["changed_files"][0], "context": ""})
+
+    packer.token_budget = full["context_stats"]["tokens_after"] - sizes["notes.py"] + diff_only
+    packed = packer.pack(_review_info(small_change, big_change))
+
+    # Original PR order is kept, but only the low-significance file lost its context.
+    assert [f["filename"] for f in packed["changed_files"]] == ["notes.py", "core.py"]
+    assert packed["context_stats"]["context_trimmed_files"] == ["notes.py"]
+    assert packed["changed_files"][1]["context"]
+
+    packer.token_budget = 50
+    assert packer.pack(_review_info(small_change, big_change))["omitted_files"] == ["core.py", "notes.py"]
@@ -0,0 +1,150 @@
+import json
+import threading
+
+import pytest
+
+from src.services.blob_cache import BlobCache
+from src.services.etag_store import DiskETagStore, MemoryETagStore, create_etag_store
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+
+
+def _service(fake, etag_store):
+    return GitHubService(
+        _token="t",
+        base_url=fake.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode="git",
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+        etag_store=etag_store,
+    )
+
+
+def _seed(fake):
+    base = fake.add_commit({"a.py": "1\n", "b.py": "2\n"}, ref="main")
+    head = fake.add_commit({"a.py": "1\n", "b.py": "3\n"})
+    fake.add_pull(1, base, head)
+
+
+@pytest.mark.asyncio
+async def test_unchanged_resources_are_revalidated_with_304(fake_github):
+    _seed(fake_github)
+    store = MemoryETagStore()
+    service = _service(fake_github, store)
+    try:
+        first = await service.get_pr_code_review_info("octo", "repo", 1)
+        assert fake_github.not_modified == 0
+        second = await service.get_pr_code_review_info("octo", "repo", 1)
+        prs = await service.get_pull_requests("octo", "repo")
+        prs_again = await service.get_pull_requests("octo", "repo")
+    finally:
+        await service.close()
+
+    assert second == first
+    assert prs_again == prs
+    # PR, file list page and both trees on the second review, then the PR list.
+    assert fake_github.not_modified == 5
+    stats = store.stats()
+    assert stats["conditional_requests"] == 5
+    assert stats["revalidation_hit_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_changed_resources_replace_the_stored_body(fake_github):
+    _seed(fake_github)
+    store = MemoryETagStore()
+    service = _service(fake_github, store)
+    try:
+        assert [pr["title"] for pr in await service.get_pull_requests("octo", "repo")] == ["PR #1"]
+        fake_github.pulls[1]["title"] = "Renamed"
+        assert [pr["title"] for pr in await service.get_pull_requests("octo", "repo")] == ["Renamed"]
+        assert [pr["title"] for pr in await service.get_pull_requests("octo", "repo")] == ["Renamed"]
+    finally:
+        await service.close()
+
+    assert store.stats()["conditional_requests"] == 2
+    assert store.stats()["not_modified"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_store_survives_a_new_service(fake_github, tmp_path):
+    _seed(fake_github)
+    for _ in range(2):
+        service = _service(fake_github, DiskETagStore(str(tmp_path)))
+        try:
+            files = await service.get_all_files_list("octo", "repo")
+        finally:
+            await service.close()
+        assert files == ["a.py", "b.py"]
+
+    # Both the root listing and the recursive tree are revalidated by the second service.
+    assert fake_github.not_modified == 2
+
+
+def test_memory_store_is_bounded():
+    store = MemoryETagStore(max_entries=2)
+    for i in range(3):
+        store.put(f"k{i}", f'"{i}"', [i])
+    assert store.get("k0") is None
+    assert store.get("k2") == {"etag": '"2"', "body": [2]}
+
+
+def test_memory_store_is_bounded_by_body_bytes():
+    tree = {"tree": [{"path": f"src/file_{i}.py"} for i in range(20)]}
+    size = len(json.dumps(tree, separators=(",", ":")))
+    store = MemoryETagStore(max_bytes=size * 2, max_item_bytes=size * 2)
+    for i in range(3):
+        store.put(f"tree{i}", f'"{i}"', tree)
+    store.put("huge", '"h"', {"tree": [tree] * 3})  # over max_item_bytes: not stored
+
+    assert store.get("tree0") is None and store.get("huge") is None
+    assert store.get("tree2")["body"] == tree
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["memory_bytes"] == size * 2 and stats["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_store_does_file_io_off_the_event_loop(fake_github, tmp_path, monkeypatch):
+    _seed(fake_github)
+    store = DiskETagStore(str(tmp_path))
+    loop_thread = threading.get_ident()
+    io_threads = set()
+    load, save = store._load, store._save
+    monkeypatch.setattr(store, "_load", lambda key: io_threads.add(threading.get_ident()) or load(key))
+    monkeypatch.setattr(store, "_save", lambda *a: io_threads.add(threading.get_ident()) or save(*a))
+    service = _service(fake_github, store)
+    try:
+        await service.get_all_files_list("octo", "repo")
+        await service.get_all_files_list("octo", "repo")
+    finally:
+        await service.close()
+
+    assert io_threads and loop_thread not in io_threads
+    assert store.stats()["stored"] == len(list(tmp_path.glob("*.json"))) > 0
+
+
+@pytest.mark.asyncio
+async def test_memory_store_sizes_bodies_by_response_bytes(fake_github, monkeypatch):
+    _seed(fake_github)
+    store = MemoryETagStore()
+    service = _service(fake_github, store)
+    sizes = []
+    save = store._save
+    monkeypatch.setattr(store, "_save", lambda key, entry, size: sizes.append(size) or save(key, entry, size))
+    try:
+        prs = await service.get_pull_requests("octo", "repo")
+    finally:
+        await service.close()
+
+    # The length of the response GitHub sent, not a re-serialisation of the parsed body
+    assert sizes and None not in sizes
+    assert store.stats()["memory_bytes"] == sum(sizes)
+    assert prs
+
+
+def test_factory_selects_backend(tmp_path):
+    assert isinstance(create_etag_store({"backend": "memory"}), MemoryETagStore)
+    assert isinstance(create_etag_store({"backend": "disk", "disk_dir": str(tmp_path)}), DiskETagStore)
+    assert create_etag_store({"backend": "none"}) is None
+    with pytest.raises(ValueError):
+        create_etag_store({"backend": "redis"})
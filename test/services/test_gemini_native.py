@@ -0,0 +1,184 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import tool
+from loguru import logger
+
+from src.llm.custom_gemini import CustomGeminiChatModel
+from src.llm.gemini_native import GeminiAPIError, close_gemini_clients
+from src.llm.router import is_retryable
+from src.services.loop_runner import LoopRunner, loop_runner
+
+
+@tool
+def count_lines(path: str) -> int:
+    """Counts the lines of a file in the pull request."""
+    return 42
+
+
+@pytest.mark.asyncio
+async def test_generate_sends_native_payload(fake_gemini):
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url, temperature=0.2)
+    try:
+        answer = await llm.ainvoke([SystemMessage(content="Be brief."), HumanMessage(content="hello")])
+    finally:
+        await close_gemini_clients()
+
+    assert answer.content == "echo: hello"
+    assert answer.usage_metadata["total_tokens"] == 15
+    request = fake_gemini.requests[0]
+    assert request["path"] == "/models/gemini-2.5-pro:generateContent"
+    assert request["payload"]["systemInstruction"] == {"parts": [{"text": "Be brief."}]}
+    assert request["payload"]["contents"] == [{"role": "user", "parts": [{"text": "hello"}]}]
+    assert request["payload"]["generationConfig"] == {"temperature": 0.2}
+    assert {s["threshold"] for s in request["payload"]["safetySettings"]} == {"BLOCK_NONE"}
+
+
+@pytest.mark.asyncio
+async def test_instances_share_one_pooled_client(fake_gemini):
+    first = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+    second = CustomGeminiChatModel(base_url=fake_gemini.base_url, model_name="gemini-2.5-flash")
+    try:
+        for i in range(10):
+            await (first if i % 2 else second).ainvoke(f"call {i}")
+    finally:
+        await close_gemini_clients()
+
+    assert first.client is second.client
+    assert len(fake_gemini.connections) == 1
+
+
+@pytest.mark.asyncio
+async def test_sync_invoke_from_worker_threads_reuses_the_async_pool(fake_gemini, monkeypatch):
+    monkeypatch.setattr(loop_runner, "_service_loop", None)
+    loop_runner.attach()
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+    try:
+        await llm.ainvoke("warm up")
+        # Not the loop's default executor: aiohttp resolves hosts there, so blocking all of its
+        # threads on the loop would deadlock.
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            loop = asyncio.get_running_loop()
+            answers = await asyncio.gather(*(loop.run_in_executor(pool, llm.invoke, f"sync {i}") for i in range(8)))
+        sessions = len(llm.client._sessions)
+    finally:
+        await close_gemini_clients()
+
+    assert [a.content for a in answers] == [f"echo: sync {i}" for i in range(8)]
+    assert len(fake_gemini.connections) <= 8
+    # Every coroutine ran on this (the service) loop, so only one session was ever created.
+    assert sessions == 1
+
+
+@pytest.mark.asyncio
+async def test_service_and_background_loops_do_not_replace_each_others_session(fake_gemini):
+    runner = LoopRunner()
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+
+    async def session_in_use(prompt):
+        await llm.ainvoke(prompt)
+        return llm.client._sessions.current()
+
+    try:
+        here = [await session_in_use("a"), await session_in_use("b")]
+        background = await asyncio.wrap_future(runner.submit(session_in_use("c")))
+        here.append(await session_in_use("d"))
+        assert here[0] is here[1] is here[2] and background is not here[0]
+    finally:
+        await close_gemini_clients()
+        runner.close()
+
+    assert here[0].closed and background.closed
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_chunks_as_they_arrive(fake_gemini):
+    fake_gemini.replies = ["one two three"]
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+    try:
+        chunks = [chunk async for chunk in llm.astream("count")]
+    finally:
+        await close_gemini_clients()
+
+    chunks = [c for c in chunks if c.content or c.usage_metadata]
+    assert [c.content for c in chunks] == ["one ", "two ", "three"]
+    assert fake_gemini.requests[0]["path"].endswith(":streamGenerateContent?alt=sse")
+    # Usage is cumulative per event, so only the last chunk reports it.
+    assert [c.usage_metadata is not None for c in chunks] == [False, False, True]
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_round_trip_through_the_agent(fake_gemini):
+    from langchain.agents import create_agent
+
+    fake_gemini.replies = [{"functionCall": {"name": "count_lines", "args": {"path": "a.py"}}, "thoughtSignature": "sig"}, "a.py has 42 lines"]
+    agent = create_agent(model=CustomGeminiChatModel(base_url=fake_gemini.base_url), tools=[count_lines])
+    try:
+        result = await agent.ainvoke({"messages": [("user", "how long is a.py?")]})
+    finally:
+        await close_gemini_clients()
+
+    assert result["messages"][-1].content == "a.py has 42 lines"
+    first, second = (r["payload"] for r in fake_gemini.requests)
+    declaration = first["tools"][0]["functionDeclarations"][0]
+    assert declaration["name"] == "count_lines"
+    assert declaration["parameters"] == {"type": "OBJECT", "properties": {"path": {"type": "STRING"}}, "required": ["path"]}
+    assert [c["role"] for c in second["contents"]] == ["user", "model", "user"]
+    # The model turn is sent back verbatim (thought signature included), followed by the tool result.
+    assert second["contents"][1]["parts"] == [{"functionCall": {"name": "count_lines", "args": {"path": "a.py"}}, "thoughtSignature": "sig"}]
+    assert second["contents"][2]["parts"] == [{"functionResponse": {"name": "count_lines", "response": {"result": 42}}}]
+
+
+@pytest.mark.asyncio
+async def test_api_errors_carry_the_status_code(fake_gemini):
+    fake_gemini.status = 429
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+    try:
+        with pytest.raises(GeminiAPIError) as error:
+            await llm.ainvoke("hello")
+    finally:
+        await close_gemini_clients()
+
+    assert error.value.status_code == 429
+    assert is_retryable(error.value)
+
+
+async def _mean_seconds(call, calls: int) -> float:
+    await call()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await call()
+    return (time.perf_counter() - start) / calls
+
+
+@pytest.mark.asyncio
+async def test_per_call_overhead_against_local_endpoint(fake_gemini):
+    """Native path vs. the ChatGoogleGenerativeAI client it replaces, both against the local mock."""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    calls = 100
+    native = CustomGeminiChatModel(base_url=fake_gemini.base_url)
+    legacy = ChatGoogleGenerativeAI(model="gemini-2.5-pro", google_api_key="test-key", base_url=fake_gemini.base_url)
+    payload = {"contents": [{"role": "user", "parts": [{"text": "hi"}]}]}
+    url = f"{fake_gemini.base_url}/models/gemini-2.5-pro:generateContent"
+    try:
+        async with aiohttp.ClientSession() as session:
+            async def raw_call():
+                async with session.post(url, json=payload) as response:
+                    await response.json()
+
+            raw = await _mean_seconds(raw_call, calls)
+        native_overhead = await _mean_seconds(lambda: native.ainvoke("hi"), calls) - raw
+        legacy_overhead = await _mean_seconds(lambda: legacy.ainvoke("hi"), calls) - raw
+    finally:
+        await close_gemini_clients()
+
+    logger.info(
+        f"Gemini per-call overhead over raw HTTP ({raw * 1000:.2f}ms): "
+        f"native {native_overhead * 1000:.2f}ms, ChatGoogleGenerativeAI {legacy_overhead * 1000:.2f}ms"
+    )
+    assert native_overhead < legacy_overhead
@@ -0,0 +1,220 @@
+import asyncio
+import base64
+import os
+import subprocess
+
+import pytest
+
+from src.services.blob_cache import BlobCache
+from src.services.git_mirror import GitMirror, GitMirrorError
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.repo_index import RepoIndexCache
+
+BASE_FILES = {
+    "README.md": "hello\n",
+    "src/app.py": "def main():\n    return 1\n",
+    "src/old_name.py": "value = 42\n" * 5,
+    "src/gone.py": "bye\n",
+    "assets/logo.bin": "\0\1\2",
+}
+HEAD_FILES = {
+    "README.md": "hello\n",
+    "src/app.py": "def main():\n    return 2\n",
+    "src/new_name.py": "value = 42\n" * 5,
+    "src/added.py": "print('new')\n",
+    "assets/logo.bin": "\0\1\2",
+}
+
+_GIT_ENV = {
+    **os.environ,
+    "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@example.com",
+    "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@example.com",
+}
+
+
+class OriginRepo:
+    """A local repository standing in for github.com, including GitHub's refs/pull/N/head refs."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        os.makedirs(self.path)
+        self._git("init", "--quiet", "--initial-branch=main")
+
+    def _git(self, *args):
+        return subprocess.run(
+            ["git", "-C", self.path, *args], check=True, capture_output=True, text=True, env=_GIT_ENV
+        ).stdout.strip()
+
+    def commit(self, files, branch="main"):
+        if subprocess.run(["git", "-C", self.path, "rev-parse", "--verify", "-q", branch], capture_output=True).returncode == 0:
+            self._git("checkout", "--quiet", branch)
+        elif subprocess.run(["git", "-C", self.path, "rev-parse", "--verify", "-q", "HEAD"], capture_output=True).returncode == 0:
+            self._git("checkout", "--quiet", "-b", branch)
+        self._git("rm", "-r", "--quiet", "--ignore-unmatch", ".")
+        for path, content in files.items():
+            full = os.path.join(self.path, path)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+            with open(full, "w", newline="") as f:
+                f.write(content)
+        self._git("add", "-A")
+        self._git("commit", "--quiet", "--allow-empty", "-m", "commit")
+        return self._git("rev-parse", "HEAD")
+
+    def set_pull(self, number, sha):
+        self._git("update-ref", f"refs/pull/{number}/head", sha)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    return OriginRepo(tmp_path / "origin" / "octo" / "repo")
+
+
+@pytest.fixture
+def pull(origin, fake_github):
+    """PR #1 exists both in the origin repository and, as metadata with the same SHAs, on the fake API."""
+    base = origin.commit(BASE_FILES)
+    head = origin.commit(HEAD_FILES, branch="feature")
+    origin.commit({**BASE_FILES, "CHANGELOG.md": "v2\n"}, branch="main")  # later work on main must not show up in the PR diff
+    origin.set_pull(1, head)
+    fake_github.add_commit(BASE_FILES, sha=base, ref="main")
+    fake_github.add_commit(HEAD_FILES, sha=head)
+    fake_github.add_pull(1, base, head)
+    return base, head
+
+
+def _service(fake_github, tmp_path, fetch_mode="mirror", url_template=None):
+    mirror = GitMirror(
+        root_dir=str(tmp_path / "mirrors"),
+        url_template=url_template or str(tmp_path / "origin" / "{owner}" / "{repo}"),
+    )
+    return GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        fetch_mode=fetch_mode,
+        blob_cache=BlobCache(),
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+        repo_index_cache=RepoIndexCache(),
+        git_source=mirror,
+    )
+
+
+def _by_name(info):
+    return {f["filename"]: f for f in info["changed_files"]}
+
+
+@pytest.mark.asyncio
+async def test_mirror_matches_the_rest_api_without_fetching_files_from_it(fake_github, pull, tmp_path):
+    service = _service(fake_github, tmp_path)
+    try:
+        mirrored = await service.get_pr_code_review_info("octo", "repo", 1)
+        mirror_requests = list(fake_github.requests)
+        from_api = await service.get_pr_code_review_info("octo", "repo", 1, fetch_mode="git")
+    finally:
+        await service.close()
+
+    assert mirrored["fetch_status"] == "complete"
+    api_files, mirror_files = _by_name(from_api), _by_name(mirrored)
+    # git detects the rename that the fake API reports as a removal plus an addition
+    renamed = mirror_files.pop("src/new_name.py")
+    assert renamed["status"] == "renamed"
+    assert renamed["original_content"] == renamed["updated_content"] == "value = 42\n" * 5
+    del api_files["src/new_name.py"], api_files["src/old_name.py"]
+    assert mirror_files.keys() == api_files.keys() == {"src/app.py", "src/added.py", "src/gone.py"}
+    for name, api_file in api_files.items():
+        for field in ("status", "original_content", "updated_content"):
+            assert mirror_files[name][field] == api_file[field], (name, field)
+    assert mirror_files["src/app.py"]["diff_info"].startswith("@@ -1,2 +1,2 @@")
+    assert "+    return 2" in mirror_files["src/app.py"]["diff_info"]
+
+    assert mirror_requests == ["/repos/octo/repo/pulls/1"]
+    assert os.path.exists(tmp_path / "mirrors" / "octo" / "repo.git" / "HEAD")
+
+
+@pytest.mark.asyncio
+async def test_pr_update_fetches_incrementally(fake_github, pull, origin, tmp_path):
+    base, _ = pull
+    service = _service(fake_github, tmp_path)
+    try:
+        await service.get_pr_code_review_info("octo", "repo", 1)
+        await service.get_pr_code_review_info("octo", "repo", 1)
+        assert service.git_source.stats()["fetches"] == 1  # commits already present: no fetch
+
+        new_head = origin.commit({**HEAD_FILES, "src/app.py": "def main():\n    return 3\n"}, branch="feature")
+        origin.set_pull(1, new_head)
+        fake_github.add_pull(1, base, new_head)
+        info = await service.get_pr_code_review_info("octo", "repo", 1, only_files={"src/app.py"})
+        comparison = await service.compare_commits("octo", "repo", pull[1], new_head)
+    finally:
+        await service.close()
+
+    assert service.git_source.stats()["fetches"] == 2
+    [app] = info["changed_files"]
+    assert app["updated_content"] == "def main():\n    return 3\n"
+    assert comparison == {"status": "ahead", "files": ["src/app.py"], "truncated": False}
+    assert not [path for path in fake_github.requests if "/compare/" in path]
+
+
+@pytest.mark.asyncio
+async def test_file_list_and_index_come_from_the_mirror(fake_github, pull, tmp_path):
+    service = _service(fake_github, tmp_path)
+    try:
+        files = await service.get_all_files_list("octo", "repo", "feature")
+        index = await service.get_repo_index("octo", "repo", pull[1])
+    finally:
+        await service.close()
+
+    assert files == sorted(HEAD_FILES)
+    assert index.directory_summary("src")["total_files"] == 3
+    assert fake_github.requests == []
+
+
+@pytest.mark.asyncio
+async def test_unreachable_mirror_falls_back_to_the_rest_api(fake_github, pull, tmp_path):
+    service = _service(fake_github, tmp_path, url_template=str(tmp_path / "missing" / "{repo}"))
+    try:
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+        files = await service.get_all_files_list("octo", "repo", "main")
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "complete"
+    assert _by_name(info)["src/app.py"]["updated_content"] == HEAD_FILES["src/app.py"]
+    assert files == sorted(BASE_FILES)
+    assert any("/pulls/1/files" in path for path in fake_github.requests)
+
+
+@pytest.mark.asyncio
+async def test_invalid_repository_names_are_rejected(tmp_path):
+    mirror = GitMirror(root_dir=str(tmp_path))
+    with pytest.raises(GitMirrorError, match="Invalid repository name"):
+        await mirror.resolve_tree("..", "repo", "main")
+
+
+@pytest.mark.asyncio
+async def test_token_is_passed_through_the_environment(pull, tmp_path, monkeypatch):
+    base, head = pull
+    spawned = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def recording_exec(*args, **kwargs):
+        spawned.append((args, kwargs["env"]))
+        return await create_subprocess_exec(*args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", recording_exec)
+    mirror = GitMirror(
+        root_dir=str(tmp_path / "mirrors"),
+        url_template=str(tmp_path / "origin" / "{owner}" / "{repo}"),
+        token="secret-token",
+    )
+    await mirror.ensure_pull("octo", "repo", 1, base, head)
+    await mirror.resolve_tree("octo", "repo", head)
+
+    credentials = base64.b64encode(b"x-access-token:secret-token").decode()
+    fetches = [env for args, env in spawned if "fetch" in args]
+    assert fetches and all(env["GIT_CONFIG_VALUE_0"] == f"Authorization: Basic {credentials}" for env in fetches)
+    assert all(env["GIT_CONFIG_KEY_0"] == "http.extraHeader" for env in fetches)
+    # Never on the command line, and only handed to commands that talk to the remote
+    assert not any(credentials in arg for args, _ in spawned for arg in args)
+    assert all("GIT_CONFIG_VALUE_0" not in env for args, env in spawned if "fetch" not in args)
+    assert "secret-token" not in open(os.path.join(mirror.repo_dir("octo", "repo"), "config")).read()
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+from loguru import logger
+
+from src.services.blob_cache import BlobCache
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+
+
+def _service(fake, fetch_mode):
+    return GitHubService(
+        _token="t",
+        base_url=fake.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode=fetch_mode,
+        scheduler=GitHubRequestScheduler(max_in_flight=10, requests_per_second=100_000, burst=100_000),
+    )
+
+
+def _seed_large_pr(fake, file_count: int) -> None:
+    base_files = {f"pkg/mod_{i}.py": f"value = {i}\n" for i in range(file_count)}
+    head_files = {path: content.replace("value", "VALUE") for path, content in base_files.items()}
+    # Identical content across files and across base/head should only be fetched once.
+    head_files["pkg/license_a.txt"] = "MIT\n"
+    head_files["pkg/license_b.txt"] = "MIT\n"
+    base_files["pkg/moved.py"] = "shared\n"
+    head_files["pkg/unchanged_copy.py"] = "shared\n"
+    base = fake.add_commit(base_files)
+    head = fake.add_commit(head_files)
+    fake.add_pull(7, base, head)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetch_mode", ["git", "graphql"])
+async def test_blob_modes_match_contents_mode(fake_github, fetch_mode):
+    _seed_large_pr(fake_github, 5)
+
+    reference_service = _service(fake_github, "contents")
+    blob_service = _service(fake_github, fetch_mode)
+    try:
+        expected = await reference_service.get_pr_code_review_info("octo", "repo", 7)
+        fake_github.requests.clear()
+        actual = await blob_service.get_pr_code_review_info("octo", "repo", 7)
+    finally:
+        await reference_service.close()
+        await blob_service.close()
+
+    assert actual == expected
+    assert not [p for p in fake_github.requests if "/contents/" in p]
+    if fetch_mode == "git":
+        blob_requests = [p for p in fake_github.requests if "/git/blobs/" in p]
+        # 5 base + 5 head versions, "MIT\n" once, "shared\n" once.
+        assert len(blob_requests) == 12
+    else:
+        assert fake_github.requests.count("/graphql") == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_fetch_mode_is_rejected(fake_github):
+    service = _service(fake_github, "contents")
+    with pytest.raises(ValueError):
+        await service.get_pr_code_review_info("octo", "repo", 1, fetch_mode="svn")
+
+
+@pytest.mark.asyncio
+async def test_benchmark_fetch_modes_on_large_pr(fake_github):
+    """
+    Benchmark: a synthetic 300-file PR fetched with each mode against a stub with 2ms latency.
+    Round-trips are asserted, wall-clock time is printed.
+    """
+    _seed_large_pr(fake_github, 300)
+    fake_github.latency = 0.002
+
+    report = {}
+    for fetch_mode in GitHubService.FETCH_MODES:
+        service = _service(fake_github, fetch_mode)
+        fake_github.requests.clear()
+        started = time.perf_counter()
+        info = await service.get_pr_code_review_info("octo", "repo", 7, fetch_mode=fetch_mode)
+        elapsed = time.perf_counter() - started
+        await service.close()
+        assert len(info["changed_files"]) == 304
+        report[fetch_mode] = (len(fake_github.requests), elapsed)
+        logger.info(f"fetch_mode={fetch_mode}: {len(fake_github.requests)} requests, {elapsed * 1000:.0f} ms")
+
+    # PR + 4 pages of files (100 per page), then 300 modified files x2, 3 added files, 1 removed file.
+    assert report["contents"][0] == 1 + 4 + 300 * 2 + 3 + 1
+    # PR + 4 pages + two trees, then 602 unique blobs (the duplicated contents are fetched once).
+    assert report["git"][0] == 1 + 4 + 2 + 602
+    # PR + 4 pages + two trees, then one GraphQL query per 100 new blobs of each page (2 + 2 + 2 + 1).
+    assert report["graphql"][0] == 1 + 4 + 2 + 7
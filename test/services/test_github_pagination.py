@@ -0,0 +1,85 @@
+import pytest
+
+from src.services.blob_cache import BlobCache
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+
+
+def _service(fake, fetch_mode="contents"):
+    return GitHubService(
+        _token="t",
+        base_url=fake.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode=fetch_mode,
+        scheduler=GitHubRequestScheduler(max_in_flight=10, requests_per_second=100_000, burst=100_000),
+    )
+
+
+def _seed_wide_pr(fake, file_count: int) -> None:
+    base = fake.add_commit({f"src/f{i:03}.py": f"a = {i}\n" for i in range(file_count)})
+    head = fake.add_commit({f"src/f{i:03}.py": f"b = {i}\n" for i in range(file_count)})
+    fake.add_pull(1, base, head)
+
+
+@pytest.mark.asyncio
+async def test_pull_request_listing_follows_link_headers(fake_github):
+    commit = fake_github.add_commit({"a.py": "x\n"})
+    for number in range(1, 251):
+        fake_github.add_pull(number, commit, commit)
+
+    service = _service(fake_github)
+    try:
+        prs = await service.get_pull_requests("octo", "repo")
+    finally:
+        await service.close()
+
+    assert [pr["number"] for pr in prs] == list(range(1, 251))
+    page_requests = [p for p in fake_github.requests if p.startswith("/repos/octo/repo/pulls")]
+    assert len(page_requests) == 3
+    assert all("per_page=100" in p for p in page_requests)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetch_mode", ["contents", "git", "graphql"])
+async def test_large_pr_is_not_truncated(fake_github, fetch_mode):
+    _seed_wide_pr(fake_github, 250)
+    service = _service(fake_github, fetch_mode)
+    try:
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "complete"
+    assert [f["filename"] for f in info["changed_files"]] == [f"src/f{i:03}.py" for i in range(250)]
+    assert info["changed_files"][-1]["updated_content"] == "b = 249\n"
+
+
+@pytest.mark.asyncio
+async def test_contents_are_fetched_before_the_file_list_completes(fake_github):
+    _seed_wide_pr(fake_github, 250)
+    fake_github.latency = 0.02
+    service = _service(fake_github)
+    try:
+        streamed = [f async for f in service.iter_pr_code_review_files("octo", "repo", 1)]
+    finally:
+        await service.close()
+
+    assert len(streamed) == 250
+    last_page = next(i for i, p in enumerate(fake_github.requests) if "/files" in p and "page=3" in p)
+    first_content = next(i for i, p in enumerate(fake_github.requests) if "/contents/" in p)
+    assert first_content < last_page
+
+
+@pytest.mark.asyncio
+async def test_stopping_early_cancels_outstanding_work(fake_github):
+    _seed_wide_pr(fake_github, 250)
+    service = _service(fake_github, "git")
+    try:
+        files = service.iter_pr_code_review_files("octo", "repo", 1)
+        first = await files.__anext__()
+        await files.aclose()
+    finally:
+        await service.close()
+
+    assert first["filename"] == "src/f000.py"
+    assert service.scheduler.in_flight == 0
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from src.services.blob_cache import BlobCache
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+
+
+def _service(fake, fetch_mode="contents", **scheduler_options):
+    options = {"backoff_base": 0.01, "backoff_max": 0.05, **scheduler_options}
+    return GitHubService(
+        _token="t",
+        base_url=fake.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode=fetch_mode,
+        scheduler=GitHubRequestScheduler(**options),
+    )
+
+
+def _seed_pr(fake, file_count: int = 3):
+    base = fake.add_commit({f"f{i}.py": f"a = {i}\n" for i in range(file_count)}, ref="main")
+    head = fake.add_commit({f"f{i}.py": f"b = {i}\n" for i in range(file_count)})
+    fake.add_pull(1, base, head)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_requests_are_capped(fake_github):
+    _seed_pr(fake_github, 40)
+    fake_github.latency = 0.01
+    service = _service(fake_github, max_in_flight=4, requests_per_second=10_000, burst=10_000)
+    try:
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "complete"
+    assert fake_github.max_in_flight <= 4
+    assert service.scheduler.max_in_flight_seen == 4
+
+
+@pytest.mark.asyncio
+async def test_retry_after_is_honoured(fake_github):
+    _seed_pr(fake_github)
+    fake_github.add_fault("/pulls/1/files", 403, headers={"Retry-After": "0.1"})
+    fake_github.add_fault("/contents/f0.py", 502)
+    service = _service(fake_github)
+    try:
+        started = time.perf_counter()
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+        elapsed = time.perf_counter() - started
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "complete"
+    assert info["changed_files"][0]["updated_content"] == "b = 0\n"
+    assert service.scheduler.retries == 2
+    assert service.scheduler.rate_limit_pauses == 1
+    assert elapsed >= 0.1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fetch_mode", ["contents", "git"])
+async def test_persistent_failures_are_reported_not_swallowed(fake_github, fetch_mode):
+    _seed_pr(fake_github)
+    blob_or_path = "/contents/f1.py" if fetch_mode == "contents" else "/git/blobs/"
+    fake_github.add_fault(blob_or_path, 500, times=100)
+    service = _service(fake_github, fetch_mode=fetch_mode, max_retries=2)
+    try:
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "partial"
+    assert "f1.py" in info["failed_files"]
+    failed = next(f for f in info["changed_files"] if f["filename"] == "f1.py")
+    assert "500" in failed["fetch_error"]
+    assert failed["original_content"] == "" and failed["updated_content"] == ""
+    assert service.scheduler.failures >= 1
+
+
+@pytest.mark.asyncio
+async def test_pr_level_failure_is_reported(fake_github):
+    _seed_pr(fake_github)
+    fake_github.add_fault("/pulls/1", 404, times=10)
+    service = _service(fake_github)
+    try:
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+    finally:
+        await service.close()
+
+    assert info["fetch_status"] == "failed"
+    assert info["changed_files"] == []
+    assert service.scheduler.retries == 0  # 404 is not retryable
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests(fake_github):
+    _seed_pr(fake_github)
+    service = _service(fake_github, requests_per_second=50, burst=1)
+    try:
+        started = time.perf_counter()
+        for _ in range(10):
+            await service.get_all_files_list("octo", "repo")
+        elapsed = time.perf_counter() - started
+    finally:
+        await service.close()
+
+    # The first request spends the single burst token, the other nine wait 20ms each.
+    assert elapsed >= 0.17
@@ -0,0 +1,142 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+from loguru import logger
+
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.loop_runner import LoopRunner
+
+
+def _unthrottled_scheduler(max_in_flight: int = 20) -> GitHubRequestScheduler:
+    return GitHubRequestScheduler(max_in_flight=max_in_flight, requests_per_second=100_000, burst=100_000)
+
+
+def _seed_repo(fake):
+    base = fake.add_commit({"README.md": "hello\n", "app.py": "print(1)\n", "old.txt": "bye\n"}, ref="main")
+    head = fake.add_commit({"README.md": "hello\n", "app.py": "print(2)\n", "new.txt": "hi\n"})
+    fake.add_pull(1, base, head, title="Bump print")
+    fake.add_pull(2, base, base, title="Closed one", state="closed")
+    return base, head
+
+
+@pytest.mark.asyncio
+async def test_pooled_service_against_stub(fake_github):
+    _seed_repo(fake_github)
+    service = GitHubService(
+        _token="test-token", base_url=fake_github.base_url, fetch_mode="contents", scheduler=_unthrottled_scheduler(4)
+    )
+    await service.start()
+    try:
+        prs = await service.get_pull_requests("octo", "repo", state="all")
+        assert {pr["number"] for pr in prs} == {1, 2}
+
+        files = await service.get_all_files_list("octo", "repo", branch="main")
+        assert files == ["README.md", "app.py", "old.txt"]
+
+        info = await service.get_pr_code_review_info("octo", "repo", 1)
+        by_name = {f["filename"]: f for f in info["changed_files"]}
+        assert by_name["app.py"]["original_content"] == "print(1)\n"
+        assert by_name["app.py"]["updated_content"] == "print(2)\n"
+        assert by_name["new.txt"]["original_content"] == ""
+        assert by_name["old.txt"]["updated_content"] == ""
+    finally:
+        await service.close()
+
+    # Every call rides the same few keep-alive connections, never more than the in-flight cap.
+    assert len(fake_github.connections) <= 4
+
+
+@pytest.mark.asyncio
+async def test_session_is_recreated_lazily_after_close(fake_github):
+    _seed_repo(fake_github)
+    service = GitHubService(_token="test-token", base_url=fake_github.base_url)
+
+    assert await service.get_all_files_list("octo", "repo") != []
+    first_session = service._sessions.current()
+    await service.close()
+    assert service._sessions.current() is None and first_session.closed
+
+    assert await service.get_all_files_list("octo", "repo") != []
+    assert service._sessions.current() is not first_session
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_service_and_background_loops_keep_their_own_sessions(fake_github):
+    _seed_repo(fake_github)
+    runner = LoopRunner()
+    service = GitHubService(_token="test-token", base_url=fake_github.base_url)
+
+    async def session_in_use():
+        await service.get_all_files_list("octo", "repo")
+        return service._sessions.current()
+
+    try:
+        here = [await session_in_use() for _ in range(2)]
+        background = [await asyncio.wrap_future(runner.submit(session_in_use())) for _ in range(2)]
+        here.append(await session_in_use())
+
+        # Alternating loops no longer rebuilds the pool: one session per loop, both alive.
+        assert here[0] is here[1] is here[2] and background[0] is background[1]
+        assert here[0] is not background[0]
+        assert len(service._sessions) == 2
+    finally:
+        await service.close()
+        runner.close()
+
+    assert here[0].closed and background[0].closed
+
+
+async def _drive(fake, fetch, total: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await fetch()
+            latencies.append(time.perf_counter() - started)
+
+    fake.connections.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "connections": len(fake.connections),
+    }
+
+
+@pytest.mark.asyncio
+async def test_benchmark_pooled_vs_per_call_session(fake_github):
+    """
+    Benchmark: one ClientSession per call (the previous behaviour) vs the shared pool.
+    Timing numbers are printed for comparison; only connection reuse is asserted.
+    """
+    _seed_repo(fake_github)
+    service = GitHubService(_token="test-token", base_url=fake_github.base_url, scheduler=_unthrottled_scheduler())
+    url = f"{fake_github.base_url}/repos/octo/repo/git/trees/main?recursive=1"
+    total, concurrency = 400, 20
+
+    async def per_call_session():
+        async with aiohttp.ClientSession(headers=service.headers) as session:
+            async with session.get(url) as response:
+                await response.json()
+
+    await service.start()
+    try:
+        before = await _drive(fake_github, per_call_session, total, concurrency)
+        after = await _drive(fake_github, lambda: service.get_all_files_list("octo", "repo"), total, concurrency)
+    finally:
+        await service.close()
+
+    logger.info(f"per-call session: {before['rps']:.0f} req/s, p99 {before['p99_ms']:.1f} ms, {before['connections']} connections")
+    logger.info(f"pooled session:   {after['rps']:.0f} req/s, p99 {after['p99_ms']:.1f} ms, {after['connections']} connections")
+
+    assert before["connections"] == total
+    assert after["connections"] <= concurrency
@@ -0,0 +1,90 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from loguru import logger
+
+from src.llm.registry import LLMRegistry
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_components_are_built_once_per_name_across_threads():
+    registry = LLMRegistry()
+    calls = []
+
+    def build():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return object()
+
+    registry.register("service", build)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        built = list(pool.map(lambda _: registry.get("service"), range(8)))
+
+    assert len(calls) == 1
+    assert all(b is built[0] for b in built)
+    assert registry.peek("service") is built[0]
+    assert "component:service" in registry.stats()["timings"]
+
+
+def test_llms_are_cached_per_provider_and_model(monkeypatch):
+    import src.llm.factory as factory
+
+    created = []
+    monkeypatch.setattr(factory, "create_llm", lambda provider, model: created.append((provider, model)) or object())
+    registry = LLMRegistry()
+
+    first = registry.get_llm("gemini")
+    assert registry.get_llm("gemini") is first
+    assert registry.get_llm("gemini", "gemini-2.5-flash") is not first
+    registry.get_llm("deepseek")
+    assert created == [("gemini", None), ("gemini", "gemini-2.5-flash"), ("deepseek", None)]
+    assert registry.stats()["llms"] == ["gemini/default", "gemini/gemini-2.5-flash", "deepseek/default"]
+
+
+@pytest.mark.asyncio
+async def test_warmup_reports_failures_and_retries_on_next_use():
+    registry = LLMRegistry()
+    attempts = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found")
+        return "service"
+
+    registry.register("ok", lambda: "ok")
+    registry.register("flaky", build)
+
+    assert await registry.warmup() == {"ok": None, "flaky": "GEMINI_API_KEY or GOOGLE_API_KEY not found"}
+    assert registry.peek("flaky") is None
+    assert registry.stats()["errors"] == {"component:flaky": "GEMINI_API_KEY or GOOGLE_API_KEY not found"}
+    assert registry.get("flaky") == "service"
+    assert registry.stats()["errors"] == {}
+
+
+def test_server_import_is_lazy_and_works_without_llm_keys():
+    """`python -X importtime -c "import server"`: no LLM SDK or agent graph is loaded at import time."""
+    env = {k: v for k, v in os.environ.items() if k not in ("GEMINI_API_KEY", "GOOGLE_API_KEY", "DEEPSEEK_API_KEY")}
+    env["APP_ENVIRONMENT"] = "local"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    # Each line: "import time: <self us> | <cumulative us> | <indented module name>"
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+        if match:
+            cumulative[match.group(2)] = int(match.group(1))
+    for heavy in ("langchain_google_genai", "langchain_openai", "langchain.agents", "langgraph"):
+        assert heavy not in cumulative, f"{heavy} is imported when the server module is imported"
+    logger.info(f"import server: {cumulative['server'] / 1e6:.3f}s cumulative")
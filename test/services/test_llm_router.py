@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.llm.router import RoutingChatModel, is_retryable
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeProvider(BaseChatModel):
+    """Answers with its own name after `latency` seconds, or raises `error`."""
+    name: str
+    latency: float = 0.0
+    error: Any = None
+    calls: int = 0
+    cancelled: int = 0
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.name))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.name))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        for part in (self.name, "!"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=part))
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[getattr(t, "name", t) for t in tools])
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake_provider"
+
+
+def _router(*providers, **kwargs):
+    return RoutingChatModel(providers={p.name: p for p in providers}, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_calls_go_to_the_fastest_provider():
+    slow, fast = FakeProvider(name="slow", latency=0.05), FakeProvider(name="fast", latency=0.005)
+    router = _router(slow, fast, hedge_percentile=None)
+
+    answers = [(await router.ainvoke("hi")).content for _ in range(10)]
+
+    # Each provider is tried once to get a latency sample, then the fast one wins.
+    assert answers[:2] == ["slow", "fast"]
+    assert answers[2:] == ["fast"] * 8
+    stats = router.routing_stats()
+    assert stats["ranking"] == ["fast", "slow"]
+    assert stats["providers"]["fast"]["calls"] == 9
+    assert stats["providers"]["fast"]["latency_histogram"]["0.25"] == 9
+    assert stats["decisions"] == {"slow:fastest": 1, "fast:fastest": 9}
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_provider_fails_over_and_cools_down():
+    limited = FakeProvider(name="gemini", error=StatusError(429))
+    backup = FakeProvider(name="deepseek")
+    router = _router(limited, backup, cooldown=60)
+
+    assert (await router.ainvoke("hi")).content == "deepseek"
+    assert (await router.ainvoke("hi")).content == "deepseek"
+
+    # The second call skips the provider in cooldown.
+    assert limited.calls == 1
+    stats = router.routing_stats()
+    assert stats["providers"]["gemini"]["in_cooldown"] is True
+    assert stats["providers"]["gemini"]["error_rate"] == 1.0
+    assert [d["reason"] for d in stats["recent_decisions"]] == ["fastest", "failover", "fastest"]
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried_on_another_provider():
+    bad_request = FakeProvider(name="gemini", error=StatusError(400))
+    backup = FakeProvider(name="deepseek")
+    router = _router(bad_request, backup)
+
+    with pytest.raises(StatusError):
+        await router.ainvoke("hi")
+    assert backup.calls == 0
+    assert not is_retryable(StatusError(400))
+    assert is_retryable(RuntimeError("503 Service Unavailable"))
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_after_the_latency_percentile():
+    primary, secondary = FakeProvider(name="primary", latency=0.01), FakeProvider(name="secondary", latency=0.01)
+    router = _router(primary, secondary, min_samples=3, hedge_percentile=95)
+    for _ in range(3):
+        router.health.record_success("primary", 0.01)
+    router.health.record_success("secondary", 0.02)
+
+    primary.latency = 5
+    start = time.perf_counter()
+    answer = await router.ainvoke("hi")
+    elapsed = time.perf_counter() - start
+
+    assert answer.content == "secondary"
+    assert elapsed < 1
+    # The losing request is cancelled rather than left running.
+    assert primary.cancelled == 1
+    assert router.routing_stats()["decisions"] == {"primary:fastest": 1, "secondary:hedge": 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_fails_over_before_the_first_chunk():
+    router = _router(FakeProvider(name="gemini", error=StatusError(503)), FakeProvider(name="deepseek"))
+
+    chunks = [chunk.content async for chunk in router.astream("hi")]
+
+    assert "".join(chunks) == "deepseek!"
+    assert router.invoke("hi").content == "deepseek"
+
+
+@pytest.mark.asyncio
+async def test_stream_first_chunk_times_do_not_lower_the_hedge_delay():
+    provider = FakeProvider(name="gemini", latency=0.05)
+    router = _router(provider, FakeProvider(name="deepseek"), min_samples=3)
+    router.health.record_success("deepseek", 10.0)  # keep traffic on gemini
+    for _ in range(3):
+        await router.ainvoke("hi")
+    hedge_delay = router._hedge_delay("gemini")
+
+    for _ in range(20):
+        assert "".join([chunk.content async for chunk in router.astream("hi")]) == "gemini!"
+
+    assert router._hedge_delay("gemini") == hedge_delay >= 0.05
+    gemini = router.routing_stats()["providers"]["gemini"]
+    assert gemini["calls"] == 23
+    assert gemini["first_chunk_p95_seconds"] < 0.05 <= gemini["p95_seconds"]
+
+
+def test_bound_tools_share_health_with_the_router():
+    router = _router(FakeProvider(name="gemini"), FakeProvider(name="deepseek"))
+
+    bound = router.bind_tools(["get_pr_code_review_context"])
+
+    assert bound.health is router.health
+    assert set(bound.bound) == {"gemini", "deepseek"}
+    assert bound.invoke("hi").content == "gemini"
+    assert router.routing_stats()["providers"]["gemini"]["calls"] == 1
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+
+from loguru import logger
+
+from src.configs.log_config import AsyncLogSink, LogFilter, gcp_formatter
+
+
+class SlowStream:
+    """A stdout stand-in where every write costs `delay` seconds (e.g. a congested log pipe)."""
+
+    def __init__(self, delay=0.0, gate=None):
+        self.delay = delay
+        self.gate = gate
+        self.chunks = []
+
+    def write(self, text):
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.delay)
+        self.chunks.append(text)
+
+    def flush(self):
+        pass
+
+    @property
+    def lines(self):
+        return "".join(self.chunks).splitlines()
+
+
+def _record(name="src.services.github_service", level="INFO", message="hello", function="f", line=1):
+    return {
+        "name": name, "level": logger.level(level), "message": message,
+        "function": function, "line": line, "extra": {},
+    }
+
+
+def _log_per_request(sink, records_per_request=10, requests=20):
+    handler = logger.add(sink, format="{message}", filter=lambda r: r["extra"].get("bench"))
+    bench = logger.bind(bench=True)
+    try:
+        start = time.perf_counter()
+        for request in range(requests):
+            for i in range(records_per_request):
+                bench.info(f"request {request} step {i}")
+        return (time.perf_counter() - start) / requests
+    finally:
+        logger.remove(handler)
+
+
+def test_async_sink_keeps_slow_writes_off_the_caller():
+    sync_stream, async_stream = SlowStream(delay=0.001), SlowStream(delay=0.001)
+
+    sync_per_request = _log_per_request(sync_stream)
+    async_per_request = _log_per_request(AsyncLogSink(async_stream))
+
+    logger.info(
+        f"logging overhead per request (10 records): sync {sync_per_request * 1e3:.2f}ms, "
+        f"async {async_per_request * 1e3:.3f}ms ({sync_per_request / async_per_request:.0f}x)"
+    )
+    assert sync_per_request >= 0.01
+    # The caller no longer pays for the slow writes: at least 5x cheaper per request.
+    assert sync_per_request / async_per_request > 5
+    # Removing the handler drained the queue: nothing was lost.
+    assert len(async_stream.lines) == len(sync_stream.lines) == 200
+
+
+def test_full_buffer_drops_records_and_reports_how_many():
+    gate = threading.Event()
+    stream = SlowStream(gate=gate)
+    sink = AsyncLogSink(stream, max_queue=3)
+    for i in range(10):
+        sink.write(f"line {i}\n")
+    gate.set()
+    sink.stop()
+
+    assert 3 <= len([line for line in stream.lines if line.startswith("line")]) <= 4
+    assert stream.lines[-1].startswith("[log buffer full, dropped ")
+    assert sink.dropped == 0
+
+
+def test_filter_applies_per_module_levels():
+    log_filter = LogFilter("INFO", {"src.llm": "WARNING", "src.llm.router": "DEBUG"}, 0, 1.0, 0)
+
+    assert log_filter(_record(name="src.services.github_service", level="INFO"))
+    assert not log_filter(_record(name="src.services.github_service", level="DEBUG"))
+    assert not log_filter(_record(name="src.llm.custom_gemini", level="INFO"))
+    assert log_filter(_record(name="src.llm.router", level="DEBUG"))
+    assert not log_filter(_record(name="src.llmx", level="DEBUG"))
+
+
+def test_filter_truncates_long_messages():
+    log_filter = LogFilter("DEBUG", {}, 10, 1.0, 0)
+    record = _record(message="x" * 25)
+
+    assert log_filter(record)
+    assert record["message"] == "x" * 10 + "... [truncated 15 chars]"
+
+
+def test_filter_samples_noisy_call_sites_but_never_warnings():
+    log_filter = LogFilter("DEBUG", {}, 0, 0.05, 3)
+
+    passed = [log_filter(_record(line=7)) for _ in range(10)]
+    warnings = [log_filter(_record(line=7, level="WARNING")) for _ in range(5)]
+    other_site = log_filter(_record(line=8))
+    time.sleep(0.06)
+    next_window = _record(line=7)
+
+    assert passed == [True] * 3 + [False] * 7
+    assert all(warnings) and other_site
+    assert log_filter(next_window)
+    assert next_window["message"] == "hello [7 similar messages sampled out]"
+
+
+def test_gcp_formatter_emits_one_json_object_per_line():
+    handler_stream = SlowStream()
+    handler = logger.add(handler_stream, format=gcp_formatter, filter=lambda r: r["extra"].get("gcp"))
+    try:
+        logger.bind(gcp=True).warning('quote " and newline\n inside')
+    finally:
+        logger.remove(handler)
+
+    [line] = handler_stream.lines
+    entry = json.loads(line)
+    assert entry["severity"] == "WARNING"
+    assert entry["message"] == 'quote " and newline\n inside'
+    assert entry["logging.googleapis.com/sourceLocation"]["function"] == "test_gcp_formatter_emits_one_json_object_per_line"
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_classic.agents import AgentType, initialize_agent
+from langchain_core.language_models.fake import FakeListLLM
+
+import src.tools.github_tools as github_tools
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.loop_runner import LoopRunner
+
+
+def _action(name, action_input):
+    return f"Action:\n```json\n{json.dumps({'action': name, 'action_input': action_input})}\n```"
+
+
+def _legacy_agent():
+    """The create_github_agent setup with a scripted LLM: list the files, then answer."""
+    llm = FakeListLLM(responses=[
+        _action("list_repository_files", {"repo_owner": "octo", "repo_name": "repo", "branch": "main"}),
+        _action("Final Answer", "done"),
+    ])
+    return initialize_agent(
+        tools=[github_tools.ListRepoFilesTool()],
+        llm=llm,
+        agent=AgentType.STRUCTURED_CHAT_ZERO_SHOT_REACT_DESCRIPTION,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+    )
+
+
+@pytest.fixture
+def github(fake_github, monkeypatch):
+    fake_github.add_commit({"a.py": "a\n", "src/b.py": "b\n"}, ref="main")
+    service = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        pool_options={"limit": 8, "limit_per_host": 8},
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    monkeypatch.setattr(github_tools, "github_service", service)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_sync_agents_in_a_thread_pool_reuse_the_service_loop_and_pool(fake_github, github, monkeypatch):
+    runner = LoopRunner()
+    runner.attach()
+    monkeypatch.setattr(github_tools, "loop_runner", runner)
+    loop = asyncio.get_running_loop()
+    tool_threads = set()
+    original_arun = github_tools.ListRepoFilesTool._arun
+
+    async def arun(self, *args, **kwargs):
+        tool_threads.add(threading.get_ident())
+        return await original_arun(self, *args, **kwargs)
+
+    monkeypatch.setattr(github_tools.ListRepoFilesTool, "_arun", arun)
+
+    # The service loop must stay responsive while worker threads wait on tool results.
+    max_gap = 0.0
+
+    async def heartbeat():
+        nonlocal max_gap
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_gap = max(max_gap, time.perf_counter() - before - 0.005)
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = await asyncio.gather(*(
+                loop.run_in_executor(pool, lambda: _legacy_agent().invoke({"input": "list the files"}))
+                for _ in range(48)
+            ))
+    finally:
+        beat.cancel()
+        await github.close()
+        runner.close()
+
+    assert all(result["output"] == "done" for result in results)
+    assert all(result["intermediate_steps"][0][1] == ["a.py", "src/b.py"] for result in results)
+    # Every tool coroutine ran on the service loop, through one pooled session.
+    assert tool_threads == {threading.get_ident()}
+    assert len(fake_github.connections) <= 8
+    assert max_gap < 0.1
+
+
+@pytest.mark.asyncio
+async def test_call_from_inside_a_running_loop_goes_to_the_background_loop():
+    runner = LoopRunner()
+    runner.attach()  # submitting to our own loop would deadlock
+
+    async def where():
+        return threading.get_ident(), asyncio.get_running_loop()
+
+    try:
+        thread_id, loop = runner.run(where())
+        assert thread_id != threading.get_ident()
+        assert loop is runner._background_loop
+        assert runner.run(where())[1] is loop
+    finally:
+        runner.close()
+    assert runner._background_loop is None and loop.is_closed()
+
+
+def test_timed_out_call_is_cancelled():
+    runner = LoopRunner()
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    try:
+        with pytest.raises(TimeoutError):
+            runner.run(slow(), timeout=0.05)
+        assert cancelled.wait(1)
+    finally:
+        runner.close()
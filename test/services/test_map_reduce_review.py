@@ -0,0 +1,117 @@
+import asyncio
+import re
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from src.services.blob_cache import BlobCache
+from src.services.code_review_service import CodeReviewService
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.map_reduce_review import MapReduceReviewer, build_chunks, split_hunks
+from src.services.review_report import parse_review_report, render_review_report
+from src.services.review_state_store import ReviewStateStore
+
+LLM_LATENCY = 0.1
+
+
+class FakeFileReviewer:
+    """Stands in for the per-file LLM chain: sleeps, then reports one finding for the file it was shown."""
+
+    def __init__(self, fail_on: str = None):
+        self.fail_on = fail_on
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _review(self, inputs):
+        filename = re.search(r"^File: (\S+)", inputs["file_context"]).group(1)
+        self.calls.append(filename)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(LLM_LATENCY)
+        finally:
+            self.in_flight -= 1
+        if filename == self.fail_on:
+            raise RuntimeError("model overloaded")
+        finding = {"filename": filename, "line_number": "1", "issue": "issue", "suggestion": "fix"}
+        return AIMessage(content=render_review_report(f"Changes {filename}.", [finding]))
+
+    def runnable(self):
+        return RunnableLambda(self._review)
+
+
+def _service(fake):
+    return GitHubService(
+        _token="t",
+        base_url=fake.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode="git",
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+
+
+def _seed(fake, n_files):
+    base = fake.add_commit({f"f{i:02}.py": "x = 1\n" for i in range(n_files)}, ref="main")
+    head = fake.add_commit({f"f{i:02}.py": "x = 2\n" for i in range(n_files)})
+    fake.add_pull(1, base, head)
+
+
+@pytest.mark.asyncio
+async def test_wall_clock_follows_the_slowest_chunk(fake_github):
+    _seed(fake_github, 50)
+    service = _service(fake_github)
+    reviewer = FakeFileReviewer()
+    map_reduce = MapReduceReviewer(reviewer.runnable(), service, max_concurrency=50)
+    try:
+        start = time.perf_counter()
+        report = await map_reduce.review("octo", "repo", 1)
+        elapsed = time.perf_counter() - start
+    finally:
+        await service.close()
+
+    summary, findings = parse_review_report(report)
+    assert [f["filename"] for f in findings] == [f"f{i:02}.py" for i in range(50)]
+    assert summary.startswith("Reviewed 50 file(s) in 50 chunk(s); 50 finding(s).")
+    # Sequential calls would take 50 * LLM_LATENCY = 5s.
+    assert elapsed < 10 * LLM_LATENCY
+    assert reviewer.max_in_flight == 50
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_and_failures_are_reported(fake_github):
+    _seed(fake_github, 6)
+    service = _service(fake_github)
+    reviewer = FakeFileReviewer(fail_on="f03.py")
+    review = CodeReviewService(
+        None, github=service, state_store=ReviewStateStore(), incremental=False, result_cache=None,
+        file_reviewer=reviewer.runnable(), mode="map_reduce",
+    )
+    review.map_reduce.max_concurrency = 2
+    try:
+        report = await review.perform_code_review("https://github.com/octo/repo/pull/1")
+    finally:
+        await service.close()
+
+    summary, findings = parse_review_report(report)
+    assert reviewer.max_in_flight == 2
+    assert "f03.py" not in [f["filename"] for f in findings]
+    assert "Not reviewed (LLM call failed): f03.py." in summary
+
+
+def test_large_files_are_split_into_hunk_groups():
+    patch = "".join(f"@@ -{i},1 +{i},1 @@\n-old {i}\n+new {i}\n" for i in range(1, 41, 10))
+    assert len(split_hunks(patch)) == 4
+    file_info = {
+        "filename": "big.py", "status": "modified", "diff_info": patch,
+        "original_content": "o" * 1000, "updated_content": "u" * 1000,
+    }
+    assert len(build_chunks(file_info, max_chunk_chars=5000)) == 1
+
+    chunks = build_chunks(file_info, max_chunk_chars=60)
+    assert len(chunks) == 4
+    assert all(chunk.startswith("File: big.py") and "u" * 1000 not in chunk for chunk in chunks)
+    assert "".join(re.search(r"```diff\n(.*)\n```", c, re.S).group(1) for c in chunks) == patch
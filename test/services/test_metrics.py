@@ -0,0 +1,104 @@
+import time
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from loguru import logger
+
+from src.llm.custom_gemini import CustomGeminiChatModel
+from src.llm.gemini_native import close_gemini_clients
+from src.llm.instrumentation import LLMMetricsHandler
+from src.routers.metrics import MetricsMiddleware
+from src.services.blob_cache import BlobCache
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.metrics import GITHUB_CALL_SECONDS, HTTP_REQUEST_SECONDS, LLM_TOKENS_TOTAL, MetricsRegistry
+
+
+def test_histogram_renders_cumulative_buckets_and_escaped_labels():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ["route"], buckets=(0.1, 1.0))
+    child = histogram.labels('/a"b')
+    for value in (0.05, 0.1, 0.5, 2.0):
+        child.observe(value)
+    registry.counter("demo_total", "Demo.").inc(3)
+
+    lines = registry.render().splitlines()
+
+    assert 'demo_seconds_bucket{route="/a\\"b",le="0.1"} 2' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{route="/a\\"b"} 4' in lines
+    assert "# TYPE demo_total counter" in lines and "demo_total 3" in lines
+
+
+def test_observe_is_cheap_and_does_not_allocate():
+    child = MetricsRegistry().histogram("bench_seconds", "Bench.", ["operation"]).labels("get_pull_request")
+    calls = 200_000
+    value = 0.123
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        child.observe(value)
+    per_call_ns = (time.perf_counter() - start) / calls * 1e9
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(10_000):
+        child.observe(value)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, "lineno") if stat.size_diff > 0)
+
+    logger.info(f"histogram observe: {per_call_ns:.0f}ns per call, {grown} bytes retained after 10k calls")
+    assert per_call_ns < 5_000
+    assert grown < 4096
+
+
+@pytest.mark.asyncio
+async def test_middleware_labels_by_route_template_and_times_streams():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics-test/{item_id}")
+    async def stream(item_id: str):
+        async def body():
+            yield "a"
+            time.sleep(0.05)
+            yield "b"
+        return StreamingResponse(body())
+
+    child = HTTP_REQUEST_SECONDS.labels("GET", "/metrics-test/{item_id}")
+    count, total = child.count, child.sum
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/metrics-test/1")).text == "ab"
+        await client.get("/metrics-test/2")
+
+    assert child.count == count + 2
+    assert child.sum - total >= 0.1
+
+
+@pytest.mark.asyncio
+async def test_llm_and_github_calls_are_recorded(fake_gemini, fake_github):
+    tokens = LLM_TOKENS_TOTAL.labels("metrics-test", "input")
+    llm = CustomGeminiChatModel(base_url=fake_gemini.base_url, callbacks=[LLMMetricsHandler("metrics-test")])
+    try:
+        await llm.ainvoke("hi")
+    finally:
+        await close_gemini_clients()
+    assert tokens.value == 10
+
+    calls = GITHUB_CALL_SECONDS.labels("get_pull_request")
+    count = calls.count
+    fake_github.add_pull(1, fake_github.add_commit({"a.py": "a"}), fake_github.add_commit({"a.py": "b"}))
+    service = GitHubService(
+        _token="t", base_url=fake_github.base_url, blob_cache=BlobCache(),
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    try:
+        await service.get_pull_request("octo", "repo", 1)
+    finally:
+        await service.close()
+    assert calls.count == count + 1
@@ -0,0 +1,189 @@
+import pytest
+
+import src.tools.github_tools as github_tools
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.repo_index import RepoFileIndex, RepoIndexCache, glob_to_regex, regex_literal_prefix
+
+FILES = {
+    "README.md": "readme\n",
+    "setup.py": "setup()\n",
+    "src/app.py": "app\n",
+    "src/util/io.py": "io\n",
+    "src/util/strings.py": "strings\n",
+    "src/web/index.HTML": "<html>\n",
+    "docs/guide.md": "guide\n",
+    "docs/api/ref.md": "ref\n",
+    "Makefile": "all:\n",
+}
+
+
+def _index():
+    return RepoFileIndex("t" * 40, [(path, len(content)) for path, content in FILES.items()])
+
+
+def _service(fake_github, **kwargs):
+    return GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+        repo_index_cache=RepoIndexCache(max_repos=4),
+        **kwargs,
+    )
+
+
+def _tree_requests(fake_github):
+    return [path for path in fake_github.requests if "/git/trees/" in path]
+
+
+def test_glob_semantics():
+    assert glob_to_regex("src/**/*.py").match("src/app.py")
+    assert glob_to_regex("src/**/*.py").match("src/util/io.py")
+    assert not glob_to_regex("src/*.py").match("src/util/io.py")
+    assert not glob_to_regex("*.md").match("docs/guide.md")
+    assert glob_to_regex("**/*.md").match("README.md")
+    assert glob_to_regex("src/util/[!i]*.py").match("src/util/strings.py")
+    assert not glob_to_regex("src/util/[!i]*.py").match("src/util/io.py")
+
+
+def test_index_queries():
+    index = _index()
+
+    assert index.list_prefix("src/") == {
+        "matches": ["src/app.py", "src/util/io.py", "src/util/strings.py", "src/web/index.HTML"],
+        "match_count": 4, "limit_reached": False,
+    }
+    assert index.list_prefix("src/util/", limit=1) == {"matches": ["src/util/io.py"], "match_count": 2, "limit_reached": True}
+    assert index.glob("src/**/*.py")["matches"] == ["src/app.py", "src/util/io.py", "src/util/strings.py"]
+    assert index.glob("*.md")["matches"] == ["README.md"]
+    assert index.regex(r"\.md$")["match_count"] == 3
+
+    stats = index.extension_stats()
+    assert stats[0] == {"extension": ".py", "files": 4, "bytes": len("setup()\napp\nio\nstrings\n")}
+    assert {"extension": ".html", "files": 1, "bytes": 7} in stats
+    assert {"extension": "(none)", "files": 1, "bytes": 5} in stats
+    assert index.extension_stats("docs") == [{"extension": ".md", "files": 2, "bytes": 10}]
+
+    summary = index.directory_summary("src")
+    assert summary["total_files"] == 4
+    assert summary["directories"] == [{"name": "util", "files": 2, "bytes": 11}, {"name": "web", "files": 1, "bytes": 7}]
+    assert summary["files"] == [{"name": "app.py", "bytes": 4}]
+    assert index.directory_summary()["directories"][0]["name"] == "docs"
+
+
+def test_regex_validation_and_prefix_narrowing():
+    index = _index()
+
+    assert regex_literal_prefix(r"^src/util/.*\.py$") == "src/util/"
+    assert regex_literal_prefix(r"^src/ab*") == "src/a"
+    assert regex_literal_prefix(r"^src|docs") == ""
+    assert regex_literal_prefix(r"src/") == ""
+    assert index.regex(r"^src/util/.*\.py$")["matches"] == ["src/util/io.py", "src/util/strings.py"]
+    assert index.regex(r"^src/ap*")["matches"] == ["src/app.py"]
+
+    with pytest.raises(ValueError, match="Invalid regex"):
+        index.regex("src/(")
+    with pytest.raises(ValueError, match="too long"):
+        index.regex("a" * 20, max_length=10)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = RepoIndexCache(max_repos=2)
+    for sha in "abc":
+        cache.put(("o", "r", sha), RepoFileIndex(sha, []))
+        if sha == "b":
+            assert cache.get(("o", "r", "a")) is not None
+
+    assert cache.get(("o", "r", "b")) is None
+    assert cache.get(("o", "r", "a")) is not None
+    assert cache.stats()["repos"] == 2
+
+
+@pytest.mark.asyncio
+async def test_repeated_queries_reuse_the_index(fake_github):
+    fake_github.add_commit(FILES, ref="main")
+    service = _service(fake_github)
+    try:
+        first = await service.get_repo_index("octo", "repo", "main")
+        built_with = len(_tree_requests(fake_github))
+        second = await service.get_repo_index("octo", "repo", "main")
+        files = await service.get_all_files_list("octo", "repo", "main")
+    finally:
+        await service.close()
+
+    assert second is first
+    assert files == sorted(FILES)
+    # Later lookups only revalidate the root listing (304), the recursive tree is not fetched again.
+    assert len(_tree_requests(fake_github)) == built_with + 2
+    assert fake_github.not_modified == 2
+    assert service.repo_index_cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_new_commit_on_the_branch_builds_a_new_index(fake_github):
+    fake_github.add_commit(FILES, ref="main")
+    service = _service(fake_github)
+    try:
+        before = await service.get_repo_index("octo", "repo", "main")
+        fake_github.add_commit({**FILES, "src/new.py": "new\n"}, ref="main")
+        after = await service.get_repo_index("octo", "repo", "main")
+    finally:
+        await service.close()
+
+    assert after.tree_sha != before.tree_sha
+    assert "src/new.py" in after.paths and "src/new.py" not in before.paths
+
+
+@pytest.mark.asyncio
+async def test_truncated_tree_falls_back_to_listing_directories(fake_github):
+    fake_github.add_commit(FILES, ref="main")
+    fake_github.tree_limit = 3
+    service = _service(fake_github)
+    try:
+        files = await service.get_all_files_list("octo", "repo", "main")
+        index = await service.get_repo_index("octo", "repo", "main")
+    finally:
+        await service.close()
+
+    assert files == sorted(FILES)
+    assert not index.truncated
+
+
+@pytest.mark.asyncio
+async def test_subtree_budget_marks_the_index_truncated(fake_github):
+    fake_github.add_commit(FILES, ref="main")
+    fake_github.tree_limit = 3
+    service = _service(fake_github)
+    service.max_index_subtrees = 1
+    try:
+        index = await service.get_repo_index("octo", "repo", "main")
+    finally:
+        await service.close()
+
+    # Root lists docs/ and src/, one more than the budget: only top-level files are indexed.
+    assert index.truncated
+    assert list(index.paths) == ["Makefile", "README.md", "setup.py"]
+
+
+@pytest.mark.asyncio
+async def test_query_tool_operations(fake_github, monkeypatch):
+    fake_github.add_commit(FILES, ref="main")
+    service = _service(fake_github)
+    monkeypatch.setattr(github_tools, "github_service", service)
+    tool = github_tools.QueryRepoFilesTool()
+    try:
+        glob = await tool.ainvoke({"repo_owner": "octo", "repo_name": "repo", "operation": "glob", "pattern": "src/**/*.py", "limit": 2})
+        summary = await tool.ainvoke({"repo_owner": "octo", "repo_name": "repo", "pattern": "docs"})
+        extensions = await tool.ainvoke({"repo_owner": "octo", "repo_name": "repo", "operation": "extension_stats"})
+        regex = await tool.ainvoke({"repo_owner": "octo", "repo_name": "repo", "operation": "regex", "pattern": r"^src/.*\.py$"})
+        invalid = await tool.ainvoke({"repo_owner": "octo", "repo_name": "repo", "operation": "regex", "pattern": "(unclosed"})
+    finally:
+        await service.close()
+
+    assert glob["matches"] == ["src/app.py", "src/util/io.py"]
+    assert glob["limit_reached"] and glob["total_files"] == len(FILES) and not glob["truncated"]
+    assert summary["directories"] == [{"name": "api", "files": 1, "bytes": 4}]
+    assert extensions["extensions"][0]["extension"] == ".py"
+    assert regex["matches"][0] == "src/app.py" and "error" not in regex
+    # An invalid pattern goes back to the model instead of aborting the agent run
+    assert "Invalid regex" in invalid["error"] and invalid["pattern"] == "(unclosed"
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.services import response_cache
+from src.services.llm_service import LLMService
+from src.services.response_cache import ResponseCache, normalize_prompt
+
+
+class CountingModel:
+    """Fake chat model: answers after `latency` seconds and counts upstream calls."""
+
+    model_name = "fake-model"
+
+    def __init__(self, latency=0.05, temperature=0.7):
+        self.latency = latency
+        self.temperature = temperature
+        self.calls = 0
+
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=f"answer #{self.calls}")
+
+
+class KeywordEmbeddings:
+    """Embeds a prompt as counts of a few keywords, enough to make paraphrases similar."""
+
+    words = ("weather", "london", "python", "version")
+
+    async def aembed_query(self, text):
+        return [float(text.count(word)) for word in self.words]
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_are_served_from_cache():
+    model = CountingModel()
+    service = LLMService(model, cache=ResponseCache())
+
+    first = await service.ainvoke("What is  the weather in London?")
+    second = await service.ainvoke("What is the weather\tin London?  ")
+    model.temperature = 0.0
+    third = await service.ainvoke("What is the weather in London?")
+
+    assert first.content == second.content == "answer #1"
+    # A different temperature is a different cache key.
+    assert third.content == "answer #2"
+    stats = service.cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["saved_latency_seconds"] >= model.latency
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_make_one_upstream_call():
+    model = CountingModel(latency=0.1)
+    service = LLMService(model, cache=ResponseCache())
+
+    responses = await asyncio.gather(*(service.ainvoke("Explain asyncio") for _ in range(20)))
+
+    assert model.calls == 1
+    assert {r.content for r in responses} == {"answer #1"}
+    stats = service.cache.stats()
+    assert stats["coalesced"] == 19
+    assert stats["hit_ratio"] == pytest.approx(19 / 20)
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_are_evicted_lru():
+    model = CountingModel(latency=0)
+    cache = ResponseCache(max_entries=2, ttl=0.05)
+    service = LLMService(model, cache=cache)
+
+    for prompt in ("a", "b", "a", "c"):
+        await service.ainvoke(prompt)
+    # "b" was least recently used when "c" arrived.
+    assert cache.stats()["evictions"] == 1
+    await service.ainvoke("a")
+    assert model.calls == 3
+
+    await asyncio.sleep(0.06)
+    await service.ainvoke("a")
+    assert model.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_similar_prompts_hit_with_embeddings():
+    model = CountingModel(latency=0)
+    cache = ResponseCache(embeddings=KeywordEmbeddings(), similarity_threshold=0.95)
+    service = LLMService(model, cache=cache)
+
+    await service.ainvoke("What's the weather in London?")
+    paraphrase = await service.ainvoke("London weather today?")
+    other = await service.ainvoke("Which Python version should I use?")
+
+    assert paraphrase.content == "answer #1"
+    assert other.content == "answer #2"
+    assert cache.stats()["similar_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_similarity_scan_is_capped_and_runs_off_the_event_loop(monkeypatch):
+    model = CountingModel(latency=0)
+    cache = ResponseCache(embeddings=KeywordEmbeddings(), similarity_threshold=0.95, similarity_candidates=1)
+    service = LLMService(model, cache=cache)
+    loop_thread = threading.get_ident()
+    scans = []
+    best_match = response_cache._best_match
+    monkeypatch.setattr(
+        response_cache, "_best_match",
+        lambda query, candidates, threshold: scans.append((threading.get_ident(), len(candidates)))
+        or best_match(query, candidates, threshold),
+    )
+
+    await service.ainvoke("weather in london")
+    await service.ainvoke("python version")
+    # Only the most recent prompt is compared, so the older weather answer is not found
+    missed = await service.ainvoke("london weather")
+    hit = await service.ainvoke("weather london")
+
+    assert missed.content == "answer #3" and hit.content == "answer #3"
+    assert scans and all(thread != loop_thread and count == 1 for thread, count in scans)
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Hello\n\tWORLD ") == "Hello WORLD"
+    assert normalize_prompt("what does getUser return?") != normalize_prompt("what does GetUser return?")
+    assert normalize_prompt("ｆｕｌｌ width") == "full width"
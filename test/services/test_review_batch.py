@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+
+from src.routers import review_router
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.review_batch import ReviewBatch
+from src.services.review_job_queue import ReviewJobQueue
+
+
+class FakeReviewService:
+    """Each review takes `delays[number]` seconds; records the peak number of concurrent reviews."""
+
+    def __init__(self, github, delays):
+        self.github_service = github
+        self.delays = delays
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def perform_code_review(self, pr_url):
+        self.calls.append(pr_url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays[int(pr_url.rsplit("/", 1)[1])])
+        finally:
+            self.in_flight -= 1
+        return f"## Code Review Report\n\nreviewed {pr_url}"
+
+
+def _url(number):
+    return f"https://github.com/octo/repo/pull/{number}"
+
+
+@pytest_asyncio.fixture
+async def batch_env(fake_github):
+    delays = {1: 0.20, 2: 0.05, 3: 0.10, 4: 0.05, 5: 0.05}
+    for number in delays:
+        base = fake_github.add_commit({"a.py": "1\n"})
+        fake_github.add_pull(number, base, fake_github.add_commit({"a.py": f"{number}\n"}))
+    fake_github.pulls[5]["state"] = "closed"
+    github = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    service = FakeReviewService(github, delays)
+    queue = ReviewJobQueue(service, max_workers=2, max_queue=2)
+    try:
+        yield fake_github, service, queue
+    finally:
+        await queue.close()
+        await github.close()
+
+
+async def _collect(batch, targets):
+    return [record async for record in batch.run(targets)]
+
+
+@pytest.mark.asyncio
+async def test_results_stream_in_completion_order_within_the_worker_budget(batch_env):
+    _, service, queue = batch_env
+    batch = ReviewBatch(queue, submit_retry_interval=0.01)
+    targets = await batch.resolve_targets([_url(n) for n in (1, 2, 3, 4, 1)])
+    records = await _collect(batch, targets)
+
+    *results, summary = records
+    assert [r["pull_request_url"] for r in results] != [_url(n) for n in (1, 2, 3, 4)]
+    assert {r["pull_request_url"] for r in results} == {_url(n) for n in (1, 2, 3, 4)}
+    assert all(r["status"] == "succeeded" and r["review_report"].endswith(r["pull_request_url"]) for r in results)
+    # Two workers shared by the whole batch; a queue of two made the batch wait for room.
+    assert service.max_in_flight == 2
+    assert sorted(service.calls) == [_url(n) for n in (1, 2, 3, 4)]
+    assert summary["type"] == "summary" and summary["total"] == 4
+    assert summary["statuses"] == {"succeeded": 4}
+    assert summary["review_seconds_total"] == pytest.approx(0.40, abs=0.1)
+    assert summary["wall_seconds"] < summary["review_seconds_total"]
+    assert summary["parallelism"] > 1.3
+
+
+@pytest.mark.asyncio
+async def test_repository_batch_uses_head_shas_from_the_listing(batch_env):
+    fake, service, queue = batch_env
+    running = await queue.submit(_url(2))  # already in progress when the batch arrives
+    fake.requests.clear()
+
+    batch = ReviewBatch(queue, submit_retry_interval=0.01)
+    targets = await batch.resolve_targets(repo_owner="octo", repo_name="repo", state="open", limit=3)
+    records = await _collect(batch, targets)
+
+    assert [t["head_sha"] for t in targets] == [fake.pulls[n]["head"]["sha"] for n in (1, 2, 3)]
+    # One listing call, no per-PR lookups.
+    assert fake.requests == ["/repos/octo/repo/pulls?per_page=100&state=open"]
+    by_url = {r["pull_request_url"]: r for r in records[:-1]}
+    assert by_url[_url(2)]["job_id"] == running["id"] and by_url[_url(2)]["reused"]
+    assert service.calls.count(_url(2)) == 1
+    assert records[-1]["reused"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalid_requests_are_rejected(batch_env):
+    _, _, queue = batch_env
+    batch = ReviewBatch(queue, max_prs=2)
+    with pytest.raises(ValueError):
+        await batch.resolve_targets()
+    with pytest.raises(ValueError):
+        await batch.resolve_targets([_url(1)], repo_owner="octo", repo_name="repo")
+    with pytest.raises(ValueError):
+        await batch.resolve_targets([_url(1), _url(2), _url(3)])
+
+    [bad, summary] = await _collect(batch, [{"pr_url": "https://example.com/nope", "head_sha": None}])
+    assert bad["status"] == "failed" and "Invalid" in bad["error"]
+    assert summary["statuses"] == {"failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_a_vanished_job_yields_an_error_record_instead_of_ending_the_stream(batch_env, monkeypatch):
+    _, _, queue = batch_env
+    wait = queue.wait
+
+    async def flaky_wait(job_id):
+        job = await wait(job_id)
+        if job["pr_url"] == _url(2):
+            raise KeyError(job_id)
+        if job["pr_url"] == _url(3):
+            raise RuntimeError("boom")
+        return job
+
+    monkeypatch.setattr(queue, "wait", flaky_wait)
+    batch = ReviewBatch(queue, submit_retry_interval=0.01)
+    *results, summary = await _collect(batch, await batch.resolve_targets([_url(n) for n in (2, 3, 4)]))
+
+    by_url = {r["pull_request_url"]: r for r in results}
+    assert by_url[_url(2)]["status"] == "failed" and "no longer available" in by_url[_url(2)]["error"]
+    assert by_url[_url(3)]["status"] == "failed" and "boom" in by_url[_url(3)]["error"]
+    assert by_url[_url(4)]["status"] == "succeeded"
+    assert summary["type"] == "summary" and summary["statuses"] == {"failed": 2, "succeeded": 1}
+
+
+@pytest.mark.asyncio
+async def test_endpoint_streams_ndjson(batch_env):
+    _, _, queue = batch_env
+    app = FastAPI()
+    app.include_router(review_router.router)
+    app.dependency_overrides[review_router.get_review_job_queue] = lambda: queue
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/review/batch", json={"pull_request_urls": [_url(2), _url(4)]})
+        rejected = await client.post("/review/batch", json={})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["type"] for r in records] == ["result", "result", "summary"]
+    assert rejected.status_code == 400
@@ -0,0 +1,259 @@
+import asyncio
+
+import httpx
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import FastAPI
+
+from src.routers import review_router
+from src.services.callback_guard import PublicOnlyResolver
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.review_job_queue import ReviewJobQueue, ReviewQueueFullError
+
+
+class FakeReviewService:
+    """Blocks every review until `release` is set and records how many run at once."""
+
+    def __init__(self, github):
+        self.github_service = github
+        self.release = asyncio.Event()
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def perform_code_review(self, pr_url):
+        self.calls.append(pr_url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.release.wait()
+        finally:
+            self.in_flight -= 1
+        if pr_url.endswith("/99"):
+            return "An error occurred during code review: boom"
+        return f"## Code Review Report\n\nreviewed {pr_url}"
+
+
+@pytest_asyncio.fixture
+async def review_queue(fake_github):
+    for number in range(1, 6):
+        base = fake_github.add_commit({"a.py": "1\n"})
+        fake_github.add_pull(number, base, fake_github.add_commit({"a.py": f"{number}\n"}))
+    github = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    service = FakeReviewService(github)
+    queue = ReviewJobQueue(service, max_workers=2, max_queue=10, callback_allow_private=True)
+    try:
+        yield fake_github, service, queue
+    finally:
+        await queue.close()
+        await github.close()
+
+
+def _url(number):
+    return f"https://github.com/octo/repo/pull/{number}"
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_immediately_and_dedups_by_head(review_queue):
+    fake, service, queue = review_queue
+    first, second = await asyncio.gather(queue.submit(_url(1)), queue.submit(_url(1)))
+    assert first["id"] == second["id"]
+    assert first["status"] in ("queued", "running")
+
+    service.release.set()
+    done = await asyncio.wait_for(queue.wait(first["id"]), 5)
+    assert done["status"] == "succeeded"
+    assert done["result"].endswith(f"reviewed {_url(1)}")
+    # Same head again: the finished job is reused; a new push starts a new run.
+    assert (await queue.submit(_url(1)))["id"] == first["id"]
+    fake.pulls[1]["head"]["sha"] = fake.add_commit({"a.py": "new\n"})
+    rerun = await queue.submit(_url(1))
+    await asyncio.wait_for(queue.wait(rerun["id"]), 5)
+
+    assert rerun["id"] != first["id"]
+    assert service.calls == [_url(1), _url(1)]
+    assert queue.stats()["deduplicated"] == 2
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_is_bounded(review_queue):
+    _, service, queue = review_queue
+    jobs = [await queue.submit(_url(n)) for n in range(1, 6)]
+    await asyncio.sleep(0.05)
+    assert service.in_flight == 2
+    assert queue.stats()["queued"] == 3
+
+    service.release.set()
+    for job in jobs:
+        await asyncio.wait_for(queue.wait(job["id"]), 5)
+    assert service.max_in_flight == 2
+    assert queue.stats()["jobs"] == {"succeeded": 5}
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_submissions(review_queue):
+    _, _, queue = review_queue
+    queue.max_workers, queue.max_queue = 1, 1
+    await queue.close()
+    await queue.submit(_url(1))
+    await asyncio.sleep(0.05)
+    await queue.submit(_url(2))
+    with pytest.raises(ReviewQueueFullError):
+        await queue.submit(_url(3))
+    with pytest.raises(ValueError):
+        await queue.submit("https://github.com/octo/repo/issues/1")
+
+
+@pytest.mark.asyncio
+async def test_callbacks_receive_the_finished_job(review_queue):
+    fake, service, queue = review_queue
+    received = []
+
+    async def callback(request):
+        received.append(await request.json())
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/hook", callback)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        base = fake.add_commit({"a.py": "1\n"})
+        fake.add_pull(99, base, fake.add_commit({"a.py": "2\n"}))
+        failed = await queue.submit(_url(99), callback_url=str(server.make_url("/hook")))
+        ok = await queue.submit(_url(1), callback_url=str(server.make_url("/hook")))
+        service.release.set()
+        await asyncio.wait_for(queue.wait(failed["id"]), 5)
+        await asyncio.wait_for(queue.wait(ok["id"]), 5)
+        await asyncio.sleep(0.05)
+    finally:
+        await server.close()
+
+    by_id = {payload["id"]: payload for payload in received}
+    assert by_id[ok["id"]]["status"] == "succeeded"
+    assert by_id[failed["id"]]["status"] == "failed"
+    assert "boom" in by_id[failed["id"]]["error"]
+
+
+@pytest.mark.asyncio
+async def test_callbacks_do_not_follow_redirects(review_queue):
+    _, service, queue = review_queue
+    hits = []
+
+    async def redirect(request):
+        hits.append("hook")
+        raise web.HTTPTemporaryRedirect(str(request.url.with_path("/internal")))
+
+    async def internal(request):
+        hits.append("internal")
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/hook", redirect)
+    app.router.add_post("/internal", internal)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        job = await queue.submit(_url(1), callback_url=str(server.make_url("/hook")))
+        service.release.set()
+        await asyncio.wait_for(queue.wait(job["id"]), 5)
+        await asyncio.sleep(0.05)
+    finally:
+        await server.close()
+
+    # The redirect target never passed validate_callback_url, so it must not receive the job
+    assert hits == ["hook"]
+
+
+@pytest.mark.asyncio
+async def test_callback_urls_must_be_public_and_allowed(review_queue):
+    _, service, _ = review_queue
+    queue = ReviewJobQueue(service, callback_allowed_hosts=["hooks.example.com", "*.ci.example.com"])
+    open_queue = ReviewJobQueue(service)
+    try:
+        for url in (
+            "file:///etc/passwd",
+            "gopher://hooks.example.com/x",
+            "https://user:pw@hooks.example.com/x",
+            "https://evil.example.org/hook",     # not on the allowlist
+        ):
+            with pytest.raises(ValueError):
+                await queue.submit(_url(1), callback_url=url)
+        for url in (
+            "http://169.254.169.254/latest/meta-data/",  # cloud metadata (link-local)
+            "http://127.0.0.1:8000/admin",
+            "http://localhost/hook",
+            "http://10.0.0.5/hook",
+            "http://[::ffff:192.168.0.1]/hook",
+        ):
+            with pytest.raises(ValueError, match="non-public"):
+                await open_queue.submit(_url(1), callback_url=url)
+        assert queue._jobs == {} and open_queue._jobs == {}
+
+        job = await open_queue.submit(_url(1), callback_url="https://93.184.216.34/hook")
+        assert job["callback_urls"] == ["https://93.184.216.34/hook"]
+    finally:
+        await queue.close()
+        await open_queue.close()
+
+
+@pytest.mark.asyncio
+async def test_callback_resolver_refuses_names_rebound_to_private_addresses():
+    class Rebinding:
+        async def resolve(self, host, port=0, family=0):
+            return [{"hostname": host, "host": "10.1.2.3", "port": port, "family": family, "proto": 0, "flags": 0}]
+
+        async def close(self):
+            pass
+
+    with pytest.raises(OSError):
+        await PublicOnlyResolver(Rebinding()).resolve("hooks.example.com", 443)
+
+
+@pytest.mark.asyncio
+async def test_wait_survives_eviction_of_the_finished_job(review_queue):
+    _, service, queue = review_queue
+    queue.job_ttl = 0
+    job = await queue.submit(_url(1))
+    waiter = asyncio.create_task(queue.wait(job["id"]))
+    service.release.set()
+    while job["finished_at"] is None:
+        await asyncio.sleep(0)
+    queue._evict_expired()  # what the next submission does, before the waiter resumes
+
+    assert queue.get(job["id"]) is None
+    assert (await asyncio.wait_for(waiter, 5))["status"] == "succeeded"
+    with pytest.raises(KeyError):
+        await queue.wait(job["id"])
+
+
+@pytest.mark.asyncio
+async def test_polling_a_job_does_not_build_the_review_service(review_queue, monkeypatch):
+    _, _, queue = review_queue
+    registry = review_router.llm_registry
+
+    def broken_builder():
+        raise RuntimeError("no API key")
+
+    monkeypatch.setattr(registry, "_components", {})
+    monkeypatch.setitem(registry._builders, "review_job_queue", broken_builder)
+    app = FastAPI()
+    app.include_router(review_router.router)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        before_any_job = await client.get("/review/nope")
+        job = await queue.submit(_url(1))
+        registry._components["review_job_queue"] = queue
+        found = await client.get(f"/review/{job['id']}")
+        missing = await client.get("/review/nope")
+
+    assert before_any_job.status_code == 404
+    assert found.status_code == 200 and found.json()["job_id"] == job["id"]
+    assert missing.status_code == 404
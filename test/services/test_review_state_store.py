@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+
+from src.services.review_state_store import ReviewStateStore
+
+
+def _state(head):
+    return {"head_sha": head, "base_sha": "b" * 40, "summary": "", "findings": [], "report": "## Report"}
+
+
+def test_memory_is_bounded_to_the_most_recently_used_prs():
+    store = ReviewStateStore(max_states=2)
+    store.put("o", "r", 1, _state("1"))
+    store.put("o", "r", 2, _state("2"))
+    assert store.get("o", "r", 1)["head_sha"] == "1"  # 1 becomes most recent
+
+    store.put("o", "r", 3, _state("3"))  # evicts 2
+
+    assert len(store) == 2
+    assert store.get("o", "r", 2) is None
+    assert store.get("o", "r", 1)["head_sha"] == "1"
+
+
+def test_evicted_states_are_read_back_from_disk(tmp_path):
+    store = ReviewStateStore(state_dir=str(tmp_path), max_states=1)
+    store.put("o", "r", 1, _state("1"))
+    store.put("o", "r", 2, _state("2"))
+
+    assert len(store) == 1
+    assert store.get("o", "r", 1)["head_sha"] == "1"
+    assert len(store) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_access_does_file_io_off_the_event_loop(tmp_path, monkeypatch):
+    store = ReviewStateStore(state_dir=str(tmp_path))
+    loop_thread = threading.get_ident()
+    io_threads = set()
+    get, put = store.get, store.put
+    monkeypatch.setattr(store, "get", lambda *a: io_threads.add(threading.get_ident()) or get(*a))
+    monkeypatch.setattr(store, "put", lambda *a: io_threads.add(threading.get_ident()) or put(*a))
+
+    await store.aput("o", "r", 1, _state("1"))
+    assert (await ReviewStateStore(state_dir=str(tmp_path)).aget("o", "r", 1))["head_sha"] == "1"
+    assert (await store.aget("o", "r", 2)) is None
+
+    assert io_threads and loop_thread not in io_threads
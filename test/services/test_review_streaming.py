@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import src.tools.github_tools as github_tools
+from src.routers.sse import sse_stream
+from src.services.blob_cache import BlobCache
+from src.services.code_review_service import CodeReviewService
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.review_report import render_review_report
+from src.services.review_state_store import ReviewStateStore
+
+PR_URL = "https://github.com/octo/repo/pull/1"
+
+
+@pytest.fixture
+def github(fake_github, monkeypatch):
+    base = fake_github.add_commit({"a.py": "a\n", "b.py": "b\n"}, ref="main")
+    fake_github.add_pull(1, base, fake_github.add_commit({"a.py": "a1\n", "b.py": "b1\n"}))
+    service = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode="git",
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    monkeypatch.setattr(github_tools, "github_service", service)
+    return service
+
+
+def _review_service(github, **kwargs):
+    return CodeReviewService(
+        kwargs.pop("agent", None), github=github, state_store=ReviewStateStore(), result_cache=None, **kwargs
+    )
+
+
+class FakeRequest:
+    """Minimal stand-in for a Starlette request whose client disconnects after `after` checks."""
+
+    def __init__(self, after=None):
+        self.after = after
+        self.checks = 0
+        self.url = type("URL", (), {"path": "/review/stream"})()
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.after is not None and self.checks > self.after
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_stream_reports_per_file_progress(github):
+    async def review_file(inputs):
+        filename = inputs["file_context"].split()[1]
+        finding = {"filename": filename, "line_number": "1", "issue": "x", "suggestion": "y"}
+        return AIMessage(content=render_review_report("ok", [finding]))
+
+    service = _review_service(github, mode="map_reduce", file_reviewer=RunnableLambda(review_file))
+    try:
+        events = [event async for event in service.stream_code_review(PR_URL)]
+    finally:
+        await github.close()
+
+    names = [name for name, _ in events]
+    assert names[0] == "review_started" and names[-1] == "report"
+    assert sorted(data["filename"] for name, data in events if name == "file_fetched") == ["a.py", "b.py"]
+    reviewed = {data["filename"]: data["findings"] for name, data in events if name == "file_reviewed"}
+    assert [f["filename"] for f in reviewed["a.py"]] == ["a.py"]
+    assert "| a.py | 1 | x | y |" in events[-1][1]["review_report"]
+
+
+@pytest.mark.asyncio
+async def test_agent_stream_forwards_tool_calls_and_tokens(github):
+    report = render_review_report("All good.", [])
+    model = GenericFakeChatModel(messages=iter([AIMessage(content=report)]))
+
+    async def agent(inputs, config):
+        await github_tools.get_pr_review_context_tool.ainvoke(
+            {"repo_owner": "octo", "repo_name": "repo", "pull_number": 1}, config
+        )
+        return {"messages": [await model.ainvoke(inputs["messages"], config)]}
+
+    service = _review_service(github, agent=RunnableLambda(agent), incremental=False)
+    try:
+        events = [event async for event in service.stream_code_review(PR_URL)]
+    finally:
+        await github.close()
+
+    names = [name for name, _ in events]
+    assert names.index("tool_start") < names.index("files_fetched") < names.index("token")
+    assert dict(events)["files_fetched"]["files"] == ["a.py", "b.py"]
+    assert "".join(data["text"] for name, data in events if name == "token") == report
+    assert events[-1] == ("report", {"review_report": report})
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_the_upstream_llm_call(github):
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def stuck_llm(inputs):
+        started.set()
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    service = _review_service(github, mode="map_reduce", file_reviewer=RunnableLambda(stuck_llm))
+    request = FakeRequest(after=3)
+    try:
+        chunks = []
+        async for chunk in sse_stream(request, service.stream_code_review(PR_URL), poll_interval=0.01):
+            chunks.append(chunk)
+        await asyncio.wait_for(cancelled.wait(), 5)
+    finally:
+        await github.close()
+
+    assert started.is_set()
+    first = chunks[0].split("\n")
+    assert first[0] == "event: review_started"
+    assert json.loads(first[1][len("data: "):])["pull_number"] == 1
+    assert not any(chunk.startswith("event: report") for chunk in chunks)
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_pauses_the_producer(github):
+    produced = []
+
+    async def events():
+        for i in range(10):
+            produced.append(i)
+            yield "token", {"text": str(i)}
+
+    stream = sse_stream(FakeRequest(), events())
+    assert await stream.__anext__() == 'event: token\ndata: {"text": "0"}\n\n'
+    await asyncio.sleep(0.05)
+    assert produced == [0]
+    await stream.aclose()
+    await github.close()
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import hmac
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+
+from src.routers import webhook_router
+from src.services.review_job_queue import ReviewJobQueue
+from src.services.review_webhook import ReviewWebhookDispatcher, verify_signature
+
+SECRET = "s3cret"
+
+
+class FakeReviewService:
+    """Reviews block until `release` is set; records started and cancelled reviews."""
+
+    github_service = None
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = []
+        self.cancelled = []
+
+    async def perform_code_review(self, pr_url):
+        self.started.append(pr_url)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled.append(pr_url)
+            raise
+        return f"## Code Review Report\n\nreviewed {pr_url}"
+
+
+@pytest_asyncio.fixture
+async def dispatcher():
+    service = FakeReviewService()
+    queue = ReviewJobQueue(service, max_workers=2, max_queue=10)
+    dispatcher = ReviewWebhookDispatcher(queue, debounce_seconds=0.05)
+    try:
+        yield service, queue, dispatcher
+    finally:
+        await dispatcher.close()
+        await queue.close()
+
+
+def _event(head_sha, action="synchronize", number=7, draft=False):
+    return {
+        "action": action,
+        "repository": {"name": "repo", "owner": {"login": "octo"}},
+        "pull_request": {
+            "number": number,
+            "draft": draft,
+            "html_url": f"https://github.com/octo/repo/pull/{number}",
+            "head": {"sha": head_sha},
+        },
+    }
+
+
+def _jobs(queue):
+    return list(queue._jobs.values())
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_signature_verification():
+    body = b'{"action": "opened"}'
+    signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+    assert verify_signature(SECRET, body, signature)
+    assert not verify_signature(SECRET, body + b" ", signature)
+    assert not verify_signature("other", body, signature)
+    assert not verify_signature(SECRET, body, None)
+    assert not verify_signature("", body, "sha256=")
+
+
+@pytest.mark.asyncio
+async def test_burst_of_pushes_reviews_only_the_last_head(dispatcher):
+    service, queue, webhook = dispatcher
+    for i, sha in enumerate(["a" * 40, "b" * 40, "c" * 40]):
+        result = await webhook.handle_event("pull_request", _event(sha, action="opened" if i == 0 else "synchronize"))
+        assert result["status"] == "scheduled"
+        await asyncio.sleep(0.01)
+
+    await _wait_for(lambda: service.started)
+    service.release.set()
+    [job] = _jobs(queue)
+    await asyncio.wait_for(queue.wait(job["id"]), 2)
+
+    assert job["head_sha"] == "c" * 40 and job["status"] == "succeeded"
+    assert service.started == ["https://github.com/octo/repo/pull/7"]
+    assert webhook.stats() == {
+        "received": 3, "ignored": 0, "superseded": 2, "submitted": 1, "stale_cancelled": 0, "pending": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_new_push_cancels_the_running_review_of_the_old_head(dispatcher):
+    service, queue, webhook = dispatcher
+    await webhook.handle_event("pull_request", _event("a" * 40))
+    await _wait_for(lambda: service.started)
+    [old_job] = _jobs(queue)
+    assert old_job["status"] == "running"
+
+    result = await webhook.handle_event("pull_request", _event("b" * 40))
+    await _wait_for(lambda: len(service.started) == 2)
+    service.release.set()
+    new_job = next(job for job in _jobs(queue) if job["head_sha"] == "b" * 40)
+    await asyncio.wait_for(queue.wait(new_job["id"]), 2)
+
+    assert result["cancelled_jobs"] == [old_job["id"]]
+    assert old_job["status"] == "cancelled" and old_job["finished_at"] is not None
+    assert service.cancelled == ["https://github.com/octo/repo/pull/7"]
+    assert new_job["status"] == "succeeded"
+    # The worker survived the cancellation and the queue keeps serving.
+    assert queue.stats()["workers"] == 2 and queue.stats()["cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_irrelevant_events_are_ignored(dispatcher):
+    _, queue, webhook = dispatcher
+    assert (await webhook.handle_event("ping", {}))["status"] == "pong"
+    assert (await webhook.handle_event("pull_request", _event("a" * 40, action="closed")))["status"] == "ignored"
+    assert (await webhook.handle_event("pull_request", _event("a" * 40, draft=True)))["status"] == "ignored"
+    assert (await webhook.handle_event("issues", {"action": "opened"}))["status"] == "ignored"
+    with pytest.raises(ValueError):
+        await webhook.handle_event("pull_request", {"action": "opened", "pull_request": {}})
+    assert _jobs(queue) == [] and webhook.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_endpoint_verifies_signatures(dispatcher, monkeypatch):
+    _, _, webhook = dispatcher
+    monkeypatch.setenv("GITHUB_WEBHOOK_SECRET", SECRET)
+
+    async def get_component(name):
+        assert name == "review_webhook"
+        return webhook
+
+    monkeypatch.setattr(webhook_router, "_get_component", get_component)
+    app = FastAPI()
+    app.include_router(webhook_router.router)
+    body = json.dumps(_event("a" * 40)).encode()
+
+    def headers(signature, event="pull_request"):
+        return {"X-GitHub-Event": event, "X-Hub-Signature-256": signature, "X-GitHub-Delivery": "d-1"}
+
+    signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        forged = await client.post("/webhook/github", content=body, headers=headers("sha256=" + "0" * 64))
+        accepted = await client.post("/webhook/github", content=body, headers=headers(signature))
+        ping = await client.post("/webhook/github", content=body, headers=headers(signature, event="ping"))
+        monkeypatch.delenv("GITHUB_WEBHOOK_SECRET")
+        unconfigured = await client.post("/webhook/github", content=body, headers=headers(signature))
+
+    assert forged.status_code == 401
+    assert accepted.status_code == 202
+    assert accepted.json()["status"] == "scheduled" and accepted.json()["delivery"] == "d-1"
+    assert ping.status_code == 200 and ping.json()["status"] == "pong"
+    assert unconfigured.status_code == 503
+    assert webhook.stats()["received"] == 2
@@ -0,0 +1,214 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage
+
+import src.tools.github_tools as github_tools
+from src.llm.instrumentation import LLMTracingHandler
+from src.services.blob_cache import BlobCache
+from src.services.code_review_service import CodeReviewService
+from src.services.github_scheduler import GitHubRequestScheduler
+from src.services.github_service import GitHubService
+from src.services.review_job_queue import ReviewJobQueue
+from src.services.review_report import render_review_report
+from src.services.review_state_store import ReviewStateStore
+from src.services.tracing import (
+    NOOP_SPAN, FileSpanExporter, InMemorySpanExporter, OTLPHTTPSpanExporter, Tracer, tracer,
+)
+
+PR_URL = "https://github.com/octo/repo/pull/1"
+
+
+class TracedFakeAgent:
+    """One LLM turn that asks for the context tool, the tool call, then a final LLM turn."""
+
+    def __init__(self):
+        self.llm = FakeMessagesListChatModel(
+            responses=[
+                AIMessage(content="", tool_calls=[{"name": "get_pr_code_review_context", "args": {}, "id": "1"}],
+                          usage_metadata={"input_tokens": 120, "output_tokens": 8, "total_tokens": 128}),
+                AIMessage(content=render_review_report("Looks fine.", []),
+                          usage_metadata={"input_tokens": 900, "output_tokens": 40, "total_tokens": 940}),
+            ],
+            callbacks=[LLMTracingHandler("fake")],
+        )
+
+    async def ainvoke(self, inputs):
+        await self.llm.ainvoke(inputs["messages"])
+        await github_tools.get_pr_review_context_tool._arun("octo", "repo", 1)
+        return {"messages": [await self.llm.ainvoke(inputs["messages"])]}
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    exporter = InMemorySpanExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(tracer, "enabled", True)
+    monkeypatch.setattr(tracer, "_buffer", [])
+    return exporter
+
+
+@pytest.fixture
+def github(fake_github, monkeypatch):
+    service = GitHubService(
+        _token="t",
+        base_url=fake_github.base_url,
+        blob_cache=BlobCache(),
+        fetch_mode="contents",
+        scheduler=GitHubRequestScheduler(requests_per_second=100_000, burst=100_000),
+    )
+    monkeypatch.setattr(github_tools, "github_service", service)
+    return service
+
+
+def _by_name(exported):
+    return {span.name: span for span in exported}
+
+
+@pytest.mark.asyncio
+async def test_review_spans_form_one_tree_from_service_to_http(fake_github, github, spans):
+    base = fake_github.add_commit({"a.py": "a\n", "b.py": "b\n"}, ref="main")
+    fake_github.add_pull(1, base, fake_github.add_commit({"a.py": "a1\n", "b.py": "bb2\n"}))
+    review = CodeReviewService(TracedFakeAgent(), github=github, state_store=ReviewStateStore(), result_cache=None)
+    try:
+        await review.perform_code_review(PR_URL)
+    finally:
+        await github.close()
+    await tracer.flush()
+
+    named = _by_name(spans.spans)
+    root = named["review.perform_code_review"]
+    tool = named["tool.get_pr_code_review_context"]
+    fetch_info = named["github.get_pr_code_review_info"]
+    llm_turns = [s for s in spans.spans if s.name == "llm.chat"]
+    file_fetches = [s for s in spans.spans if s.name == "github.fetch_file_content"]
+
+    assert {s.trace_id for s in spans.spans} == {root.trace_id}
+    assert root.parent_span_id is None
+    assert [s.parent_span_id for s in llm_turns] == [root.span_id, root.span_id]
+    assert tool.parent_span_id == root.span_id
+    assert fetch_info.parent_span_id == tool.span_id
+    assert len(file_fetches) == 4
+    assert {s.parent_span_id for s in file_fetches} == {fetch_info.span_id}
+
+    assert root.attributes["github.repo"] == "octo/repo"
+    assert root.attributes["review.incremental"] is False
+    assert [s.attributes["gen_ai.usage.input_tokens"] for s in llm_turns] == [120, 900]
+    assert llm_turns[0].attributes["llm.tool_calls"] == 1
+    assert fetch_info.attributes["pr.changed_files"] == 2
+    assert fetch_info.attributes["bytes_fetched"] == len("a\n" + "a1\n" + "b\n" + "bb2\n")
+    assert sum(s.attributes["bytes"] for s in file_fetches) == fetch_info.attributes["bytes_fetched"]
+    assert tool.attributes["context.tokens_after"] > 0
+    assert all(s.end_ns >= s.start_ns for s in spans.spans)
+
+
+@pytest.mark.asyncio
+async def test_queued_job_span_is_parented_on_the_submitting_request(fake_github, github, spans):
+    base = fake_github.add_commit({"a.py": "a\n"}, ref="main")
+    fake_github.add_pull(1, base, fake_github.add_commit({"a.py": "a1\n"}))
+    review = CodeReviewService(TracedFakeAgent(), github=github, state_store=ReviewStateStore(), result_cache=None)
+    queue = ReviewJobQueue(review, max_workers=1, max_queue=10)
+    try:
+        with tracer.span("review_router.create_code_review") as request_span:
+            job = await queue.submit(PR_URL)
+        await queue.wait(job["id"])
+    finally:
+        await queue.close()
+        await github.close()
+    await tracer.flush()
+
+    named = _by_name(spans.spans)
+    assert named["review_job.run"].parent_span_id == request_span.span_id
+    assert named["review.perform_code_review"].parent_span_id == named["review_job.run"].span_id
+    assert {s.trace_id for s in spans.spans} == {request_span.trace_id}
+
+
+@pytest.mark.asyncio
+async def test_failed_span_records_the_exception(spans):
+    with pytest.raises(RuntimeError):
+        with tracer.span("boom"):
+            raise RuntimeError("no luck")
+    await tracer.flush()
+
+    [span] = spans.spans
+    assert span.to_otlp()["status"] == {"code": 2, "message": "RuntimeError: no luck"}
+    assert tracer.current_span() is None
+
+
+def test_file_exporter_writes_otlp_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    local_tracer = Tracer(FileSpanExporter(str(path), "svc"), batch_size=2)
+    with local_tracer.span("parent", {"files": 3}):
+        with local_tracer.span("child", {"cache_hit": True}):
+            pass
+
+    [line] = path.read_text().splitlines()
+    resource_spans = json.loads(line)["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"] == {"stringValue": "svc"}
+    child, parent = resource_spans["scopeSpans"][0]["spans"]
+    assert child["parentSpanId"] == parent["spanId"]
+    assert len(parent["traceId"]) == 32 and len(parent["spanId"]) == 16
+    assert parent["attributes"] == [{"key": "files", "value": {"intValue": "3"}}]
+    assert child["attributes"] == [{"key": "cache_hit", "value": {"boolValue": True}}]
+
+
+class SlowExporter(InMemorySpanExporter):
+    async def aexport(self, spans):
+        await asyncio.sleep(0.05)
+        self.export(spans)
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_background_exports():
+    exporter = SlowExporter()
+    local_tracer = Tracer(exporter, batch_size=1)
+    for i in range(3):
+        with local_tracer.span(f"span {i}"):
+            pass
+    assert len(local_tracer._exports) == 3 and exporter.spans == []
+
+    await local_tracer.shutdown()
+
+    assert [span.name for span in exporter.spans] == ["span 0", "span 1", "span 2"]
+    assert local_tracer._exports == set()
+
+
+@pytest.mark.asyncio
+async def test_otlp_exporter_reuses_one_session():
+    received, peers = [], set()
+
+    async def collector(request):
+        received.append(await request.json())
+        peers.add(request.transport.get_extra_info("peername"))
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post("/v1/traces", collector)
+    server = TestServer(app)
+    await server.start_server()
+    exporter = OTLPHTTPSpanExporter(str(server.make_url("/v1/traces")), "svc")
+    local_tracer = Tracer(exporter, batch_size=1)
+    try:
+        for i in range(3):
+            with local_tracer.span(f"span {i}"):
+                pass
+            await asyncio.gather(*local_tracer._exports)
+        session = exporter._sessions.current()
+        await local_tracer.shutdown()
+    finally:
+        await server.close()
+
+    assert len(received) == 3 and len(peers) == 1
+    assert session.closed
+
+
+def test_disabled_tracer_hands_out_the_noop_span():
+    disabled = Tracer(None, enabled=False)
+    with disabled.span("anything", {"a": 1}) as span:
+        span.set_attribute("b", 2)
+    assert span is NOOP_SPAN
+    assert disabled._buffer == []